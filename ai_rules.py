@@ -1,3 +1,6 @@
+from column_profile import get_profile
+
+
 def generate_ai_tips(df):
     tips = []
 
@@ -7,40 +10,50 @@ def generate_ai_tips(df):
     if missing:
         tips.append(f"⚠️ คอลัมน์ขาด: {', '.join(missing)} — โปรดตรวจแหล่งข้อมูลหรือ mapping ชื่อคอลัมน์")
 
+    # สถิติทั้งหมดด้านล่างอ่านจาก profile ที่สแกนแต่ละคอลัมน์ครั้งเดียว (แคชต่อ DataFrame)
+    profile = get_profile(df)
+
     # ข้อมูลวันที่
-    if "ShipDate" in df.columns and df["ShipDate"].isna().mean() > 0.2:
+    if profile.null_ratio.get("ShipDate", 0) > 0.2:
         tips.append("⚠️ วันที่ส่งของ (ShipDate) มีค่าไม่สามารถแปลงเป็นวันที่ได้จำนวนมาก — รูปแบบวันที่อาจไม่สม่ำเสมอ")
 
+    # วันที่ที่อ่านไม่ได้ (จำนวนแถวต่อรูปแบบจาก date_parser)
+    date_formats = df.attrs.get("date_formats") or {}
+    unparsed = date_formats.get("unparsed", 0)
+    if unparsed:
+        found = ", ".join(f"{k} {v:,}" for k, v in date_formats.items() if k != "unparsed")
+        tips.append(
+            f"⚠️ วันที่อ่านไม่ได้ {unparsed:,} จาก {sum(date_formats.values()):,} แถว — รูปแบบที่อ่านได้: {found}"
+        )
+
     # ความเสี่ยงรายเดือน/รายไตรมาส
-    if "Month" in df.columns:
-        oct_count = int((df["Month"] == 10).sum())
+    if profile.month_counts is not None:
+        oct_count = profile.month_total(10)
         if oct_count > 0:
             tips.append(f"🔎 เดือนตุลาคมพบเคส {oct_count} รายการ — แนะนำวิเคราะห์สาเหตุเชิงลึกและวางแผน Q4")
-    if "Quarter" in df.columns:
-        q4_count = int((df["Quarter"] == 4).sum())
+    if profile.quarter_counts is not None:
+        q4_count = profile.quarter_total(4)
         if q4_count > 0:
             tips.append(f"🔎 Q4 พบเคส {q4_count} รายการ — ตรวจความพร้อมซัพพลายเออร์และกระบวนการก่อน peak")
 
     # รูปแบบ defect ที่พบซ้ำ
     if "Defect" in df.columns:
-        common = df["Defect"].value_counts().head(3).index.tolist()
+        common = profile.top_defects(3)
         if common:
-            tips.append(f"📌 Defect ที่พบมาก: {', '.join(common)} — จัดทำมาตรการป้องกันที่จุดเกิดเหตุ")
+            tips.append(f"📌 Defect ที่พบมาก: {', '.join(map(str, common))} — จัดทำมาตรการป้องกันที่จุดเกิดเหตุ")
 
     # ซัพพลายเออร์ที่มีเคสสูง
     if "SUP" in df.columns:
-        sup_count = df["SUP"].value_counts()
-        if not sup_count.empty:
-            worst_sup = sup_count.idxmax()
+        worst_sup = profile.worst_sup()
+        if worst_sup is not None:
             tips.append(f"🏭 SUP ที่มีเคสสูงสุด: {worst_sup} — แนะนำทำ CAPA ร่วมกันและตั้ง KPI รายไตรมาส")
 
     # ขนาดหน้ากว้าง/น้ำหนัก outlier
-    for col in ["Width", "Weight"]:
-        if col in df.columns:
-            from analysis import iqr_outliers
-            outliers, (low, high) = iqr_outliers(df[col])
-            if outliers > 0:
-                tips.append(f"📈 ค่าผิดปกติใน {col}: {outliers} รายการ — ช่วงคาดหวัง ~ {low:.2f} ถึง {high:.2f}")
+    for col, stats in profile.numeric.items():
+        if stats["outliers"] > 0:
+            tips.append(
+                f"📈 ค่าผิดปกติใน {col}: {stats['outliers']} รายการ — ช่วงคาดหวัง ~ {stats['low']:.2f} ถึง {stats['high']:.2f}"
+            )
 
     # ข้อแนะนำปฏิบัติ
     tips.append("✅ แนะนำตั้ง validation เมื่อรับข้อมูล: ตรวจชื่อคอลัมน์, วันที่, และประเภทค่า เพื่อป้องกัน error ในการสรุปผล")
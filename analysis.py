@@ -1,9 +1,221 @@
+import string
+
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
+
+from column_profile import get_profile
+from date_parser import parse_dates, report_counts
+from defect_alias import canonicalize_defects
+from excel_reader import read_projected_excel
+from rule_engine import apply_rules
+
+# -----------------------------
+# Mapping ชื่อคอลัมน์ของแต่ละหน้า
+# -----------------------------
+rename_map_roll = {
+    "SUP": "SUP", "Supplier": "SUP",
+    "สิ่งที่ไม่เป็นไปตามข้อกำหนด": "Defect", "ข้อบกพร่อง": "Defect",
+    "เกรดแกรม": "Grade", "Grade": "Grade",
+    "วันที่ออก": "Date", "Date": "Date",
+    "หน้ากว้าง": "Width", "น้ำหนัก": "Weight",
+    "เลขที่เอกสาร": "DocNo", "เลขที่ส่งของ": "ShipNo", "Lot": "Lot",
+}
+
+rename_map_sheet = {
+    "SUPPLIER": "SUP",
+    "สิ่งที่ไม่เป็นไปตามข้อกำหนด": "Defect",
+    "เกรดแกรม": "Grade",
+    "วันที่รับของ": "Date",
+    "MONTH": "Month",
+    "QUARTER": "Quarter",
+    "YEAR": "Year",
+    "หน้ากว้าง": "Width",
+    "น้ำหนัก": "Weight",
+    "เลขที่เอกสาร": "DocNo",
+    "เลขที่ส่งของ": "ShipNo",
+    "Lot": "Lot",
+}
+
+# คอลัมน์ที่หน้า dashboard ใช้จริง (ตัวอ่าน Excel จะดึงเฉพาะคอลัมน์เหล่านี้)
+# DocNo/ShipNo/Lot ใช้เป็น key กันข้อมูลซ้ำเมื่อบันทึกลงคลังข้อมูล (claim_store)
+columns_roll = ["SUP", "Defect", "Grade", "Date", "Width", "Weight", "DocNo", "ShipNo", "Lot"]
+columns_sheet = [
+    "SUP", "Defect", "Grade", "Date", "Month", "Quarter", "Year", "Width", "Weight",
+    "DocNo", "ShipNo", "Lot",
+]
+
+
+# คอลัมน์ข้อความที่ค่าซ้ำกันมาก เก็บเป็น categorical (groupby ทำงานบน code จำนวนเต็ม)
+category_columns = ["SUP", "Defect", "DefectRaw", "Grade", "MonthKey", "RootCause", "Advice"]
+# คอลัมน์เลขเอกสาร แปลงเป็น categorical เฉพาะเมื่อมีค่าซ้ำมากพอ
+id_columns = ["DocNo", "ShipNo", "Lot"]
+
+
+def month_key(year: pd.Series, month: pd.Series) -> pd.Series:
+    # "YYYY-MM" เป็น ordered categorical: code เรียงตามเดือนจริง
+    # สร้างข้อความเฉพาะเดือนที่ไม่ซ้ำ แทนการ strftime ทีละแถว
+    ym = pd.to_numeric(year, errors="coerce") * 12 + pd.to_numeric(month, errors="coerce") - 1
+    codes, uniques = pd.factorize(ym, sort=True)
+    labels = [f"{int(m) // 12:04d}-{int(m) % 12 + 1:02d}" for m in uniques]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=labels, ordered=True),
+        index=year.index,
+    )
+
+
+def _cell_text(value) -> str:
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def text_category(values: pd.Series) -> pd.Series:
+    # categorical ที่ทุกค่าเป็นข้อความ: Excel อ่าน cell ตัวเลขในคอลัมน์ข้อความเป็นตัวเลข (เช่น Grade 125 ปนกับ
+    # "KA125") categorical ที่ค่าปนหลายชนิดส่งเป็น Arrow (Parquet / st.dataframe) ไม่ได้
+    # แปลงเฉพาะ categories แล้ว map code เดิม (125 กับ "125" รวมเป็นค่าเดียวกัน)
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    categories = values.cat.categories
+    if categories.inferred_type in ("string", "empty"):
+        return values
+    codes, uniques = pd.factorize(pd.Index([_cell_text(v) for v in categories], dtype=object))
+    old = values.cat.codes.to_numpy()
+    new = np.where(old < 0, -1, codes[np.maximum(old, 0)])
+    return pd.Series(pd.Categorical.from_codes(new, categories=uniques), index=values.index, name=values.name)
+
+
+def compact_claims(df: pd.DataFrame) -> pd.DataFrame:
+    # แปลงข้อความที่ซ้ำกันเป็น categorical และลดขนาดคอลัมน์ตัวเลข
+    df = df.copy(deep=False)
+    for col in category_columns:
+        if col in df.columns:
+            df[col] = text_category(df[col])
+    for col in id_columns:
+        if col in df.columns and df[col].dtype == object:
+            if df[col].nunique() < 0.5 * len(df):
+                df[col] = df[col].astype("category")
+            elif pd.api.types.infer_dtype(df[col], skipna=True) == "string":
+                # ชนิดเดียวกับที่อ่านกลับจากแคช Parquet (แคชในหน่วยความจำกับบนดิสก์ได้ DataFrame เดียวกัน)
+                df[col] = df[col].astype("str")
+    for col in ["Month", "Week", "Quarter", "Year"]:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    for col in ["Width", "Weight"]:
+        if col in df.columns and pd.api.types.is_float_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="float")
+    return df
+
+
+def _empty_like(series: pd.Series, n: int) -> pd.Series:
+    # คอลัมน์ว่างยาว n แถวสำหรับชีตที่ไม่มีคอลัมน์นี้ (จำนวนเต็มธรรมดาเก็บ NaN ไม่ได้ จึงเป็น float)
+    dtype = "float64" if series.dtype.kind in "iub" else series.dtype
+    return pd.Series(index=pd.RangeIndex(n), dtype=dtype)
+
+
+def concat_claims(frames: list) -> pd.DataFrame:
+    # ต่อเคลมจากหลายชีต/หลายไฟล์เป็น schema เดียว (คอลัมน์ที่บางชีตไม่มีเป็นค่าว่าง)
+    # คอลัมน์ categorical รวมด้วย union_categoricals ต่อ code กันตรง ๆ ไม่แปลงกลับเป็น object
+    frames = [f for f in frames if len(f.columns)]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+
+    columns = list(dict.fromkeys(c for f in frames for c in f.columns))
+    data = {}
+    for col in columns:
+        present = next(f[col] for f in frames if col in f.columns)
+        parts = [f[col] if col in f.columns else None for f in frames]
+        if all(p is None or isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            cats = [p.array if p is not None else pd.Categorical([None] * len(f)) for p, f in zip(parts, frames)]
+            try:
+                data[col] = pd.Series(union_categoricals(cats, ignore_order=True))
+                continue
+            except TypeError:
+                # categories คนละชนิด (เช่น Lot เป็นตัวเลขในชีตหนึ่ง ข้อความในอีกชีต)
+                parts = [pd.Series(np.asarray(c, dtype=object)) for c in cats]
+        parts = [p.reset_index(drop=True) if p is not None else _empty_like(present, len(f))
+                 for p, f in zip(parts, frames)]
+        data[col] = pd.concat(parts, ignore_index=True)
+        if present.dtype == "category":
+            data[col] = data[col].astype("category")
+    out = pd.DataFrame(data)
+
+    # จำนวนแถวต่อรูปแบบวันที่ รวมทุกชีต
+    date_formats = {}
+    for f in frames:
+        for k, v in f.attrs.get("date_formats", {}).items():
+            date_formats[k] = date_formats.get(k, 0) + v
+    if date_formats:
+        out.attrs["date_formats"] = date_formats
+    return out
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    # เทียบหน่วยความจำต่อคอลัมน์ก่อน/หลัง compact_claims (หน่วย MB)
+    mb = 1024 * 1024
+    before_usage = before.memory_usage(deep=True, index=False)
+    after_usage = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "คอลัมน์": before_usage.index,
+        "dtype เดิม": [str(before[c].dtype) for c in before_usage.index],
+        "dtype ใหม่": [str(after[c].dtype) if c in after.columns else "-" for c in before_usage.index],
+        "MB เดิม": (before_usage / mb).round(3).values,
+        "MB ใหม่": (after_usage.reindex(before_usage.index).fillna(0) / mb).round(3).values,
+    })
+    total = pd.DataFrame([{
+        "คอลัมน์": "รวม",
+        "dtype เดิม": "",
+        "dtype ใหม่": "",
+        "MB เดิม": round(before_usage.sum() / mb, 3),
+        "MB ใหม่": round(after_usage.sum() / mb, 3),
+    }])
+    return pd.concat([report, total], ignore_index=True)
+
+
+def prepare_roll_claims(df: pd.DataFrame, aliases=None, learn_aliases=False) -> pd.DataFrame:
+    # rename + แปลงวันที่ + MonthKey/Quarter + RootCause/Advice ของเคลมม้วน
+    df = df.rename(columns={c: rename_map_roll.get(c, c) for c in df.columns})
+
+    if "Date" in df.columns:
+        # แปลงเฉพาะค่าที่ไม่ซ้ำ (รองรับ พ.ศ., Excel serial, ชื่อเดือนไทย) และเก็บจำนวนแถวต่อรูปแบบ
+        df["Date"], report = parse_dates(df["Date"])
+        df.attrs["date_formats"] = report_counts(report)
+        df["MonthKey"] = month_key(df["Date"].dt.year, df["Date"].dt.month)
+        df["Month"] = df["Date"].dt.month
+        df["Quarter"] = df["Date"].dt.quarter
+
+    # รวม Defect ที่สะกดต่างกันเป็นชื่อมาตรฐานตาม aliases (ข้อความเดิมอยู่ใน DefectRaw)
+    df = canonicalize_defects(df, "roll", aliases=aliases, learn=learn_aliases)
+    # RootCause/Advice จากตารางกฎ root_cause_rules.csv (ประเมินต่อค่า Defect ที่ไม่ซ้ำ)
+    df = apply_rules(df, "roll")
+    return df
+
+
+def prepare_sheet_claims(df: pd.DataFrame, aliases=None, learn_aliases=False) -> pd.DataFrame:
+    # rename + แปลงวันที่ + MonthKey/Quarter + RootCause/Advice ของเคลมแผ่น
+    df = df.rename(columns={c: rename_map_sheet.get(c, c) for c in df.columns})
+
+    if "Date" in df.columns:
+        # แปลงเฉพาะค่าที่ไม่ซ้ำ (รองรับ พ.ศ., Excel serial, ชื่อเดือนไทย) และเก็บจำนวนแถวต่อรูปแบบ
+        df["Date"], report = parse_dates(df["Date"])
+        df.attrs["date_formats"] = report_counts(report)
+        df["MonthKey"] = month_key(df["Date"].dt.year, df["Date"].dt.month)
+        df["Month"] = df["Date"].dt.month
+        df["Quarter"] = df["Date"].dt.quarter
+    elif "Month" in df.columns and "Year" in df.columns:
+        df["MonthKey"] = month_key(df["Year"], df["Month"])
+
+    # รวม Defect ที่สะกดต่างกันเป็นชื่อมาตรฐานตาม aliases (ข้อความเดิมอยู่ใน DefectRaw)
+    df = canonicalize_defects(df, "sheet", aliases=aliases, learn=learn_aliases)
+    # RootCause/Advice จากตารางกฎ root_cause_rules.csv (ประเมินต่อค่า Defect ที่ไม่ซ้ำ)
+    df = apply_rules(df, "sheet")
+    return df
+
 
 def load_excel(file) -> pd.DataFrame:
     # รองรับ Excel ที่มี header ภาษาไทยและวันที่หลากหลาย
-    df = pd.read_excel(file, engine="openpyxl")
     # จัดคอลัมน์ให้ชื่อมาตรฐาน (หากชื่อไม่ตรงให้ปรับ mapping ตรงนี้)
     rename_map = {
         "SUP": "SUP",
@@ -21,12 +233,13 @@ def load_excel(file) -> pd.DataFrame:
         "Code": "Code",
         "สิ่งที่ไม่เป็นไปตามข้อกำหนด": "Defect",
     }
-    df = df.rename(columns={c: rename_map.get(c, c) for c in df.columns})
+    # อ่านเฉพาะคอลัมน์ที่รู้จัก (resolve ชื่อไทย/อังกฤษจาก header แถวแรก) แทนการโหลดทั้งชีต
+    df = read_projected_excel(file, rename_map, columns=list(dict.fromkeys(rename_map.values())))
 
-    # แปลงวันที่ให้เป็น datetime อย่างปลอดภัย
+    # แปลงวันที่ให้เป็น datetime อย่างปลอดภัย (แปลงเฉพาะค่าที่ไม่ซ้ำ รองรับ พ.ศ./Excel serial/เดือนไทย)
     for col in ["ShipDate", "IssueDate"]:
         if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce", dayfirst=True)
+            df[col], _ = parse_dates(df[col])
 
     # Month/Week ถ้ายังไม่มี จะคำนวณจาก ShipDate (หรือ IssueDate)
     if "Month" not in df.columns:
@@ -79,6 +292,12 @@ def top_defects(df: pd.DataFrame, top_n=10):
     )
 
 
+def watchlist_above_mean(sup_defect: pd.DataFrame, count_col="จำนวนเคส") -> pd.DataFrame:
+    # SUP + Defect ที่จำนวนเคสเกินค่าเฉลี่ย
+    threshold = sup_defect[count_col].mean()
+    return sup_defect[sup_defect[count_col] > threshold]
+
+
 def iqr_outliers(series: pd.Series):
     # ตรวจ outlier ด้วย IQR
     s = pd.to_numeric(series, errors="coerce")
@@ -93,19 +312,123 @@ def iqr_outliers(series: pd.Series):
 
 
 def risk_assessment_oct_q4(df: pd.DataFrame):
-    # วิเคราะห์เจาะจง October (เดือน 10) และ Q4 (ไตรมาส 4)
+    # วิเคราะห์เจาะจง October (เดือน 10) และ Q4 (ไตรมาส 4) จาก profile ที่สแกนครั้งเดียว
+    profile = get_profile(df)
     res = {}
-    if "Month" in df.columns:
-        res["Oct_Defects"] = int(df[df["Month"] == 10].shape[0])
-    if "Quarter" in df.columns:
-        res["Q4_Defects"] = int(df[df["Quarter"] == 4].shape[0])
+    if profile.month_counts is not None:
+        res["Oct_Defects"] = profile.month_total(10)
+    if profile.quarter_counts is not None:
+        res["Q4_Defects"] = profile.quarter_total(4)
     # วิเคราะห์ defect type ใน Oct/Q4
-    for label, cond in [("Oct", df["Month"] == 10 if "Month" in df.columns else None),
-                        ("Q4", df["Quarter"] == 4 if "Quarter" in df.columns else None)]:
-        if cond is not None and "Defect" in df.columns:
-            res[f"{label}_TopDefects"] = (
-                df[cond]["Defect"].value_counts().head(5).to_dict()
-            )
-        else:
-            res[f"{label}_TopDefects"] = {}
-    return res
\ No newline at end of file
+    has_defect = "Defect" in df.columns
+    res["Oct_TopDefects"] = profile.top_defects_in_month(10) if has_defect and profile.month_counts is not None else {}
+    res["Q4_TopDefects"] = profile.top_defects_in_quarter(4) if has_defect and profile.quarter_counts is not None else {}
+    return res
+
+
+# -----------------------------
+# ข้อความสรุปเชิงกลยุทธ์สำหรับผู้บริหาร (ต่อแถวของ watchlist)
+# -----------------------------
+# kind -> [(คำใน Defect, ข้อความต่อท้าย)] ตรวจตามลำดับ ไม่ตรงคำไหนใช้ข้อความ default
+STRATEGIC_ADVICE = {
+    "roll": [
+        ("ขอบ", "ในช่วงที่ผ่านมา SUP {sup} พบปัญหา “{defect}” จำนวน {count} ครั้ง "
+                "ซึ่งสะท้อนถึงความเสี่ยงด้านคุณภาพที่ควรได้รับการติดตามอย่างใกล้ชิด "
+                "ข้อเสนอเชิงกลยุทธ์คือการกำหนดมาตรการควบคุมคุณภาพเพิ่มเติม "
+                "และติดตามผลการปรับปรุงอย่างต่อเนื่องในรอบการผลิตถัดไป"),
+        ("คราบ", "ข้อมูลชี้ให้เห็นว่า SUP {sup} มีปัญหา “{defect}” เกิดขึ้น {count} ครั้ง "
+                 "แนวโน้มนี้อาจส่งผลต่อความน่าเชื่อถือของผลิตภัณฑ์ "
+                 "ข้อเสนอเชิงกลยุทธ์คือการยกระดับมาตรฐานการตรวจสอบความสะอาด "
+                 "และสร้างระบบติดตามผลเพื่อป้องกันการเกิดซ้ำ"),
+    ],
+    "sheet": [
+        ("ยับ", "SUP {sup} พบปัญหา “{defect}” จำนวน {count} ครั้ง "
+                "ซึ่งสะท้อนถึงความเสี่ยงด้านการจัดการวัสดุและการขนส่ง "
+                "ข้อเสนอเชิงกลยุทธ์คือการทบทวนขั้นตอนการจัดเก็บและการเคลื่อนย้ายภายในโรงงาน "
+                "รวมถึงกำหนดมาตรการควบคุมคุณภาพในจุดรับเข้า"),
+    ],
+}
+DEFAULT_STRATEGIC_ADVICE = (
+    "SUP {sup} พบปัญหา “{defect}” จำนวน {count} ครั้ง "
+    "ซึ่งควรได้รับการจัดลำดับความสำคัญในการแก้ไข "
+    "ข้อเสนอเชิงกลยุทธ์คือการทบทวนกระบวนการผลิตโดยรวม "
+    "และกำหนดมาตรการเชิงป้องกันในระยะกลางถึงยาว"
+)
+
+
+# จำนวน SUP (expander) และจำนวนข้อความต่อ SUP ที่แสดงในหน้า (จำกัดจำนวน element ไม่ว่า watchlist จะใหญ่แค่ไหน)
+SUMMARY_TOP_SUPS = 10
+SUMMARY_TOP_PER_SUP = 5
+
+
+def advice_template_index(kind: str, defects: pd.Series) -> np.ndarray:
+    # เลข template ต่อแถว (ตำแหน่งใน STRATEGIC_ADVICE[kind], len = default) ตรวจคำเฉพาะค่า Defect ที่ไม่ซ้ำ
+    rules = STRATEGIC_ADVICE.get(kind, [])
+    codes, uniques = pd.factorize(defects)
+    per_unique = np.fromiter(
+        (next((i for i, (word, _) in enumerate(rules) if word in str(u)), len(rules)) for u in uniques),
+        dtype=np.intp, count=len(uniques),
+    )
+    return np.append(per_unique, len(rules))[codes]
+
+
+def _fill_template(template: str, columns: dict) -> pd.Series:
+    # เติม {sup} / {defect} / {count} ทั้งคอลัมน์ด้วยการต่อ string แบบ vectorized
+    out = None
+    for literal, field, _, _ in string.Formatter().parse(template):
+        part = columns[field] if field else None
+        for piece in (literal, part):
+            if piece is None or (isinstance(piece, str) and not piece):
+                continue
+            out = piece if out is None else out + piece
+    return out
+
+
+def _value_text(values: pd.Series) -> pd.Series:
+    # str() ของแต่ละค่า (แปลงเฉพาะค่าที่ไม่ซ้ำ) ค่าว่างเป็นข้อความ "nan" เหมือน str.format
+    # (astype(str) ของ pandas 3 คงค่าว่างเป็น NaN ข้อความทั้งแถวจึงกลายเป็น NaN)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return pd.Series(np.array([str(u) for u in uniques], dtype=object)[codes])
+
+
+def executive_summary(watchlist: pd.DataFrame, kind: str, count_col="จำนวนเคส") -> list:
+    # ข้อความต่อแถวของ watchlist: เลือก template ต่อค่า Defect ที่ไม่ซ้ำ แล้วเติมทีละคอลัมน์ต่อ template
+    if watchlist.empty:
+        return []
+    columns = {
+        "sup": _value_text(watchlist["SUP"]),
+        "defect": _value_text(watchlist["Defect"]),
+        "count": _value_text(watchlist[count_col]),
+    }
+    templates = [text for _, text in STRATEGIC_ADVICE.get(kind, [])] + [DEFAULT_STRATEGIC_ADVICE]
+    which = advice_template_index(kind, watchlist["Defect"])
+    parts = [
+        _fill_template(templates[i], {k: v[which == i] for k, v in columns.items()})
+        for i in np.unique(which)
+    ]
+    return pd.concat(parts).sort_index().tolist()
+
+
+def executive_summary_sections(watchlist: pd.DataFrame, kind: str, count_col="จำนวนเคส",
+                               top_sups=SUMMARY_TOP_SUPS, top_per_sup=SUMMARY_TOP_PER_SUP) -> list:
+    # สรุปแยกตาม SUP: SUP ที่เคสรวมใน watchlist มากที่สุด top_sups ราย แต่ละรายข้อความของ Defect อันดับต้น top_per_sup
+    # สร้างข้อความเฉพาะแถวที่แสดง คืน [{sup, count, rows, advice, hidden}] เรียงตามเคสรวม
+    if watchlist.empty:
+        return []
+    totals = watchlist.groupby("SUP", observed=True, sort=False)[count_col].agg(["sum", "size"])
+    totals = totals.sort_values("sum", ascending=False, kind="stable").head(top_sups)
+    shown = watchlist[watchlist["SUP"].isin(totals.index)]
+    shown = shown.sort_values(count_col, ascending=False, kind="stable")
+    shown = shown[shown.groupby("SUP", observed=True).cumcount() < top_per_sup]
+    advice = pd.Series(executive_summary(shown, kind, count_col), index=shown.index)
+    grouped = advice.groupby(shown["SUP"], observed=True, sort=False).agg(list)
+    return [
+        {
+            "sup": sup,
+            "count": int(total),
+            "rows": int(size),
+            "advice": grouped[sup],
+            "hidden": int(size) - len(grouped[sup]),
+        }
+        for sup, (total, size) in totals.iterrows()
+    ]
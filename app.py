@@ -1,7 +1,12 @@
 import streamlit as st
 
+from warmup import start_prewarm
+
 st.set_page_config(page_title="📊 ระบบวิเคราะห์ข้อบกพร่อง", layout="wide")
 
+# หน้าแรก import แค่ streamlit ส่วน module ของหน้าวิเคราะห์โหลดใน background ระหว่างผู้ใช้เลือกเมนู
+start_prewarm()
+
 # -----------------------------
 # ส่วนหัว + โลโก้มุมขวาบน
 # -----------------------------
@@ -0,0 +1,172 @@
+import argparse
+import ast
+import datetime as dt
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+
+# -----------------------------
+# Benchmark เวลา import ตอน cold start (python -X importtime)
+# -----------------------------
+# วิธีใช้:
+#   python benchmarks/bench_imports.py
+#   python benchmarks/bench_imports.py --fail-on-regression   (ใช้ใน CI)
+#
+# แต่ละ target รันใน process ใหม่ (ไม่มี module ในหน่วยความจำ) ซ้ำ --repeat รอบแล้วใช้ค่าต่ำสุด
+#   landing     : import ของ app.py (หน้าแรกหลัง restart)
+#   page:<ไฟล์> : import ของแต่ละหน้าใน pages/ (อ่านจาก import ระดับบนของไฟล์)
+#   worker      : สิ่งที่ worker ของ process pool import ตอนเริ่ม (jobs)
+#   upload      : หน้า + สิ่งที่การอัปโหลดไฟล์แรกต้องใช้ (openpyxl อ่าน header ใน script thread)
+# regression = เกิน budget ของ target (IMPORT_BUDGET_MS) หรือช้ากว่าผลครั้งก่อนเกิน REGRESSION_RATIO เท่า
+# ผลบันทึกเป็น JSON ใน benchmarks/results/imports/ พร้อม module ที่ใช้เวลามากที่สุด
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results", "imports")
+REGRESSION_RATIO = 1.3
+# budget ของแต่ละ target (ms) target ที่ไม่มีในนี้ใช้ budget ของ "page"
+IMPORT_BUDGET_MS = {
+    "landing": 1500,
+    "page": 2500,
+    "worker": 2500,
+    "upload": 3000,
+}
+TOP_MODULES = 15
+
+
+def script_imports(path: str) -> list:
+    # คำสั่ง import ระดับบนของสคริปต์ (ไม่รวม import ที่อยู่ใน block ซึ่งเป็น lazy import อยู่แล้ว)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def targets() -> dict:
+    pages = {
+        f"page:{os.path.splitext(os.path.basename(p))[0]}": script_imports(p)
+        for p in sorted(glob.glob(os.path.join(ROOT, "pages", "*.py")))
+    }
+    first_page = next(iter(pages.values()), [])
+    return {
+        "landing": script_imports(os.path.join(ROOT, "app.py")),
+        **pages,
+        "worker": ["import jobs"],
+        "upload": first_page + ["import openpyxl"],
+    }
+
+
+def parse_importtime(stderr: str):
+    # คืน (ms รวม, {module: ms ของตัวเอง})
+    total = 0
+    self_us = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip() == "self [us]":
+            continue
+        if not name.startswith("  "):  # module ระดับบนสุด (ไม่ถูก import ซ้อนใน module อื่น)
+            total += int(cumulative)
+        self_us[name.strip()] = self_us.get(name.strip(), 0) + int(own)
+    return total / 1000, {k: v / 1000 for k, v in self_us.items()}
+
+
+def measure(statements: list, repeat=3) -> dict:
+    code = "\n".join(statements) or "pass"
+    # ไม่ให้ start_prewarm ที่อาจถูกเรียกตอน import ไปรบกวนการวัด
+    env = {**os.environ, "CLAIM_PREWARM": "0"}
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        total, modules = parse_importtime(proc.stderr)
+        if best is None or total < best[0]:
+            best = (total, modules)
+    total, modules = best
+    top = sorted(modules.items(), key=lambda kv: kv[1], reverse=True)[:TOP_MODULES]
+    return {"ms": round(total, 1), "top_modules": [[name, round(ms, 1)] for name, ms in top]}
+
+
+def budget_ms(target: str) -> float:
+    return IMPORT_BUDGET_MS.get(target, IMPORT_BUDGET_MS.get(target.split(":")[0], IMPORT_BUDGET_MS["page"]))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, path=None):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = path or os.path.join(RESULTS_DIR, f"{stamp}.json")
+    payload = {
+        "timestamp": stamp,
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def latest_results(exclude=None):
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    files = [f for f in files if os.path.abspath(f) != os.path.abspath(exclude or "")]
+    return files[-1] if files else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark เวลา import ตอน cold start")
+    parser.add_argument("--target", action="append", help="วัดเฉพาะ target นี้ (ระบุซ้ำได้)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", default=None, help="ไฟล์ผลที่จะเทียบ (ค่าเริ่มต้น = ผลล่าสุด)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    all_targets = targets()
+    names = args.target or list(all_targets)
+    previous_path = args.compare or latest_results()
+    previous = {}
+    if previous_path:
+        with open(previous_path, encoding="utf-8") as f:
+            previous = {r["target"]: r["ms"] for r in json.load(f)["results"]}
+
+    results = []
+    regression = False
+    print(f"{'target':<28}{'ms':>10}{'budget':>10}{'ก่อนหน้า':>12}")
+    for name in names:
+        result = {"target": name, **measure(all_targets[name], args.repeat), "budget_ms": budget_ms(name)}
+        before = previous.get(name)
+        result["regression"] = result["ms"] > result["budget_ms"] or (
+            before is not None and result["ms"] > before * REGRESSION_RATIO
+        )
+        regression |= result["regression"]
+        results.append(result)
+        flag = "  <-- regression" if result["regression"] else ""
+        print(f"{name:<28}{result['ms']:>10.1f}{result['budget_ms']:>10.0f}{before or '-':>12}{flag}")
+        if result["regression"]:
+            for module, ms in result["top_modules"][:5]:
+                print(f"    {module:<40}{ms:>8.1f} ms")
+
+    path = save_results(results)
+    print(f"\nบันทึกผล: {path}")
+    if args.fail_on_regression and regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+import argparse
+import datetime as dt
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from ai_rules import generate_ai_tips  # noqa: E402
+from analysis import (  # noqa: E402
+    columns_roll,
+    columns_sheet,
+    compact_claims,
+    iqr_outliers,
+    load_excel,
+    prepare_roll_claims,
+    prepare_sheet_claims,
+    rename_map_roll,
+    rename_map_sheet,
+    risk_assessment_oct_q4,
+)
+from cube import build_cube, rollup  # noqa: E402
+from defect_alias import DefectAliases, canonicalize_defects  # noqa: E402
+from excel_reader import read_projected_excel  # noqa: E402
+from forecast_cache import ForecastCache  # noqa: E402
+from forecasting import forecast_next_month  # noqa: E402
+from quantile_sketch import KLLSketch, max_rank_error, sketch_iqr_outliers  # noqa: E402
+from rule_engine import apply_rules  # noqa: E402
+
+from synth_claims import ensure_workbook  # noqa: E402
+
+# -----------------------------
+# Benchmark ของ pipeline วิเคราะห์เคลม
+# -----------------------------
+# ตัวอย่าง:
+#   python benchmarks/bench_pipeline.py --rows 10000 100000
+#   python benchmarks/bench_pipeline.py --rows 10000 --compare benchmarks/results/<ไฟล์ก่อนหน้า>.json
+#
+# จับเวลาแต่ละขั้นตอน + peak RSS ที่เพิ่มขึ้นระหว่างขั้นตอน แล้วบันทึกผลเป็น JSON ใน benchmarks/results/
+# เพื่อเทียบกับรอบก่อนหน้า (ค่าเริ่มต้นเทียบกับไฟล์ผลล่าสุด)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# ช้าลงเกินกี่เท่าถือว่า regression
+REGRESSION_RATIO = 1.2
+
+KINDS = {
+    "roll": (rename_map_roll, columns_roll, prepare_roll_claims),
+    "sheet": (rename_map_sheet, columns_sheet, prepare_sheet_claims),
+}
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakMemory:
+    # อ่าน RSS เป็นระยะใน thread แยก (ไม่ทำให้โค้ดที่วัดช้าลงเหมือน tracemalloc)
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.is_set():
+            rss = _rss_bytes()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+            time.sleep(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.start is not None:
+            self._thread.join()
+            rss = _rss_bytes()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    @property
+    def delta_mb(self):
+        if self.start is None:
+            return None
+        return round((self.peak - self.start) / 1024 / 1024, 2)
+
+
+def noisy_defects(defects: pd.Series, seed=0) -> pd.DataFrame:
+    # Defect ที่สะกดต่างกันแบบในไฟล์จริง: เว้นวรรคเกิน, วรรณยุกต์/การันต์หาย, เลขล็อตต่อท้าย (ค่าไม่ซ้ำจำนวนมาก)
+    rng = np.random.default_rng(seed)
+    text = defects.astype(str)
+    op = rng.integers(0, 4, len(text))
+    text = text.where(op != 1, text + " ")
+    text = text.where(op != 2, text.str.replace("[่-๋์]", "", regex=True))
+    lot = pd.Series(rng.integers(0, 5000, len(text)).astype(str), index=text.index)
+    text = text.where(op != 3, text + " ล็อต " + lot)
+    return pd.DataFrame({"Defect": text})
+
+
+def raw_groupbys(df):
+    # groupby ชุดเดิมของหน้า dashboard บนข้อมูลดิบ (ไว้เทียบกับ cube)
+    out = [
+        df.groupby("SUP", observed=True).size(),
+        df.groupby("Defect", observed=True).size(),
+        df.groupby(["MonthKey", "SUP"], observed=True).size(),
+        df.groupby(["MonthKey", "SUP", "Grade", "Defect"], observed=True).size(),
+        df.groupby(["Quarter", "SUP", "Grade", "Defect"], observed=True).size(),
+        df.groupby(["SUP", "Defect"], observed=True).size(),
+        df.groupby(["MonthKey", "SUP", "Defect"], observed=True).size(),
+        df.groupby(["Defect", "Grade", "SUP"], observed=True).size(),
+    ]
+    return out
+
+
+def cube_rollups(df):
+    cube = build_cube(df)
+    for keys in [
+        ["SUP"], ["Defect"], ["MonthKey", "SUP"], ["MonthKey", "SUP", "Grade", "Defect"],
+        ["Quarter", "SUP", "Grade", "Defect"], ["SUP", "Defect"], ["MonthKey", "SUP", "Defect"],
+        ["Defect", "Grade", "SUP"],
+    ]:
+        rollup(cube, keys)
+    return cube
+
+
+def run_stage(results, kind, n, stage, fn, rows=None):
+    with PeakMemory() as mem:
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+    rows = n if rows is None else rows
+    results.append({
+        "kind": kind,
+        "rows": n,
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(rows / seconds, 1) if seconds > 0 else None,
+        "peak_mb": mem.delta_mb,
+    })
+    print(f"  {kind:5s} {n:>9,} {stage:22s} {seconds:9.3f} s  peak +{mem.delta_mb} MB")
+    return value
+
+
+def bench_size(results, kind, n, with_load_excel=True, with_statsmodels=False):
+    path = ensure_workbook(DATA_DIR, kind, n)
+    rename_map, columns, prepare = KINDS[kind]
+
+    # load_excel เดิมรู้จักเฉพาะ header ของเคลมม้วน (วันที่ออก/วันที่ส่งของ)
+    if with_load_excel and kind == "roll":
+        run_stage(results, kind, n, "load_excel", lambda: load_excel(path))
+    raw = run_stage(results, kind, n, "read_projected_excel", lambda: read_projected_excel(path, rename_map, columns))
+    prepared = run_stage(results, kind, n, "prepare", lambda: prepare(raw.copy()))
+    df = run_stage(results, kind, n, "compact_claims", lambda: compact_claims(prepared))
+    run_stage(results, kind, n, "root_cause_rules", lambda: apply_rules(df[["Defect"]].copy(), kind))
+    # รวมชื่อ Defect ด้วย alias map ชั่วคราว: ครั้งแรกจัดกลุ่มค่าใหม่ด้วย MinHash LSH แล้วบันทึก (learn)
+    # ครั้งที่สองทุกค่าอยู่ใน alias map แล้ว (อ่านอย่างเดียว)
+    noisy = noisy_defects(df["Defect"])
+    with tempfile.TemporaryDirectory() as tmp:
+        aliases = DefectAliases(os.path.join(tmp, "aliases.sqlite"))
+        for name, learn in [("defect_alias_cold", True), ("defect_alias_warm", False)]:
+            out = run_stage(
+                results, kind, n, name, lambda: canonicalize_defects(noisy.copy(), kind, aliases=aliases, learn=learn)
+            )
+            results[-1]["distinct_before"] = int(noisy["Defect"].nunique())
+            results[-1]["distinct_after"] = int(out["Defect"].nunique())
+    run_stage(results, kind, n, "groupbys_raw", lambda: raw_groupbys(df))
+    cube = run_stage(results, kind, n, "cube_rollups", lambda: cube_rollups(df))
+    for col in ["Width", "Weight"]:
+        run_stage(results, kind, n, f"iqr_outliers_{col}", lambda: iqr_outliers(df[col]))
+        sketch = run_stage(
+            results, kind, n, f"kll_sketch_{col}", lambda: KLLSketch(seed=0).update(df[col].to_numpy())
+        )
+        # error ของ sketch ต้องไม่เกิน bound เมื่อเทียบกับ quantile จริง
+        error = max_rank_error(sketch, df[col].to_numpy())
+        results[-1]["rank_error"] = round(error, 5)
+        results[-1]["rank_error_bound"] = round(sketch.rank_error(), 5)
+        if error > sketch.rank_error():
+            raise AssertionError(f"{kind} {col}: rank error {error:.4f} เกิน bound {sketch.rank_error():.4f}")
+        run_stage(results, kind, n, f"kll_iqr_{col}", lambda: sketch_iqr_outliers(sketch))
+    run_stage(results, kind, n, "risk_assessment_oct_q4", lambda: risk_assessment_oct_q4(df))
+    run_stage(results, kind, n, "generate_ai_tips", lambda: generate_ai_tips(df))
+
+    monthly = rollup(cube, ["MonthKey", "SUP", "Defect"], "จำนวนเคส")
+    run_stage(results, kind, n, "forecast_numpy", lambda: forecast_next_month(monthly), rows=len(monthly))
+    # แคชพยากรณ์: ครั้งแรก fit ทุก series, ครั้งที่สองข้อมูลเดิมทั้งหมด (hit)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ForecastCache(os.path.join(tmp, "forecast.sqlite"))
+        for name in ["forecast_cache_cold", "forecast_cache_warm"]:
+            run_stage(results, kind, n, name, lambda: forecast_next_month(monthly, cache=cache), rows=len(monthly))
+    if with_statsmodels:
+        run_stage(
+            results, kind, n, "forecast_statsmodels",
+            lambda: forecast_next_month(monthly, method="statsmodels"), rows=len(monthly),
+        )
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, path=None):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = path or os.path.join(RESULTS_DIR, f"{stamp}.json")
+    payload = {
+        "timestamp": stamp,
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def latest_results(exclude=None):
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    files = [f for f in files if os.path.abspath(f) != os.path.abspath(exclude or "")]
+    return files[-1] if files else None
+
+
+def compare(current, previous_path, ratio=REGRESSION_RATIO) -> pd.DataFrame:
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)["results"]
+    keys = ["kind", "rows", "stage"]
+    now = pd.DataFrame(current)[keys + ["seconds", "peak_mb"]]
+    before = pd.DataFrame(previous)[keys + ["seconds", "peak_mb"]]
+    table = now.merge(before, on=keys, suffixes=("", "_prev"))
+    table["ratio"] = (table["seconds"] / table["seconds_prev"]).round(2)
+    table["regression"] = table["ratio"] > ratio
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline วิเคราะห์เคลม")
+    parser.add_argument("--kind", choices=list(KINDS), action="append")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--skip-load-excel", action="store_true", help="ไม่วัด analysis.load_excel (ช้าที่ 1M แถว)")
+    parser.add_argument("--statsmodels", action="store_true", help="วัด forecast แบบ statsmodels เดิมด้วย")
+    parser.add_argument("--compare", default=None, help="ไฟล์ผลที่จะเทียบ (ค่าเริ่มต้น = ผลล่าสุด)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = []
+    for kind in args.kind or ["roll", "sheet"]:
+        for n in args.rows:
+            bench_size(results, kind, n, not args.skip_load_excel, args.statsmodels)
+
+    previous = args.compare or latest_results()
+    path = save_results(results)
+    print(f"บันทึกผล: {path}")
+
+    if previous:
+        table = compare(results, previous)
+        print(f"\nเทียบกับ {previous}")
+        print(table.to_string(index=False))
+        if args.fail_on_regression and table["regression"].any():
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse
+import datetime as dt
+import os
+
+import numpy as np
+from openpyxl import Workbook
+
+# -----------------------------
+# สร้างไฟล์ Excel เคลมม้วน/เคลมแผ่นสังเคราะห์ สำหรับวัดประสิทธิภาพ
+# -----------------------------
+# - header ภาษาไทยตรงกับ rename_map ของแต่ละหน้า
+# - SUP / Defect กระจายแบบเบ้ (Zipf) มี Defect ที่สะกดต่างกันเล็กน้อย
+# - วันที่ปนหลายรูปแบบ: datetime, dd/mm/yyyy, yyyy-mm-dd, ปี พ.ศ., Excel serial, ค่าว่าง/ขยะ
+# - หน้ากว้าง/น้ำหนักมี outlier และค่าที่ไม่ใช่ตัวเลข
+# เขียนด้วย openpyxl write_only จึงสร้างไฟล์ 1 ล้านแถวได้โดยใช้หน่วยความจำคงที่
+
+ROLL_HEADER = [
+    "SUP", "เลขที่เอกสาร", "สิ่งที่ไม่เป็นไปตามข้อกำหนด", "เกรดแกรม", "วันที่ออก",
+    "หน้ากว้าง", "น้ำหนัก", "Lot", "Code", "หมายเหตุ", "ผู้ตรวจ", "กะ",
+]
+SHEET_HEADER = [
+    "SUPPLIER", "เลขที่ส่งของ", "สิ่งที่ไม่เป็นไปตามข้อกำหนด", "เกรดแกรม", "วันที่รับของ",
+    "MONTH", "QUARTER", "YEAR", "หน้ากว้าง", "น้ำหนัก", "Lot", "หมายเหตุ",
+]
+
+DEFECTS = [
+    "รอยยับ", "รอยยับ ", "ยับ ขอบม้วน", "ม้วนหย่อน", "คาเลนเดอร์", "คาร์เลนเดอร์", "Carlender",
+    "จุดดำ", "รอยเส้น", "สันนูน", "ขอบแตก", "ขอบม้วนไม่เรียบ", "คราบน้ำมัน", "คราบสกปรก",
+    "กระดาษฉีก", "ความชื้นเกิน", "สีเพี้ยน", "แกรมไม่ได้", "รูเข็ม", "ฝุ่นกระดาษ",
+]
+GRADES = ["KA125", "KA150", "KI125", "KI150", "KI185", "CA105", "CA125", "KT125", "KS230", 125, 150]
+REMARKS = ["", "รอตรวจสอบ", "แจ้ง SUP แล้ว", "รับคืน", "เปลี่ยนม้วน"]
+
+
+def zipf_choice(rng, n_items, size, a=1.3):
+    # เลือก index 0..n_items-1 แบบเบ้ (ตัวแรก ๆ ถูกเลือกบ่อย)
+    weights = 1.0 / np.arange(1, n_items + 1) ** a
+    return rng.choice(n_items, size=size, p=weights / weights.sum())
+
+
+def messy_dates(rng, n, start=dt.date(2022, 1, 1), days=3 * 365):
+    base = [start + dt.timedelta(days=int(d)) for d in rng.integers(0, days, n)]
+    kind = rng.choice(7, size=n, p=[0.45, 0.25, 0.1, 0.07, 0.07, 0.03, 0.03])
+    out = []
+    for d, k in zip(base, kind):
+        if k == 0:
+            out.append(dt.datetime(d.year, d.month, d.day))
+        elif k == 1:
+            out.append(d.strftime("%d/%m/%Y"))
+        elif k == 2:
+            out.append(d.strftime("%Y-%m-%d"))
+        elif k == 3:
+            # ปี พ.ศ.
+            out.append(f"{d.day:02d}/{d.month:02d}/{d.year + 543}")
+        elif k == 4:
+            # Excel serial number
+            out.append((d - dt.date(1899, 12, 30)).days)
+        elif k == 5:
+            out.append(None)
+        else:
+            out.append("-")
+    return out
+
+
+def messy_numbers(rng, n, mean, sd, outlier_rate=0.01, text_rate=0.002):
+    values = rng.normal(mean, sd, n).round(2).astype(object)
+    outliers = rng.random(n) < outlier_rate
+    values[outliers] = (rng.choice([-1, 1], outliers.sum()) * mean * rng.uniform(3, 10, outliers.sum())).round(2)
+    text = rng.random(n) < text_rate
+    values[text] = "n/a"
+    return values
+
+
+def generate_rows(kind, n, seed=0, n_sup=200):
+    rng = np.random.default_rng(seed)
+    sups = [f"SUP{i:03d}" for i in range(n_sup)]
+    sup_idx = zipf_choice(rng, n_sup, n)
+    defect_idx = zipf_choice(rng, len(DEFECTS), n, a=1.1)
+    grade_idx = rng.integers(0, len(GRADES), n)
+    dates = messy_dates(rng, n)
+    width = messy_numbers(rng, n, 150, 8)
+    weight = messy_numbers(rng, n, 800, 60)
+    lots = rng.integers(100000, 999999, n)
+    remarks = rng.choice(len(REMARKS), n)
+
+    for i in range(n):
+        sup = sups[sup_idx[i]]
+        defect = DEFECTS[defect_idx[i]]
+        grade = GRADES[grade_idx[i]]
+        if kind == "roll":
+            yield [
+                sup, f"DOC{i:08d}", defect, grade, dates[i], width[i], weight[i],
+                f"L{lots[i]}", f"C{defect_idx[i]:02d}", REMARKS[remarks[i]], f"QC{i % 17}", "ABC"[i % 3],
+            ]
+        else:
+            d = dates[i]
+            month = quarter = year = None
+            if isinstance(d, dt.datetime):
+                month, quarter, year = d.month, (d.month - 1) // 3 + 1, d.year
+            yield [
+                sup, f"SHP{i:08d}", defect, grade, d, month, quarter, year,
+                width[i], weight[i], f"L{lots[i]}", REMARKS[remarks[i]],
+            ]
+
+
+def write_workbook(path, kind, n, seed=0):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(ROLL_HEADER if kind == "roll" else SHEET_HEADER)
+    for row in generate_rows(kind, n, seed):
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+def workbook_path(data_dir, kind, n):
+    return os.path.join(data_dir, f"{kind}_{n}.xlsx")
+
+
+def ensure_workbook(data_dir, kind, n, seed=0):
+    # สร้างไฟล์เฉพาะครั้งแรก (ไฟล์ 1 ล้านแถวใช้เวลาหลายนาที)
+    path = workbook_path(data_dir, kind, n)
+    if not os.path.exists(path):
+        write_workbook(path, kind, n, seed)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างไฟล์เคลมสังเคราะห์")
+    parser.add_argument("--kind", choices=["roll", "sheet"], action="append")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for kind in args.kind or ["roll", "sheet"]:
+        for n in args.rows:
+            print(ensure_workbook(args.out, kind, n, args.seed))
+
+
+if __name__ == "__main__":
+    main()
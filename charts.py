@@ -0,0 +1,117 @@
+import logging
+import os
+
+import pandas as pd
+
+# -----------------------------
+# สร้างกราฟแบบจำกัดขนาด payload ที่ส่งไป browser
+# -----------------------------
+# - รวมข้อมูลฝั่ง server ก่อนพล็อต: เก็บ Top-N ของแต่ละมิติ ที่เหลือรวมเป็น "อื่น ๆ"
+# - จุดเกิน WEBGL_POINTS ใช้ WebGL (scattergl) แทน SVG
+# - แท่งเกิน TEXT_LABEL_LIMIT ไม่แสดง text บนแท่ง (ยังดูค่าได้จาก hover)
+# - ถ้า JSON ของกราฟยังเกิน MAX_BYTES จะลด N ลงครึ่งหนึ่งจนกว่าจะอยู่ใน budget
+# - ถึง MIN_TOP_N แล้วยังเกิน: สร้างแบบ lean (ไม่มี text, เส้นใช้ WebGL) แล้วตัด hover/template
+#   ถ้ายังเกินอีกจะ log warning (logger "claim_dashboard.charts") และตั้ง meta["over_budget"]
+# plotly.express import ตอนสร้างกราฟครั้งแรก (ใช้เวลาหลายร้อย ms, warmup.py โหลดไว้ล่วงหน้า)
+OTHER = "อื่น ๆ"
+TOP_N = int(os.environ.get("CLAIM_CHART_TOP_N", "15"))
+MIN_TOP_N = 3
+MAX_BYTES = int(os.environ.get("CLAIM_CHART_MAX_KB", "500")) * 1024
+WEBGL_POINTS = 1000
+TEXT_LABEL_LIMIT = 60
+
+logger = logging.getLogger("claim_dashboard.charts")
+
+
+def fold_top_n(df: pd.DataFrame, key: str, value: str, n=TOP_N, other=OTHER) -> pd.DataFrame:
+    # เก็บ n ค่าของ key ที่ผลรวม value สูงสุด ที่เหลือรวมเป็น other แล้วรวมยอดใหม่ตามคอลัมน์อื่น
+    totals = df.groupby(key, observed=True)[value].sum()
+    if len(totals) <= n:
+        return df
+    keep = totals.nlargest(n).index
+    df = df.copy()
+    labels = df[key].astype(str)
+    df[key] = labels.where(df[key].isin(keep), other)
+    dims = [c for c in df.columns if c != value]
+    out = df.groupby(dims, observed=True, sort=False)[value].sum().reset_index()
+    # ให้ "อื่น ๆ" อยู่ท้ายสุด ที่เหลือเรียงตามยอดรวม
+    order = [str(k) for k in keep] + [other]
+    out[key] = pd.Categorical(out[key], categories=order, ordered=True)
+    return out.sort_values(key, kind="stable")
+
+
+def figure_nbytes(fig) -> int:
+    return len(fig.to_json().encode("utf-8"))
+
+
+def budgeted(build, n=TOP_N, max_bytes=MAX_BYTES):
+    # build(n, lean) -> figure; ลด n ลงจน JSON ไม่เกิน max_bytes (หรือถึง MIN_TOP_N)
+    fig = build(n, False)
+    size = figure_nbytes(fig)
+    while size > max_bytes and n > MIN_TOP_N:
+        n = max(MIN_TOP_N, n // 2)
+        fig = build(n, False)
+        size = figure_nbytes(fig)
+    lean = size > max_bytes
+    if lean:
+        fig = build(n, True)
+        size = figure_nbytes(fig)
+    if size > max_bytes:
+        # template เริ่มต้นของ plotly เป็นส่วนใหญ่ของ JSON กราฟเล็ก (Streamlit ใส่ธีมของตัวเองทับอยู่แล้ว)
+        fig.update_traces(hovertemplate=None, hoverinfo="skip")
+        fig.update_layout(template="none")
+        size = figure_nbytes(fig)
+    over_budget = size > max_bytes
+    if over_budget:
+        logger.warning("chart payload %d bytes exceeds budget %d bytes at top_n=%d", size, max_bytes, n)
+    fig.layout.meta = {"payload_bytes": size, "top_n": n, "lean": lean, "over_budget": over_budget}
+    return fig
+
+
+def line_chart(df: pd.DataFrame, x: str, y: str, color: str, n=TOP_N, max_bytes=MAX_BYTES, **kwargs):
+    # เส้นละหนึ่งค่าของ color (เช่น SUP) -> เก็บ Top-N เส้น ที่เหลือรวมเป็น "อื่น ๆ"
+    import plotly.express as px
+
+    def build(n, lean):
+        data = fold_top_n(df[[x, color, y]], color, y, n).sort_values(x, kind="stable")
+        render_mode = "webgl" if lean or len(data) > WEBGL_POINTS else "svg"
+        return px.line(data, x=x, y=y, color=color, render_mode=render_mode, **kwargs)
+
+    return budgeted(build, n, max_bytes)
+
+
+def bar_chart(df: pd.DataFrame, x: str, y: str, color=None, text=None, facet_col=None,
+              n=TOP_N, n_color=TOP_N, max_bytes=MAX_BYTES, **kwargs):
+    # รวม Top-N ของแกน x และของ color แยกกัน, ตัด text บนแท่งเมื่อแท่งหนาแน่นเกินไป
+    import plotly.express as px
+
+    def build(n, lean):
+        # text=y (แสดงยอดบนแท่ง) ไม่ใช่มิติ ไม่ต้องรวม Top-N และไม่เลือกคอลัมน์ซ้ำ
+        cols = list(dict.fromkeys(c for c in [x, color, text, facet_col] if c and c != y))
+        data = df[cols + [y]]
+        if text and text not in (x, color, facet_col, y):
+            # text ที่เป็นอีกมิติหนึ่ง (เช่น Defect) ทำให้แท่งแตกย่อย -> รวมเป็น Top-N เหมือนกัน
+            data = fold_top_n(data, text, y, n)
+        data = fold_top_n(data, x, y, n)
+        if color and color != x:
+            data = fold_top_n(data, color, y, min(n, n_color))
+        show_text = text if text and not lean and len(data) <= TEXT_LABEL_LIMIT else None
+        return px.bar(data, x=x, y=y, color=color, text=show_text, facet_col=facet_col, **kwargs)
+
+    return budgeted(build, n, max_bytes)
+
+
+def pie_chart(df: pd.DataFrame, names: str, values: str, n=12, max_bytes=MAX_BYTES, text_options=None, **kwargs):
+    # text_options: ตัวเลือก text ของ trace (เช่น textinfo="percent+label") ใช้เฉพาะตอนที่ไม่ใช่แบบ lean
+    import plotly.express as px
+
+    def build(n, lean):
+        data = fold_top_n(df[[names, values]], names, values, n)
+        fig = px.pie(data, names=names, values=values, **kwargs)
+        if lean:
+            fig.update_traces(textinfo="none")
+        elif text_options:
+            fig.update_traces(**text_options)
+        return fig
+
+    return budgeted(build, n, max_bytes)
@@ -0,0 +1,213 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from ai_rules import generate_ai_tips
+from analysis import risk_assessment_oct_q4, watchlist_above_mean
+from cube import build_cube, nunique, rollup, total_count
+from defect_alias import get_aliases
+from forecasting import forecast_next_month
+from ingest_cache import CACHE_DIR, IngestCache, load_workbook_claims
+from quantile_sketch import KLLSketch, merge_sketches, sketch_iqr_outliers
+
+# -----------------------------
+# วิเคราะห์เคลมแบบ batch จาก command line (ไม่ต้องเปิด Streamlit)
+# -----------------------------
+# ตัวอย่าง:
+#   python claim_batch.py archive/ --kind roll --out reports/ --workers 4 --format csv --format parquet
+#
+# แต่ละไฟล์ถูกประมวลผลใน process แยก (worker รับทีละไฟล์และถูกสร้างใหม่ทุก N ไฟล์
+# เพื่อจำกัดหน่วยความจำ) ผลรายไฟล์อยู่ใน <out>/<ชื่อไฟล์>/ และผลรวมอยู่ใน <out>/_combined/
+
+FORMATS = ("csv", "parquet", "json")
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    return str(value)
+
+
+def write_json(obj, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2, default=_json_default)
+
+
+def write_table(df: pd.DataFrame, out_dir: str, name: str, formats):
+    for fmt in formats:
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if fmt == "csv":
+            # utf-8-sig ให้ Excel เปิดภาษาไทยได้ถูกต้อง
+            df.to_csv(path, index=False, encoding="utf-8-sig")
+        elif fmt == "parquet":
+            df.to_parquet(path, index=False)
+        elif fmt == "json":
+            df.to_json(path, orient="records", force_ascii=False, indent=2)
+
+
+def analyze_cube(cube: pd.DataFrame) -> dict:
+    # ตารางสรุปชุดเดียวกับหน้า dashboard จาก count cube
+    sup_defect = rollup(cube, ["SUP", "Defect"], "จำนวนเคส").sort_values("จำนวนเคส", ascending=False)
+    monthly = rollup(cube, ["MonthKey", "SUP", "Defect"], "จำนวนเคส")
+    return {
+        "kpi": {
+            "rows": total_count(cube),
+            "suppliers": nunique(cube, "SUP"),
+            "defect_types": nunique(cube, "Defect"),
+        },
+        "tables": {
+            "monthly_sup_grade": rollup(cube, ["MonthKey", "SUP", "Grade", "Defect"], "จำนวนเคส"),
+            "quarterly_sup_grade": rollup(cube, ["Quarter", "SUP", "Grade", "Defect"], "จำนวนเคส"),
+            "root_cause": rollup(cube, ["SUP", "RootCause"], "จำนวนเคส"),
+            "watchlist": watchlist_above_mean(sup_defect),
+            "forecast": forecast_next_month(monthly),
+        },
+    }
+
+
+def process_file(path: str, kind: str, out_dir: str, formats, cache_dir=None) -> dict:
+    # ทำงานใน worker process: อ่าน -> prepare -> cube -> watchlist/forecast/tips แล้วเขียนผลรายไฟล์
+    start = time.perf_counter()
+    # ไม่เก็บ DataFrame ไว้ในหน่วยความจำของ worker (max_bytes=0) ใช้เฉพาะแคช Parquet บนดิสก์
+    # ชื่อ Defect ตาม alias map ของหน้าเว็บแบบอ่านอย่างเดียว (batch ไม่บันทึกรูปแบบใหม่)
+    cache = IngestCache(cache_dir=cache_dir or CACHE_DIR, max_bytes=0, aliases=get_aliases())
+    df = load_workbook_claims(path, kind, cache=cache)
+    cube = build_cube(df)
+    result = analyze_cube(cube)
+
+    summary = {
+        "file": path,
+        "kind": kind,
+        **result["kpi"],
+        "risk_oct_q4": risk_assessment_oct_q4(df),
+        "ai_tips": generate_ai_tips(df),
+    }
+    # quantile sketch ของ Width/Weight ส่งกลับไป merge เป็น IQR fence ของทุกไฟล์รวมกัน
+    sketches = {
+        col: KLLSketch(seed=0).update(df[col].to_numpy()).to_bytes()
+        for col in ["Width", "Weight"] if col in df.columns
+    }
+    del df
+
+    file_dir = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(file_dir, exist_ok=True)
+    for name, table in result["tables"].items():
+        write_table(table, file_dir, name, formats)
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    write_json(summary, os.path.join(file_dir, "summary.json"))
+    return {"summary": summary, "cube": cube, "sketches": sketches}
+
+
+def collect_inputs(inputs) -> list:
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(sorted(glob.glob(os.path.join(item, "**", "*.xlsx"), recursive=True)))
+        else:
+            files.extend(sorted(glob.glob(item)))
+    # ข้ามไฟล์ lock ของ Excel (~$xxx.xlsx)
+    return [f for f in dict.fromkeys(files) if not os.path.basename(f).startswith("~$")]
+
+
+def run_batch(files, kind, out_dir, workers=None, formats=("csv",), tasks_per_worker=4, cache_dir=None) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    summaries, cubes, errors = [], [], []
+    sketches = {}
+
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=tasks_per_worker) as pool:
+        futures = {
+            pool.submit(process_file, path, kind, out_dir, formats, cache_dir): path for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                res = future.result()
+            except Exception as e:
+                errors.append({"file": path, "error": f"{type(e).__name__}: {e}"})
+                print(f"❌ {path}: {e}", file=sys.stderr)
+                continue
+            summaries.append(res["summary"])
+            cubes.append(res["cube"].assign(source=os.path.basename(path)))
+            for col, blob in res["sketches"].items():
+                sketches.setdefault(col, []).append(KLLSketch.from_bytes(blob))
+            print(f"✅ {path}: {res['summary']['rows']:,} แถว ใน {res['summary']['seconds']:.2f} s")
+
+    elapsed = time.perf_counter() - start
+    total_rows = sum(s["rows"] for s in summaries)
+    combined_dir = os.path.join(out_dir, "_combined")
+    os.makedirs(combined_dir, exist_ok=True)
+
+    combined = {}
+    if cubes:
+        # cube ของแต่ละไฟล์มีขนาดเล็ก จึงรวมกันแล้ว roll-up ใหม่ได้โดยไม่ต้องอ่านข้อมูลดิบซ้ำ
+        all_cubes = pd.concat(cubes, ignore_index=True)
+        write_table(all_cubes, combined_dir, "cube", formats)
+        result = analyze_cube(all_cubes.drop(columns="source"))
+        for name, table in result["tables"].items():
+            write_table(table, combined_dir, name, formats)
+        combined = result["kpi"]
+    for col, parts in sketches.items():
+        outliers, (low, high) = sketch_iqr_outliers(merge_sketches(parts))
+        combined[f"{col}_iqr_outliers"] = {"count": outliers, "low": low, "high": high}
+
+    report = {
+        "kind": kind,
+        "files": len(files),
+        "succeeded": len(summaries),
+        "failed": errors,
+        "rows": total_rows,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(summaries) / elapsed, 3) if elapsed else None,
+        "rows_per_second": round(total_rows / elapsed, 1) if elapsed else None,
+        "combined": combined,
+        "per_file": sorted(summaries, key=lambda s: s["file"]),
+    }
+    write_json(report, os.path.join(combined_dir, "summary.json"))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="วิเคราะห์ไฟล์เคลม Excel หลายไฟล์แบบ batch")
+    parser.add_argument("inputs", nargs="+", help="ไฟล์ .xlsx, glob หรือโฟลเดอร์")
+    parser.add_argument("--kind", choices=["roll", "sheet"], default="roll", help="ประเภทเคลม (ม้วน/แผ่น)")
+    parser.add_argument("--out", default="reports", help="โฟลเดอร์ผลลัพธ์")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน process (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--format", dest="formats", action="append", choices=FORMATS,
+                        help="รูปแบบไฟล์ตาราง (ระบุได้หลายครั้ง, ค่าเริ่มต้น csv)")
+    parser.add_argument("--tasks-per-worker", type=int, default=4,
+                        help="จำนวนไฟล์ต่อ worker ก่อนสร้าง process ใหม่ (คืนหน่วยความจำ)")
+    parser.add_argument("--cache-dir", default=None, help="โฟลเดอร์แคช Parquet ของไฟล์ที่อ่านแล้ว")
+    args = parser.parse_args(argv)
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        parser.error("ไม่พบไฟล์ .xlsx")
+
+    report = run_batch(
+        files, args.kind, args.out,
+        workers=args.workers,
+        formats=args.formats or ["csv"],
+        tasks_per_worker=args.tasks_per_worker,
+        cache_dir=args.cache_dir,
+    )
+    print(
+        f"📊 {report['succeeded']}/{report['files']} ไฟล์, {report['rows']:,} แถว ใน {report['seconds']:.2f} s "
+        f"({report['files_per_second']} files/s, {report['rows_per_second']:,} rows/s)"
+    )
+    return 0 if not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from rule_engine import apply_rules
+from cube import COUNT, CUBE_KEYS
+from ingest_cache import file_digest, load_workbook_claims
+from quantile_sketch import KLLSketch, merge_sketches, sketch_iqr_outliers
+
+# -----------------------------
+# คลังข้อมูลเคลมสะสม (SQLite ไฟล์เดียว)
+# -----------------------------
+# - claims_<kind>: แถวเคลมที่ผ่าน prepare แล้ว, upsert ด้วย row_key กันข้อมูลซ้ำ
+# - cube_<kind>:   count cube ที่คำนวณไว้ล่วงหน้า อัปเดตเฉพาะเดือนที่มีแถวใหม่/แถวที่ถูกแทนที่
+# - sketch_<kind>: KLL quantile sketch ของ Width/Weight ต่อ (เดือน, SUP) และ (เดือน, Grade)
+#                  merge ข้ามเดือนได้ทันที ใช้หา IQR fence ของ slice ใดก็ได้โดยไม่ต้องโหลดแถวดิบ
+# - ingested_files: hash ของไฟล์ที่เคยนำเข้าแล้ว (อัปโหลดไฟล์เดิมซ้ำจะไม่ parse ใหม่)
+# - cube_version:   เลขที่เพิ่มทุกครั้งที่ cube ของ kind เปลี่ยน load_cube จึงคืน cube เดิมจากหน่วยความจำได้
+#                   (index ของตัวกรองที่สร้างจาก cube นั้นก็ใช้ซ้ำได้ทุก rerun)
+# - week_<kind>:    จำนวนเคสรายสัปดาห์ต่อ (สัปดาห์, SUP, Defect) สัปดาห์ = วันจันทร์ของสัปดาห์ ISO ("YYYY-MM-DD")
+#                   อัปเดตพร้อม cube เฉพาะสัปดาห์ที่คาบเกี่ยวเดือนที่ได้รับผลกระทบ (ใช้กับ control_monitor)
+# - week_dirty:     สัปดาห์แรกที่จำนวนเคสเปลี่ยนตั้งแต่ monitor ประมวลผลครั้งล่าสุด
+#                   (ถ้าเปลี่ยนย้อนหลังก่อนสัปดาห์ที่ monitor ประมวลผลไปแล้ว monitor ต้องเริ่มใหม่)
+STORE_PATH = os.environ.get(
+    "CLAIM_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".claim_store", "claims.sqlite"),
+)
+
+KINDS = ("roll", "sheet")
+
+STORE_COLUMNS = [
+    "SUP", "Defect", "Grade", "Date", "MonthKey", "Month", "Quarter", "Year",
+    "Width", "Weight", "DocNo", "ShipNo", "Lot", "RootCause", "Advice",
+    # ข้อความ Defect เดิมก่อนรวมเป็นชื่อมาตรฐาน (เพิ่มทีหลัง จึงอยู่ท้ายสุดตามลำดับคอลัมน์ของตารางเดิม)
+    "DefectRaw",
+]
+
+# คอลัมน์ที่ใช้ระบุเอกสาร (ใช้ตัวแรกที่มีค่า)
+ID_COLUMNS = ["DocNo", "ShipNo", "Lot"]
+
+# คอลัมน์ตัวเลขที่เก็บ quantile sketch และมิติที่แยก sketch ("*" = ทุกแถวรวมกัน)
+SKETCH_COLUMNS = ["Width", "Weight"]
+SKETCH_DIMENSIONS = ["*", "SUP", "Grade"]
+
+# รูปแบบของ row_key (เก็บใน PRAGMA user_version) คลังที่สร้างด้วยรูปแบบเก่าจะถูกคำนวณ key ใหม่ตอนเปิด
+ROW_KEY_VERSION = 3
+KEY_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# วันจันทร์ของสัปดาห์ของ "Date" ('weekday 0' = วันอาทิตย์ถัดไปหรือวันนั้นเอง)
+WEEK_SQL = """date("Date", 'weekday 0', '-6 days')"""
+
+
+def _key_text(value) -> str:
+    # ข้อความของค่าเดี่ยวที่ไม่ขึ้นกับ dtype ของคอลัมน์ (ไฟล์หนึ่งอาจอ่าน DocNo เป็น int อีกไฟล์เป็น float/object)
+    # วันที่ใช้รูปแบบคงที่, ตัวเลขที่เป็นจำนวนเต็มเขียนแบบ int, ทศนิยมใช้ repr ของ float, ค่าว่างเป็น ""
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, (datetime, np.datetime64)):
+        return pd.Timestamp(value).strftime(KEY_DATE_FORMAT)
+    return str(value)
+
+
+def _key_strings(values: pd.Series) -> pd.Series:
+    # _key_text ทีละค่าที่ไม่ซ้ำ (factorize ตัดค่าว่างทุกชนิดออกเป็น code -1)
+    codes, uniques = pd.factorize(values.astype(object))
+    texts = np.array([_key_text(u) for u in uniques] + [""], dtype=object)
+    return pd.Series(texts[codes], index=values.index)
+
+
+def row_keys(df: pd.DataFrame) -> pd.Series:
+    # key = กลุ่ม (DocNo/ShipNo/Lot, วันที่) ถ้าไม่มีเลขเอกสารใช้กลุ่ม (SUP, วันที่) ต่อท้ายด้วยลำดับของแถวในกลุ่ม
+    # เนื้อหาแถว (Defect, หน้ากว้าง ฯลฯ) ไม่อยู่ใน key: ไฟล์สะสมที่แก้ข้อความแล้วอัปโหลดซ้ำจึงแทนที่แถวเดิม
+    # ทุกค่าผ่าน _key_text ก่อน key จึงเท่ากันไม่ว่า pandas/SQLite จะอ่านคอลัมน์เป็น dtype อะไร
+    ident = pd.Series(None, index=df.index, dtype=object)
+    for col in reversed([c for c in ID_COLUMNS if c in df.columns]):
+        values = df[col]
+        ident = _key_strings(values).where(values.notna(), ident)
+
+    if "Date" in df.columns:
+        date = df["Date"].dt.strftime("%Y-%m-%d").fillna("")
+    else:
+        date = pd.Series("", index=df.index)
+    sup = _key_strings(df["SUP"]) if "SUP" in df.columns else ""
+
+    group = ("id:" + ident.fillna("") + "|" + date).where(ident.notna(), "sup:" + sup + "|" + date)
+    occurrence = group.groupby(group, sort=False).cumcount().astype(str)
+    return group + "#" + occurrence
+
+
+def row_group(key: str) -> str:
+    # กลุ่มของ row_key (ตัดลำดับในกลุ่มออก)
+    return key.rpartition("#")[0]
+
+
+def _to_records(df: pd.DataFrame) -> list:
+    out = pd.DataFrame({"row_key": row_keys(df)}, index=df.index)
+    for col in STORE_COLUMNS:
+        if col not in df.columns:
+            out[col] = None
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            out[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            out[col] = df[col]
+    out = out.astype(object).where(out.notna(), None)
+    return list(out.itertuples(index=False, name=None))
+
+
+class ClaimStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            for kind in KINDS:
+                self._create_tables(con, kind)
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS ingested_files ("
+                "digest TEXT, kind TEXT, name TEXT, rows INTEGER, "
+                "ingested_at TEXT DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (digest, kind))"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS cube_version (kind TEXT PRIMARY KEY, version INTEGER)")
+            con.execute("CREATE TABLE IF NOT EXISTS week_dirty (kind TEXT PRIMARY KEY, week TEXT)")
+            if con.execute("PRAGMA user_version").fetchone()[0] < ROW_KEY_VERSION:
+                for kind in KINDS:
+                    self._rekey(con, kind)
+                con.execute(f"PRAGMA user_version = {ROW_KEY_VERSION}")
+        # kind -> (version, cube) ที่โหลดล่าสุด
+        self._cubes = {}
+
+    def _connect(self):
+        # เปิด connection ใหม่ทุกครั้ง (Streamlit รันแต่ละ session คนละ thread)
+        return sqlite3.connect(self.path, timeout=60)
+
+    @staticmethod
+    def _create_tables(con, kind):
+        cols = ", ".join(f'"{c}"' for c in STORE_COLUMNS)
+        con.execute(f"CREATE TABLE IF NOT EXISTS claims_{kind} (row_key TEXT PRIMARY KEY, {cols})")
+        # คลังที่สร้างก่อนมีคอลัมน์ใหม่ใน STORE_COLUMNS
+        existing = {r[1] for r in con.execute(f"PRAGMA table_info(claims_{kind})")}
+        for col in STORE_COLUMNS:
+            if col not in existing:
+                con.execute(f'ALTER TABLE claims_{kind} ADD COLUMN "{col}"')
+        con.execute(f'CREATE INDEX IF NOT EXISTS idx_claims_{kind}_month ON claims_{kind} ("MonthKey")')
+        keys = ", ".join(f'"{c}"' for c in CUBE_KEYS)
+        con.execute(f'CREATE TABLE IF NOT EXISTS cube_{kind} ({keys}, "{COUNT}" INTEGER)')
+        con.execute(f'CREATE INDEX IF NOT EXISTS idx_cube_{kind}_month ON cube_{kind} ("MonthKey")')
+        con.execute(
+            f'CREATE TABLE IF NOT EXISTS sketch_{kind} '
+            f'(col TEXT, dim TEXT, key TEXT, "MonthKey" TEXT, n INTEGER, data BLOB)'
+        )
+        con.execute(f'CREATE INDEX IF NOT EXISTS idx_sketch_{kind} ON sketch_{kind} (col, dim, key)')
+        con.execute(f'CREATE INDEX IF NOT EXISTS idx_sketch_{kind}_month ON sketch_{kind} ("MonthKey")')
+        con.execute(f'CREATE TABLE IF NOT EXISTS week_{kind} ("Week" TEXT, "SUP", "Defect", "{COUNT}" INTEGER)')
+        con.execute(f'CREATE INDEX IF NOT EXISTS idx_week_{kind} ON week_{kind} ("Week")')
+
+    @staticmethod
+    def _rekey(con, kind):
+        # คลังที่สร้างด้วย row_key รูปแบบเก่า: คำนวณ key ใหม่จากแถวที่เก็บไว้ตามลำดับที่นำเข้า
+        # แถวในคลังและ cube ไม่เปลี่ยน
+        cols = ", ".join(f'"{c}"' for c in STORE_COLUMNS)
+        df = pd.read_sql_query(f"SELECT rowid AS _rowid, {cols} FROM claims_{kind} ORDER BY rowid", con)
+        if df.empty:
+            return
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+        keys = row_keys(df)
+        # เปลี่ยน key เดิมทั้งหมดก่อน กัน primary key ชนกันระหว่าง key เก่ากับ key ใหม่
+        con.execute(f"UPDATE claims_{kind} SET row_key = '~' || row_key")
+        con.executemany(
+            f"UPDATE claims_{kind} SET row_key = ? WHERE rowid = ?",
+            zip(keys.tolist(), df["_rowid"].tolist()),
+        )
+
+    # ---------- นำเข้า ----------
+    def is_ingested(self, digest: str, kind: str) -> bool:
+        with closing(self._connect()) as con:
+            row = con.execute(
+                "SELECT 1 FROM ingested_files WHERE digest = ? AND kind = ?", (digest, kind)
+            ).fetchone()
+        return row is not None
+
+    def ingest(self, file, kind: str, name=None, cache=None) -> int:
+        # นำเข้าไฟล์ Excel ลงคลัง คืนจำนวนแถวที่เพิ่ม/อัปเดต (0 = เคยนำเข้าไฟล์นี้แล้ว)
+        # cache = IngestCache ที่ใช้อ่านไฟล์ (กำหนด alias map ของชื่อ Defect)
+        digest = file_digest(file)
+        if self.is_ingested(digest, kind):
+            return 0
+        df = load_workbook_claims(file, kind, cache=cache, digest=digest)
+        rows = self.upsert(df, kind)
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO ingested_files (digest, kind, name, rows) VALUES (?, ?, ?, ?)",
+                (digest, kind, name or getattr(file, "name", str(file)), rows),
+            )
+        return rows
+
+    def upsert(self, df: pd.DataFrame, kind: str) -> int:
+        # upsert แถวที่ prepare แล้ว และอัปเดต cube เฉพาะเดือนที่ได้รับผลกระทบ
+        # ไฟล์คือข้อมูลล่าสุดของทุกกลุ่ม row_key ที่มีในไฟล์: แถวเดิมของกลุ่มเหล่านั้นถูกลบก่อนใส่ใหม่
+        # (แถวที่แก้หรือถูกลบออกจากไฟล์สะสมจึงไม่ค้างในคลัง)
+        # ต้นทุน = O(แถวใหม่ + แถวในเดือนที่ถูกแตะ) ไม่ใช่ O(ประวัติทั้งหมด)
+        if df.empty:
+            return 0
+        records = _to_records(df)
+        groups = {row_group(r[0]) for r in records}
+        placeholders = ", ".join("?" for _ in range(len(STORE_COLUMNS) + 1))
+        cols = ", ".join(f'"{c}"' for c in STORE_COLUMNS)
+
+        with closing(self._connect()) as con, con:
+            con.execute("DROP TABLE IF EXISTS temp.staging")
+            con.execute(f"CREATE TEMP TABLE staging (row_key TEXT PRIMARY KEY, {cols})")
+            con.executemany(f"INSERT OR REPLACE INTO staging VALUES ({placeholders})", records)
+            con.execute("DROP TABLE IF EXISTS temp.row_groups")
+            con.execute("CREATE TEMP TABLE row_groups (grp TEXT PRIMARY KEY)")
+            con.executemany("INSERT INTO row_groups VALUES (?)", [(g,) for g in groups])
+            # แถวเดิมของกลุ่ม = key "<กลุ่ม>#<ตัวเลข>" (ช่วงของ primary key จึงใช้ index ได้)
+            replaced = (
+                f"SELECT c.row_key FROM row_groups g JOIN claims_{kind} c "
+                f"ON c.row_key > g.grp || '#' AND c.row_key < g.grp || '$' "
+                f"AND substr(c.row_key, length(g.grp) + 2) NOT GLOB '*[^0-9]*'"
+            )
+
+            # เดือนที่ได้รับผลกระทบ = เดือนของแถวใหม่ + เดือนเดิมของแถวที่จะถูกแทนที่
+            affected = [
+                r[0] for r in con.execute(
+                    f'SELECT DISTINCT "MonthKey" FROM staging '
+                    f'UNION SELECT DISTINCT "MonthKey" FROM claims_{kind} WHERE row_key IN ({replaced})'
+                )
+            ]
+            con.execute(f"DELETE FROM claims_{kind} WHERE row_key IN ({replaced})")
+            con.execute(f"INSERT OR REPLACE INTO claims_{kind} SELECT * FROM staging")
+            self._refresh_cube(con, kind, affected)
+            con.execute("DROP TABLE temp.staging")
+            con.execute("DROP TABLE temp.row_groups")
+        return len(records)
+
+    @staticmethod
+    def _month_filter(con, months):
+        con.execute("DROP TABLE IF EXISTS temp.affected")
+        con.execute("CREATE TEMP TABLE affected (MonthKey TEXT)")
+        con.executemany("INSERT INTO affected VALUES (?)", [(m,) for m in months])
+        # ใช้ IS เพื่อให้จับคู่เดือนที่เป็น NULL (แถวที่ไม่มีวันที่) ได้ด้วย
+        month_filter = '"MonthKey" IN (SELECT MonthKey FROM affected)'
+        if None in months:
+            month_filter += ' OR "MonthKey" IS NULL'
+        return month_filter
+
+    @classmethod
+    def _refresh_cube(cls, con, kind, months):
+        keys = ", ".join(f'"{c}"' for c in CUBE_KEYS)
+        month_filter = cls._month_filter(con, months)
+        con.execute(f"DELETE FROM cube_{kind} WHERE {month_filter}")
+        con.execute(
+            f'INSERT INTO cube_{kind} SELECT {keys}, COUNT(*) FROM claims_{kind} '
+            f"WHERE {month_filter} GROUP BY {keys}"
+        )
+        cls._refresh_sketches(con, kind, month_filter)
+        cls._refresh_weeks(con, kind, month_filter)
+        con.execute("DROP TABLE temp.affected")
+        con.execute(
+            "INSERT INTO cube_version VALUES (?, 1) ON CONFLICT(kind) DO UPDATE SET version = version + 1", (kind,)
+        )
+
+    @staticmethod
+    def _refresh_sketches(con, kind, month_filter):
+        # สร้าง sketch ใหม่เฉพาะเดือนที่ได้รับผลกระทบ (sketch ลบค่าออกไม่ได้ จึงสร้างใหม่ทั้งเดือน)
+        con.execute(f"DELETE FROM sketch_{kind} WHERE {month_filter}")
+        dims = [d for d in SKETCH_DIMENSIONS if d != "*"]
+        cols = ", ".join(f'"{c}"' for c in ["MonthKey"] + dims + SKETCH_COLUMNS)
+        rows = pd.read_sql_query(f"SELECT {cols} FROM claims_{kind} WHERE {month_filter}", con)
+        records = []
+        for col in SKETCH_COLUMNS:
+            values = pd.to_numeric(rows[col], errors="coerce")
+            data = rows.assign(_v=values).dropna(subset=["_v"])
+            for dim in SKETCH_DIMENSIONS:
+                by = ["MonthKey"] if dim == "*" else ["MonthKey", dim]
+                for key, group in data.groupby(by, dropna=False, sort=False):
+                    month = key[0]
+                    label = "*" if dim == "*" else key[1]
+                    # seed คงที่ ให้สร้าง sketch ซ้ำจากข้อมูลเดิมแล้วได้ผลเหมือนเดิม
+                    sketch = KLLSketch(seed=0).update(group["_v"].to_numpy())
+                    records.append((
+                        col, dim, None if pd.isna(label) else str(label),
+                        None if pd.isna(month) else month, sketch.n, sketch.to_bytes(),
+                    ))
+        con.executemany(f"INSERT INTO sketch_{kind} VALUES (?, ?, ?, ?, ?, ?)", records)
+
+    @staticmethod
+    def _refresh_weeks(con, kind, month_filter):
+        # สัปดาห์คร่อมเดือนได้: นับใหม่ทุกสัปดาห์ของแถวในเดือนที่ถูกแตะ
+        # + สัปดาห์เดิมที่คาบเกี่ยวเดือนเหล่านั้น (อาจเหลือ 0 เคสหลังแถวถูกแทนที่)
+        con.execute("DROP TABLE IF EXISTS temp.affected_weeks")
+        con.execute(
+            f"CREATE TEMP TABLE affected_weeks AS SELECT DISTINCT {WEEK_SQL} AS Week FROM claims_{kind} "
+            f'WHERE ({month_filter}) AND "Date" IS NOT NULL '
+            f'UNION SELECT "Week" FROM week_{kind} WHERE substr("Week", 1, 7) IN (SELECT MonthKey FROM affected) '
+            f"""OR substr(date("Week", '+6 days'), 1, 7) IN (SELECT MonthKey FROM affected)"""
+        )
+        weeks = "SELECT Week FROM affected_weeks"
+        # อ่านเฉพาะแถวในเดือนที่สัปดาห์เหล่านั้นคาบเกี่ยว (ใช้ index ของ MonthKey)
+        months = (
+            f"SELECT substr(Week, 1, 7) FROM affected_weeks "
+            f"""UNION SELECT substr(date(Week, '+6 days'), 1, 7) FROM affected_weeks"""
+        )
+        select = f'SELECT "Week", "SUP", "Defect", "{COUNT}" FROM week_{kind} WHERE "Week" IN ({weeks})'
+        before = set(con.execute(select))
+        con.execute(f'DELETE FROM week_{kind} WHERE "Week" IN ({weeks})')
+        con.execute(
+            f'INSERT INTO week_{kind} SELECT {WEEK_SQL}, "SUP", "Defect", COUNT(*) FROM claims_{kind} '
+            f'WHERE "MonthKey" IN ({months}) AND {WEEK_SQL} IN ({weeks}) GROUP BY 1, 2, 3'
+        )
+        changed = before ^ set(con.execute(select))
+        if changed:
+            con.execute(
+                "INSERT INTO week_dirty VALUES (?, ?) ON CONFLICT(kind) DO UPDATE SET week = min(week, excluded.week)",
+                (kind, min(row[0] for row in changed)),
+            )
+        con.execute("DROP TABLE temp.affected_weeks")
+
+    # ---------- query ----------
+    def row_count(self, kind: str) -> int:
+        with closing(self._connect()) as con:
+            return con.execute(f"SELECT COUNT(*) FROM claims_{kind}").fetchone()[0]
+
+    def cube_version(self, kind: str) -> int:
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT version FROM cube_version WHERE kind = ?", (kind,)).fetchone()
+        return row[0] if row else 0
+
+    def load_cube(self, kind: str) -> pd.DataFrame:
+        # cube เดิม (object เดียวกัน) ถ้ายังไม่มีการนำเข้าใหม่ตั้งแต่โหลดครั้งก่อน (ห้ามแก้ DataFrame ที่ได้)
+        version = self.cube_version(kind)
+        cached = self._cubes.get(kind)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with closing(self._connect()) as con:
+            cube = pd.read_sql_query(f"SELECT * FROM cube_{kind}", con)
+        self._cubes[kind] = (version, cube)
+        return cube
+
+    def column_sketch(self, kind: str, column: str, dim="*", key="*", months=None) -> KLLSketch:
+        # sketch ของ column ใน slice (dim, key) รวมทุกเดือนหรือเฉพาะ months ที่เลือก
+        sql = f"SELECT data FROM sketch_{kind} WHERE col = ? AND dim = ? AND key IS ?"
+        params = [column, dim, key]
+        if months is not None:
+            months = list(months)
+            sql += f' AND "MonthKey" IN ({", ".join("?" for _ in months)})'
+            params += months
+        with closing(self._connect()) as con:
+            blobs = [r[0] for r in con.execute(sql, params)]
+        return merge_sketches(KLLSketch.from_bytes(b) for b in blobs)
+
+    def iqr_fences(self, kind: str, column: str, dim="SUP", months=None) -> pd.DataFrame:
+        # IQR fence + จำนวน outlier (โดยประมาณ) ของ column แยกตามทุกค่าของ dim
+        sql = f"SELECT key, data FROM sketch_{kind} WHERE col = ? AND dim = ?"
+        params = [column, dim]
+        if months is not None:
+            months = list(months)
+            sql += f' AND "MonthKey" IN ({", ".join("?" for _ in months)})'
+            params += months
+        with closing(self._connect()) as con:
+            rows = con.execute(sql, params).fetchall()
+        merged = {}
+        for key, blob in rows:
+            merged.setdefault(key, KLLSketch(seed=0)).merge(KLLSketch.from_bytes(blob))
+        out = []
+        for key, sketch in merged.items():
+            outliers, (low, high) = sketch_iqr_outliers(sketch)
+            out.append({dim: key, "n": sketch.n, "low": low, "high": high, "outliers": outliers})
+        return pd.DataFrame(out, columns=[dim, "n", "low", "high", "outliers"])
+
+    def weekly_counts(self, kind: str, after=None) -> pd.DataFrame:
+        # จำนวนเคสรายสัปดาห์ (Week, SUP, Defect, Count) เฉพาะสัปดาห์หลัง after ได้ (ใช้ index ของ Week)
+        sql = f"SELECT * FROM week_{kind}"
+        params = []
+        if after is not None:
+            sql += ' WHERE "Week" > ?'
+            params = [after]
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(sql + ' ORDER BY "Week"', con, params=params)
+
+    def week_snapshot(self, kind: str, through=None):
+        # cube_version + จำนวนรายสัปดาห์หลัง through อ่านใน transaction เดียว (ภาพเดียวกันของคลัง)
+        # คืน (version, weekly, restart) restart = มีสัปดาห์ที่เปลี่ยนไม่หลัง through (weekly = ประวัติทั้งหมด)
+        with closing(self._connect()) as con:
+            con.execute("BEGIN")
+            row = con.execute("SELECT version FROM cube_version WHERE kind = ?", (kind,)).fetchone()
+            dirty = con.execute("SELECT week FROM week_dirty WHERE kind = ?", (kind,)).fetchone()
+            restart = dirty is not None and through is not None and dirty[0] <= through
+            sql = f"SELECT * FROM week_{kind}"
+            params = []
+            if through is not None and not restart:
+                sql += ' WHERE "Week" > ?'
+                params = [through]
+            weekly = pd.read_sql_query(sql + ' ORDER BY "Week"', con, params=params)
+            con.rollback()
+        return (row[0] if row else 0), weekly, restart
+
+    def clear_dirty_week(self, kind: str, version: int):
+        # ล้างสัปดาห์ที่เปลี่ยนหลัง monitor ประมวลผลถึง version แล้ว
+        # (มีการนำเข้าใหม่ระหว่างนั้น = version เปลี่ยน คงค่าไว้ให้ refresh ครั้งถัดไป)
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "DELETE FROM week_dirty WHERE kind = ? "
+                "AND coalesce((SELECT version FROM cube_version WHERE kind = ?), 0) = ?",
+                (kind, kind, version),
+            )
+
+    def ensure_weeks(self, kind: str):
+        # คลังที่สร้างก่อนมีตารางรายสัปดาห์: นับจากแถวเคลมที่มีอยู่ครั้งเดียว
+        with closing(self._connect()) as con, con:
+            if con.execute(f"SELECT 1 FROM week_{kind} LIMIT 1").fetchone():
+                return
+            if not con.execute(f'SELECT 1 FROM claims_{kind} WHERE "Date" IS NOT NULL LIMIT 1').fetchone():
+                return
+            months = [r[0] for r in con.execute(f'SELECT DISTINCT "MonthKey" FROM claims_{kind}')]
+            self._refresh_weeks(con, kind, self._month_filter(con, months))
+            con.execute("DROP TABLE temp.affected")
+
+    def apply_defect_aliases(self, kind: str, aliases) -> int:
+        # ปรับ Defect (และ RootCause/Advice ที่ขึ้นกับ Defect) ของแถวในคลังตาม alias map ปัจจุบัน
+        # อัปเดตเฉพาะแถวที่ชื่อมาตรฐานเปลี่ยน แล้วสร้าง cube ใหม่เฉพาะเดือนที่ถูกแตะ คืนจำนวนแถวที่เปลี่ยน
+        with closing(self._connect()) as con, con:
+            # แถวที่นำเข้าก่อนมี alias map: Defect เดิมคือข้อความเดิม
+            con.execute(f'UPDATE claims_{kind} SET "DefectRaw" = "Defect" WHERE "DefectRaw" IS NULL')
+            raw = pd.read_sql_query(
+                f'SELECT "DefectRaw", COUNT(*) AS n FROM claims_{kind} WHERE "DefectRaw" IS NOT NULL GROUP BY 1', con
+            )
+            mapping = pd.DataFrame({
+                "DefectRaw": raw["DefectRaw"],
+                "Defect": aliases.resolve(kind, raw["DefectRaw"].tolist(), raw["n"].to_numpy(), learn=True),
+            })
+            mapping = apply_rules(mapping, kind)
+
+            con.execute("DROP TABLE IF EXISTS temp.alias_map")
+            con.execute("CREATE TEMP TABLE alias_map (raw TEXT PRIMARY KEY, defect TEXT, root_cause TEXT, advice TEXT)")
+            con.executemany(
+                "INSERT INTO alias_map VALUES (?, ?, ?, ?)",
+                mapping[["DefectRaw", "Defect", "RootCause", "Advice"]].itertuples(index=False, name=None),
+            )
+            changed = (
+                f'FROM claims_{kind} c JOIN alias_map a ON c."DefectRaw" = a.raw '
+                f'WHERE c."Defect" IS NOT a.defect OR c."RootCause" IS NOT a.root_cause OR c."Advice" IS NOT a.advice'
+            )
+            affected = [r[0] for r in con.execute(f'SELECT DISTINCT c."MonthKey" {changed}')]
+            rows = con.execute(
+                f'UPDATE claims_{kind} SET '
+                f'"Defect" = (SELECT defect FROM alias_map WHERE raw = "DefectRaw"), '
+                f'"RootCause" = (SELECT root_cause FROM alias_map WHERE raw = "DefectRaw"), '
+                f'"Advice" = (SELECT advice FROM alias_map WHERE raw = "DefectRaw") '
+                f"WHERE row_key IN (SELECT c.row_key {changed})"
+            ).rowcount
+            con.execute("DROP TABLE temp.alias_map")
+            if affected:
+                self._refresh_cube(con, kind, affected)
+        return rows
+
+
+_default_store = None
+
+
+def get_store() -> ClaimStore:
+    # ใช้ ClaimStore ตัวเดียวทั้ง process
+    global _default_store
+    if _default_store is None:
+        _default_store = ClaimStore()
+    return _default_store
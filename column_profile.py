@@ -0,0 +1,169 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Profile ของคอลัมน์เคลม คำนวณครั้งเดียวต่อ DataFrame
+# -----------------------------
+# generate_ai_tips และ risk_assessment_oct_q4 ใช้สถิติชุดเดียวกัน (จำนวนเคสต่อเดือน/ไตรมาส,
+# Top Defect ในเดือน 10 / Q4, SUP ที่มีเคสมากสุด, สัดส่วนวันที่ว่าง, IQR ของ Width/Weight)
+# จึงสแกนแต่ละคอลัมน์ครั้งเดียว: แปลงเป็น code จำนวนเต็มแล้วนับด้วย np.bincount
+# ผลถูกแคชไว้ต่อ DataFrame (ถือว่า DataFrame จากแคช/คลังข้อมูลไม่ถูกแก้ไขหลังโหลด)
+NUMERIC_COLUMNS = ["Width", "Weight"]
+DATE_COLUMNS = ["ShipDate", "IssueDate", "Date"]
+
+
+def _codes(series: pd.Series):
+    # (code ต่อแถว, ค่าที่ไม่ซ้ำ) โดย NaN = -1
+    # code ของ categorical อาจเป็น int8 จึงแปลงเป็น intp ก่อนคูณรวมกับ code ของคอลัมน์อื่น
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.intp), series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.intp, copy=False), uniques
+
+
+def _small_int(series: pd.Series, size: int) -> np.ndarray:
+    # Month (1-12) / Quarter (1-4) เป็น index 0..size, ค่าว่าง/นอกช่วง = 0
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    out = np.zeros(len(values), dtype=np.intp)
+    ok = (values >= 1) & (values <= size)
+    out[ok] = values[ok].astype(np.intp)
+    return out
+
+
+def _rank(q: float, n: int):
+    # ตำแหน่งสองค่าที่ quantile q อยู่ระหว่างกัน (นับจาก 0) และสัดส่วนระหว่างสองค่านั้น
+    position = q * (n - 1)
+    lo = int(np.floor(position))
+    return lo, min(lo + 1, n - 1), position - lo
+
+
+def _lerp(a, b, t):
+    # สูตรเดียวกับ np.percentile(method="linear") ผลจึงตรงกันทุกบิต
+    diff = b - a
+    return float(b - diff * (1 - t)) if t >= 0.5 else float(a + diff * t)
+
+
+class ColumnProfile:
+    def __init__(self, df: pd.DataFrame):
+        self.rows = len(df)
+        self.columns = set(df.columns)
+        self.month_counts = None     # index 1..12 (index 0 = ไม่มีเดือน)
+        self.quarter_counts = None   # index 1..4
+        self.defect_by_month = None  # (จำนวน Defect, 13)
+        self.defect_by_quarter = None
+        self.defects = pd.Index([])
+        self.defect_counts = pd.Series(dtype="int64")
+        self.sup_counts = pd.Series(dtype="int64")
+        self.null_ratio = {}
+        self.numeric = {}
+
+        month = _small_int(df["Month"], 12) if "Month" in df.columns else None
+        quarter = _small_int(df["Quarter"], 4) if "Quarter" in df.columns else None
+        if month is not None:
+            self.month_counts = np.bincount(month, minlength=13)
+        if quarter is not None:
+            self.quarter_counts = np.bincount(quarter, minlength=5)
+
+        if "Defect" in df.columns:
+            codes, self.defects = _codes(df["Defect"])
+            n = len(self.defects)
+            valid = codes >= 0
+            counts = np.bincount(codes[valid], minlength=n)
+            self.defect_counts = self._sorted_counts(counts, self.defects)
+            # ตารางไขว้ Defect x เดือน / Defect x ไตรมาส ด้วย bincount บน code รวม
+            if month is not None:
+                self.defect_by_month = np.bincount(
+                    codes[valid] * 13 + month[valid], minlength=n * 13
+                ).reshape(n, 13)
+            if quarter is not None:
+                self.defect_by_quarter = np.bincount(
+                    codes[valid] * 5 + quarter[valid], minlength=n * 5
+                ).reshape(n, 5)
+
+        if "SUP" in df.columns:
+            codes, sups = _codes(df["SUP"])
+            counts = np.bincount(codes[codes >= 0], minlength=len(sups))
+            self.sup_counts = self._sorted_counts(counts, sups)
+
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                self.null_ratio[col] = float(df[col].isna().mean()) if self.rows else 0.0
+
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                self.numeric[col] = self._iqr(df[col])
+
+    @staticmethod
+    def _sorted_counts(counts, labels) -> pd.Series:
+        # เรียงจากมากไปน้อยแบบ stable (ค่าเท่ากันเรียงตามลำดับที่พบ) เหมือน value_counts
+        s = pd.Series(counts, index=labels, dtype="int64")
+        s = s[s > 0]
+        return s.iloc[np.argsort(-s.to_numpy(), kind="stable")]
+
+    @staticmethod
+    def _iqr(series: pd.Series) -> dict:
+        # Q1/Q3 แบบ linear (ค่าเดียวกับ np.percentile) ด้วย np.partition แทนการเรียงทั้งคอลัมน์
+        # หลัง partition ค่าที่ต่ำกว่าขอบล่างอยู่หน้าตำแหน่งของ Q1 และค่าที่สูงกว่าขอบบนอยู่หลังตำแหน่งของ Q3
+        # จึงนับ outlier เฉพาะสองช่วงนั้นในรอบเดียวกัน
+        s = series if pd.api.types.is_numeric_dtype(series) else pd.to_numeric(series, errors="coerce")
+        values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        n = values.size
+        if n == 0:
+            return {"count": 0, "outliers": 0, "low": None, "high": None}
+        (lo1, hi1, t1), (lo3, hi3, t3) = _rank(0.25, n), _rank(0.75, n)
+        part = np.partition(values, sorted({lo1, hi1, lo3, hi3}))
+        q1, q3 = _lerp(part[lo1], part[hi1], t1), _lerp(part[lo3], part[hi3], t3)
+        iqr = q3 - q1
+        low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        outliers = int(np.count_nonzero(part[:hi1] < low) + np.count_nonzero(part[lo3 + 1:] > high))
+        return {"count": int(n), "q1": q1, "q3": q3, "outliers": outliers, "low": low, "high": high}
+
+    # ---------- query ----------
+    def month_total(self, month: int) -> int:
+        return int(self.month_counts[month])
+
+    def quarter_total(self, quarter: int) -> int:
+        return int(self.quarter_counts[quarter])
+
+    def top_defects_in_month(self, month: int, n=5) -> dict:
+        return self._top(self.defect_by_month[:, month], n)
+
+    def top_defects_in_quarter(self, quarter: int, n=5) -> dict:
+        return self._top(self.defect_by_quarter[:, quarter], n)
+
+    def _top(self, counts, n) -> dict:
+        return self._sorted_counts(counts, self.defects).head(n).to_dict()
+
+    def top_defects(self, n=3) -> list:
+        return self.defect_counts.head(n).index.tolist()
+
+    def worst_sup(self):
+        return self.sup_counts.index[0] if not self.sup_counts.empty else None
+
+
+_profiles = {}
+_lock = threading.Lock()
+
+
+def _signature(df: pd.DataFrame):
+    return len(df), tuple(df.columns)
+
+
+def get_profile(df: pd.DataFrame) -> ColumnProfile:
+    # คืน profile ที่แคชไว้ของ DataFrame นี้ (สร้างใหม่ถ้ายังไม่มี หรือจำนวนแถว/คอลัมน์เปลี่ยน)
+    key = id(df)
+    with _lock:
+        item = _profiles.get(key)
+    if item is not None:
+        ref, signature, profile = item
+        if ref() is df and signature == _signature(df):
+            return profile
+
+    profile = ColumnProfile(df)
+    with _lock:
+        _profiles[key] = (weakref.ref(df, lambda _, key=key: _profiles.pop(key, None)), _signature(df), profile)
+    return profile
@@ -0,0 +1,266 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from cube import COUNT
+from ingest_cache import CACHE_DIR
+
+# -----------------------------
+# Control chart รายสัปดาห์ (EWMA + CUSUM) ต่อ SUP x Defect แบบ incremental
+# -----------------------------
+# แต่ละ series เก็บ state หลังสัปดาห์ล่าสุดที่ประมวลผลแล้ว (SQLite):
+#   mean, var : baseline ของจำนวนเคสต่อสัปดาห์ (EWMA ช้า λ = LAMBDA_BASE) ทดสอบสัปดาห์ใหม่กับ baseline ก่อนอัปเดต
+#               ระดับใหม่ที่คงอยู่จึงส่งสัญญาณช่วงหนึ่งแล้วกลายเป็นระดับปกติ (ไม่ค้างสัญญาณตลอดไป)
+#   ewma      : EWMA ของจำนวนเคส (λ = LAMBDA) เทียบกับ limit = mean + L·σ·sqrt(λ/(2-λ))
+#   cusum     : CUSUM ด้านขาขึ้นของ (x - mean)/σ - K สัญญาณเมื่อเกิน H
+# σ² = max(var, mean, MIN_VAR) (ไม่ต่ำกว่า Poisson) กัน series ที่นิ่งมากส่งสัญญาณจากเคสเดียว
+# สัปดาห์ใหม่หนึ่งสัปดาห์ = อัปเดต O(1) ต่อ series (คำนวณทุก series พร้อมกันด้วย numpy)
+# การ refresh จึงอ่านเฉพาะจำนวนรายสัปดาห์หลังสัปดาห์ที่ประมวลผลแล้ว ไม่ต้องคำนวณประวัติใหม่
+# สัปดาห์ล่าสุดในข้อมูลยังไม่ประมวลผล (อาจยังเก็บข้อมูลไม่ครบสัปดาห์) สัปดาห์ที่ไม่มีเคส = 0
+# series เริ่มนับจากสัปดาห์แรกที่มีเคส และส่งสัญญาณได้หลังผ่าน WARMUP_WEEKS สัปดาห์
+# scope = kind + path ของไฟล์คลัง (monitor_scope) state ของคลังคนละไฟล์ / roll กับ sheet ไม่ปนกัน
+MONITOR_PATH = os.environ.get("CLAIM_MONITOR_PATH", os.path.join(CACHE_DIR, "control_monitor.sqlite"))
+
+LAMBDA = 0.3
+LAMBDA_BASE = 0.1
+L = 3.0
+K = 0.5
+H = 5.0
+MIN_VAR = 0.25
+WARMUP_WEEKS = 8
+
+STATE_COLUMNS = ["weeks", "mean", "var", "ewma", "cusum", "last_count", "signal_week", "signal"]
+NUMERIC_COLUMNS = STATE_COLUMNS[:6]
+
+# ชื่อคอลัมน์ของตารางสัญญาณที่แสดงในหน้า
+ALERT_LABELS = {
+    "signal_week": "เริ่มหลุดสัปดาห์",
+    "signal": "สัญญาณ",
+    "last_count": "เคสสัปดาห์ล่าสุด",
+    "mean": "ค่าปกติ/สัปดาห์",
+    "ewma": "EWMA",
+    "limit": "ขีดจำกัดบน",
+    "cusum": "CUSUM (σ)",
+}
+
+
+def control_limit(mean, var):
+    sigma = np.sqrt(np.maximum(np.maximum(var, mean), MIN_VAR))
+    return mean + L * sigma * np.sqrt(LAMBDA / (2 - LAMBDA))
+
+
+def advance(state: dict, X: np.ndarray, start: np.ndarray, weeks: list) -> dict:
+    # เดิน state ของทุก series ทีละสัปดาห์ X = จำนวนเคส (series x สัปดาห์)
+    # start = สัปดาห์แรกที่ series เริ่มนับ (series ใหม่เริ่มที่สัปดาห์แรกที่มีเคส)
+    n, mean, var = state["weeks"], state["mean"], state["var"]
+    ewma, cusum = state["ewma"], state["cusum"]
+    signal_week, signal = state["signal_week"], state["signal"]
+    for t, week in enumerate(weeks):
+        active = start <= t
+        x = X[:, t]
+        sigma = np.sqrt(np.maximum(np.maximum(var, mean), MIN_VAR))
+        warm = active & (n >= WARMUP_WEEKS)
+
+        ewma_t = np.where(warm, LAMBDA * x + (1 - LAMBDA) * ewma, ewma)
+        cusum_t = np.where(warm, np.maximum(0.0, cusum + (x - mean) / sigma - K), 0.0)
+        ewma_out = warm & (ewma_t > control_limit(mean, var))
+        cusum_out = warm & (cusum_t > H)
+        out = ewma_out | cusum_out
+
+        # สัปดาห์ที่เริ่มหลุดการควบคุม (คงไว้ตลอดช่วงที่ยังหลุด)
+        started = np.where(pd.notna(signal_week), signal_week, week)
+        signal_week = np.where(active, np.where(out, started, None), signal_week)
+        rule = np.where(
+            ewma_out & cusum_out, "EWMA+CUSUM", np.where(ewma_out, "EWMA", np.where(cusum_out, "CUSUM", None))
+        )
+        signal = np.where(active, rule, signal)
+
+        # baseline: ช่วงแรกเป็นค่าเฉลี่ยสะสม (λ = 1/(n+1)) แล้วค่อยเป็น EWMA ช้า
+        lam = np.maximum(1.0 / (n + 1), LAMBDA_BASE)
+        d = x - mean
+        mean = np.where(active, mean + lam * d, mean)
+        var = np.where(active, (1 - lam) * (var + lam * d * d), var)
+        # ระหว่าง warm-up EWMA เดินตาม baseline
+        ewma = np.where(warm, ewma_t, np.where(active, mean, ewma))
+        cusum = np.where(active, cusum_t, cusum)
+        state["last_count"] = np.where(active, x, state["last_count"])
+        n = n + active
+
+    state.update(weeks=n, mean=mean, var=var, ewma=ewma, cusum=cusum, signal_week=signal_week, signal=signal)
+    return state
+
+
+class ControlMonitor:
+    def __init__(self, path=MONITOR_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        columns = ", ".join(
+            f"{c} INTEGER" if c == "weeks" else f"{c} TEXT" if c.startswith("signal") else f"{c} REAL"
+            for c in STATE_COLUMNS
+        )
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                f'CREATE TABLE IF NOT EXISTS monitor_state (scope TEXT, "SUP" TEXT, "Defect" TEXT, '
+                f'{columns}, PRIMARY KEY (scope, "SUP", "Defect"))'
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS monitor_scope "
+                "(scope TEXT PRIMARY KEY, through_week TEXT, store_version INTEGER)"
+            )
+            # ไฟล์ที่สร้างก่อนมี store_version (scope เดิมจะประมวลผลใหม่ครั้งแรกที่ refresh)
+            existing = {r[1] for r in con.execute("PRAGMA table_info(monitor_scope)")}
+            if "store_version" not in existing:
+                con.execute("ALTER TABLE monitor_scope ADD COLUMN store_version INTEGER")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    @staticmethod
+    def _scope_row(con, scope):
+        # (สัปดาห์สุดท้ายที่ประมวลผลแล้ว, cube_version ของคลังที่ประมวลผลถึง) None = ยังไม่เคย
+        row = con.execute(
+            "SELECT through_week, store_version FROM monitor_scope WHERE scope = ?", (scope,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    @staticmethod
+    def _load(con, scope):
+        stored = pd.read_sql_query("SELECT * FROM monitor_state WHERE scope = ?", con, params=(scope,))
+        return stored.drop(columns="scope").set_index(["SUP", "Defect"])
+
+    def through_week(self, scope: str):
+        with closing(self._connect()) as con:
+            return self._scope_row(con, scope)[0]
+
+    def store_version(self, scope: str):
+        # cube_version ของคลังที่ประมวลผลถึงแล้ว (None = ยังไม่เคย)
+        with closing(self._connect()) as con:
+            return self._scope_row(con, scope)[1]
+
+    def load(self, scope: str) -> pd.DataFrame:
+        with closing(self._connect()) as con:
+            return self._load(con, scope)
+
+    def clear(self, scope=None):
+        with closing(self._connect()) as con, con:
+            if scope is None:
+                con.execute("DELETE FROM monitor_state")
+                con.execute("DELETE FROM monitor_scope")
+            else:
+                con.execute("DELETE FROM monitor_state WHERE scope = ?", (scope,))
+                con.execute("DELETE FROM monitor_scope WHERE scope = ?", (scope,))
+
+    def _update(self, con, scope: str, weekly: pd.DataFrame, store_version=None, restart=False) -> dict:
+        # weekly = จำนวนเคสรายสัปดาห์ (Week, SUP, Defect, Count) คืนสถิติ {weeks, series, signals}
+        # ทำใน transaction ของ con (refresh_monitor ถือ lock ของไฟล์ monitor ตลอดการอัปเดต)
+        if restart:
+            # ข้อมูลย้อนหลังเปลี่ยน state เดิมใช้ต่อไม่ได้ เริ่มใหม่จากประวัติทั้งหมด
+            con.execute("DELETE FROM monitor_state WHERE scope = ?", (scope,))
+            con.execute("DELETE FROM monitor_scope WHERE scope = ?", (scope,))
+        through = self._scope_row(con, scope)[0]
+        if through is not None:
+            weekly = weekly[weekly["Week"] > through]
+        stats = {"weeks": 0, "series": 0, "signals": 0}
+        weeks = []
+        if not weekly.empty:
+            latest = pd.Timestamp(weekly["Week"].max())
+            week = pd.Timedelta(days=7)
+            first = pd.Timestamp(weekly["Week"].min()) if through is None else pd.Timestamp(through) + week
+            weeks = list(pd.date_range(first, latest - week, freq="7D").strftime("%Y-%m-%d"))
+            weekly = weekly[weekly["Week"].isin(weeks)]
+        if not weeks:
+            self._save(con, scope, None, through, store_version)
+            return stats
+
+        stored = self._load(con, scope)
+        keys = pd.MultiIndex.from_arrays(
+            [weekly["SUP"].astype(str).to_numpy(), weekly["Defect"].astype(str).to_numpy()]
+        )
+        index = stored.index.union(keys.unique(), sort=False)
+        stored = stored.reindex(index)
+        rows = index.get_indexer(keys)
+        cols = pd.Index(weeks).get_indexer(weekly["Week"])
+        X = np.zeros((len(index), len(weeks)))
+        np.add.at(X, (rows, cols), weekly[COUNT].to_numpy(dtype=np.float64))
+
+        # series เดิมเดินต่อทุกสัปดาห์ series ใหม่เริ่มที่สัปดาห์แรกที่มีเคส
+        new = stored["weeks"].isna().to_numpy()
+        start = np.where(new, np.argmax(X > 0, axis=1), 0)
+        state = {c: pd.to_numeric(stored[c]).fillna(0).to_numpy(dtype=np.float64) for c in NUMERIC_COLUMNS}
+        state["weeks"] = state["weeks"].astype(np.int64)
+        for c in ["signal_week", "signal"]:
+            state[c] = stored[c].astype(object).where(stored[c].notna(), None).to_numpy()
+        state = advance(state, X, start, weeks)
+
+        states = pd.DataFrame(state, index=index)
+        self._save(con, scope, states, weeks[-1], store_version)
+        return {"weeks": len(weeks), "series": len(index), "signals": int((states["signal_week"].notna()).sum())}
+
+    def update(self, scope: str, weekly: pd.DataFrame) -> dict:
+        with closing(self._connect()) as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            return self._update(con, scope, weekly)
+
+    @staticmethod
+    def _save(con, scope: str, states, through_week, store_version):
+        if states is not None:
+            columns = ["SUP", "Defect"] + STATE_COLUMNS
+            states = states.rename_axis(["SUP", "Defect"]).reset_index()
+            states = states[columns].astype(object).where(states[columns].notna(), None)
+            rows = [(scope,) + tuple(r) for r in states.itertuples(index=False, name=None)]
+            placeholders = ", ".join("?" * (len(columns) + 1))
+            quoted = ", ".join(f'"{c}"' for c in columns)
+            con.executemany(f"INSERT OR REPLACE INTO monitor_state (scope, {quoted}) VALUES ({placeholders})", rows)
+        con.execute("INSERT OR REPLACE INTO monitor_scope VALUES (?, ?, ?)", (scope, through_week, store_version))
+
+    def alerts(self, scope: str, among=None) -> pd.DataFrame:
+        # series ที่ยังหลุดการควบคุม ณ สัปดาห์ล่าสุดที่ประมวลผล (สัญญาณล่าสุดก่อน)
+        # among = DataFrame ที่มีคอลัมน์ SUP, Defect (เช่น roll-up ของ cube ที่กรองแล้ว) แสดงเฉพาะคู่ในนั้น
+        stored = self.load(scope)
+        stored = stored[stored["signal_week"].notna()]
+        if among is not None:
+            pairs = pd.MultiIndex.from_arrays([among["SUP"].astype(str), among["Defect"].astype(str)])
+            stored = stored[stored.index.isin(pairs)]
+        out = stored.reset_index()
+        out["limit"] = control_limit(out["mean"], out["var"])
+        return out.sort_values(["signal_week", "cusum"], ascending=False)[
+            ["SUP", "Defect", "signal_week", "signal", "last_count", "mean", "ewma", "limit", "cusum"]
+        ]
+
+
+def monitor_scope(store, kind: str) -> str:
+    # state แยกตามไฟล์คลัง + kind (คลังคนละไฟล์ใช้ไฟล์ monitor เดียวกันได้โดยไม่ปนกัน)
+    return f"{kind}:{os.path.abspath(store.path)}"
+
+
+def refresh_monitor(store, kind: str, monitor=None) -> dict:
+    # อัปเดต monitor ของ kind จากจำนวนรายสัปดาห์ในคลัง (อ่านเฉพาะสัปดาห์ที่ยังไม่ประมวลผล)
+    # เรียกจากงานที่เขียนคลัง (ingest_job / alias_editor) และจาก monitor_job เมื่อหน้าเว็บพบว่า state ล้าสมัย
+    # ถือ lock ของไฟล์ monitor (BEGIN IMMEDIATE) ตลอดการอัปเดต refresh พร้อมกันจึงทำทีละตัว
+    # ข้ามเมื่อ cube_version ของคลังเท่ากับที่ประมวลผลไปแล้ว และล้าง week_dirty เฉพาะเมื่อ version ยังไม่เปลี่ยน
+    monitor = monitor or get_monitor()
+    scope = monitor_scope(store, kind)
+    store.ensure_weeks(kind)
+    with closing(monitor._connect()) as con, con:
+        con.execute("BEGIN IMMEDIATE")
+        through, seen = monitor._scope_row(con, scope)
+        if seen is not None and seen == store.cube_version(kind):
+            return {"weeks": 0, "series": 0, "signals": 0}
+        version, weekly, restart = store.week_snapshot(kind, through)
+        stats = monitor._update(con, scope, weekly, version, restart)
+    store.clear_dirty_week(kind, version)
+    return stats
+
+
+_default_monitor = None
+
+
+def get_monitor() -> ControlMonitor:
+    global _default_monitor
+    if _default_monitor is None:
+        _default_monitor = ControlMonitor()
+    return _default_monitor
@@ -0,0 +1,47 @@
+import pandas as pd
+
+# -----------------------------
+# Count cube: สรุปจำนวนเคสที่ key ละเอียดที่สุดครั้งเดียว
+# -----------------------------
+# ทุก KPI / กราฟ / watchlist / input ของการพยากรณ์ คำนวณจาก roll-up ของ cube นี้
+# (cube มีขนาดเท่าจำนวน combination ที่เกิดขึ้นจริง ซึ่งเล็กกว่าจำนวนแถวดิบมาก)
+CUBE_KEYS = ["MonthKey", "Quarter", "SUP", "Grade", "Defect", "RootCause", "Advice"]
+COUNT = "Count"
+
+
+def build_cube(df: pd.DataFrame, keys=CUBE_KEYS) -> pd.DataFrame:
+    keys = [k for k in keys if k in df.columns]
+    # dropna=False เพื่อไม่ทิ้งแถวที่ key บางตัวว่าง (roll-up จะตัดทิ้งเฉพาะ key ที่ถูกใช้)
+    cube = df.groupby(keys, dropna=False, observed=True, sort=False).size().reset_index(name=COUNT)
+    cube[COUNT] = cube[COUNT].astype("int64")
+    return cube
+
+
+def merge_cubes(cubes) -> pd.DataFrame:
+    # รวม cube ของหลายไฟล์ (combination เดียวกันบวกจำนวนเคสกัน)
+    cubes = list(cubes)
+    if len(cubes) == 1:
+        return cubes[0]
+    # key = union ของคอลัมน์ทุก cube (ไฟล์ที่ไม่มีบาง key จะได้ค่าว่างใน key นั้น แทนที่จะทำให้ key หายจากผลรวม)
+    keys = list(dict.fromkeys(c for cube in cubes for c in cube.columns if c != COUNT))
+    merged = pd.concat(cubes, ignore_index=True)
+    return merged.groupby(keys, dropna=False, observed=True, sort=False)[COUNT].sum().reset_index()
+
+
+def rollup(cube: pd.DataFrame, keys, name=COUNT) -> pd.DataFrame:
+    # เทียบเท่า df.groupby(keys).size().reset_index(name=name) บนข้อมูลดิบ
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    return cube.groupby(keys, observed=True)[COUNT].sum().reset_index(name=name)
+
+
+def total_count(cube: pd.DataFrame) -> int:
+    return int(cube[COUNT].sum())
+
+
+def nunique(cube: pd.DataFrame, key: str) -> int:
+    return int(cube.loc[cube[COUNT] > 0, key].nunique())
+
+
+def top_n(cube: pd.DataFrame, key: str, n=12, name=COUNT) -> pd.DataFrame:
+    return rollup(cube, key, name).sort_values(name, ascending=False).head(n)
+
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cube import COUNT
+
+# -----------------------------
+# Index ของ cube สำหรับตัวกรองใน sidebar (ช่วงเดือน, SUP, Grade, Defect, RootCause)
+# -----------------------------
+# สร้างครั้งเดียวต่อ cube (แคชตาม key ของข้อมูล: เวอร์ชัน cube ในคลัง หรือ hash ของไฟล์ที่อัปโหลด):
+#   - เรียงแถวตาม MonthKey ครั้งเดียว ช่วงเดือน = ช่วงตำแหน่งต่อเนื่อง หาได้ด้วย searchsorted
+#   - แต่ละมิติเก็บตำแหน่งแถวของแต่ละค่า (posting list เรียงจากน้อยไปมาก)
+# ตัวกรองหนึ่งชุด = ตัดช่วงเดือน -> ต่อมิติสร้าง bitmap ของช่วงนั้นจาก posting list ของค่าที่เลือก
+# -> AND bitmap ทุกมิติ ต้นทุนขึ้นกับจำนวนแถวในช่วงเดือน + แถวของค่าที่เลือก ไม่ต้องสแกนทุกคอลัมน์ทุกแถว
+# กราฟ / ตาราง / พยากรณ์ / รายงาน ด้านล่างทั้งหมดคำนวณจาก cube ที่ถูกกรองแล้ว
+# (cube ละเอียดถึงระดับเดือน ช่วงวันที่จึงกรองเป็นช่วงเดือน)
+MONTH = "MonthKey"
+FILTER_COLUMNS = ["SUP", "Grade", "Defect", "RootCause"]
+# จำนวน index ที่แคชไว้ (ตัวที่ใช้ล่าสุดนานที่สุดถูกลบก่อน)
+INDEX_CACHE_SIZE = 8
+
+
+class CubeIndex:
+    def __init__(self, cube: pd.DataFrame, columns=FILTER_COLUMNS):
+        # code ของเดือนเรียงตามเวลา ("YYYY-MM" เรียงตามตัวอักษรได้) เดือนว่างได้ code สุดท้าย
+        # (อยู่ท้ายสุด แสดงเมื่อไม่ได้จำกัดช่วงเดือน)
+        month = cube[MONTH]
+        if isinstance(month.dtype, pd.CategoricalDtype):
+            # factorize(sort=True) ของ categorical เรียงตามลำดับ categories ไม่ใช่ตามค่า
+            month = month.cat.reorder_categories(sorted(month.cat.categories, key=str))
+        codes, months = pd.factorize(month, sort=True)
+        codes = np.where(codes < 0, len(months), codes)
+        order = np.argsort(codes, kind="stable")
+        self.cube = cube.take(order).reset_index(drop=True)
+        self.rows = len(self.cube)
+        self.month_codes = codes[order]
+        self.month_options = [str(m) for m in months]
+
+        self.values = {}    # คอลัมน์ -> ค่าที่เลือกได้ (เรียงตามตัวอักษร)
+        self._postings = {}  # คอลัมน์ -> (ตำแหน่งแถวเรียงตาม code, จุดเริ่มของแต่ละ code, {ค่า: code})
+        for col in columns:
+            if col not in self.cube.columns:
+                continue
+            codes, uniques = pd.factorize(self.cube[col])
+            # code + 1 ให้ค่าว่าง (-1) เป็น code 0 ที่ไม่มีให้เลือก
+            codes = codes.astype(np.intp) + 1
+            positions = np.argsort(codes, kind="stable")
+            starts = np.zeros(len(uniques) + 2, dtype=np.intp)
+            np.cumsum(np.bincount(codes, minlength=len(uniques) + 1), out=starts[1:])
+            lookup = {value: i + 1 for i, value in enumerate(uniques)}
+            self._postings[col] = (positions, starts, lookup)
+            self.values[col] = sorted(lookup, key=str)
+
+    def month_range(self, start=None, end=None):
+        # (ตำแหน่งแรก, ตำแหน่งหลังสุด + 1) ของแถวที่ MonthKey อยู่ใน [start, end]
+        if start is None and end is None:
+            return 0, self.rows
+        first = 0 if start is None else int(np.searchsorted(self.month_options, str(start), side="left"))
+        last = len(self.month_options) - 1 if end is None else \
+            int(np.searchsorted(self.month_options, str(end), side="right")) - 1
+        lo = int(np.searchsorted(self.month_codes, first, side="left"))
+        hi = int(np.searchsorted(self.month_codes, last, side="right"))
+        return lo, max(lo, hi)
+
+    def positions(self, col: str, value) -> np.ndarray:
+        positions, starts, lookup = self._postings[col]
+        code = lookup.get(value)
+        if code is None:
+            return positions[:0]
+        return positions[starts[code]: starts[code + 1]]
+
+    def select(self, months=None, filters=None) -> np.ndarray:
+        # ตำแหน่งแถว (ใน self.cube) ที่ผ่านตัวกรองทั้งหมด
+        lo, hi = self.month_range(*(months or (None, None)))
+        mask = None
+        for col, selected in (filters or {}).items():
+            if not selected or col not in self._postings:
+                continue
+            bitmap = np.zeros(hi - lo, dtype=bool)
+            for value in selected:
+                pos = self.positions(col, value)
+                a, b = np.searchsorted(pos, [lo, hi])
+                bitmap[pos[a:b] - lo] = True
+            if mask is None:
+                mask = bitmap
+            else:
+                mask &= bitmap
+        if mask is None:
+            return np.arange(lo, hi)
+        return lo + np.flatnonzero(mask)
+
+    def frame(self, months=None, filters=None) -> pd.DataFrame:
+        active = months is not None or any((filters or {}).values())
+        if not active:
+            return self.cube
+        return self.cube.take(self.select(months, filters))
+
+
+_lock = threading.Lock()
+_indexes = OrderedDict()  # key -> CubeIndex
+
+
+def get_index(cube, key: str) -> CubeIndex:
+    # index ที่แคชไว้ของข้อมูลชุด key (หน้าเว็บสร้าง cube ใหม่ทุก rerun จึงใช้ id ของ DataFrame ไม่ได้)
+    # cube เป็น DataFrame หรือฟังก์ชันที่สร้าง cube (เรียกเฉพาะเมื่อยังไม่มี index ของ key นี้)
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = CubeIndex(cube() if callable(cube) else cube)
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def filter_sidebar(cube, kind: str, key: str):
+    # ตัวกรองใน sidebar คืน (cube ที่ผ่านตัวกรอง หรือ None ถ้าไม่มีแถวที่ตรง, ตัวกรองที่ใช้อยู่)
+    # cube / key: ดู get_index
+    # ตัวกรองที่ใช้อยู่ = {คอลัมน์: ค่าที่เลือก} เฉพาะที่ถูกจำกัด ช่วงเดือนเป็นรายการ MonthKey ({} = ไม่กรอง)
+    import streamlit as st
+
+    index = get_index(cube, key)
+    sidebar = st.sidebar
+    sidebar.subheader("🔎 ตัวกรอง")
+
+    months = None
+    selection = {}
+    options = index.month_options
+    if len(options) > 1:
+        key = f"{kind}_filter_months"
+        # ค่าเดิมใน session อาจไม่อยู่ในตัวเลือกแล้ว (นำเข้าไฟล์ใหม่ / เปลี่ยนแหล่งข้อมูล)
+        if key in st.session_state and any(m not in options for m in st.session_state[key]):
+            del st.session_state[key]
+        start, end = sidebar.select_slider("ช่วงเดือน", options=options, value=(options[0], options[-1]), key=key)
+        if (start, end) != (options[0], options[-1]):
+            months = (start, end)
+            selection[MONTH] = options[options.index(start): options.index(end) + 1]
+
+    filters = {}
+    for col, values in index.values.items():
+        key = f"{kind}_filter_{col}"
+        if key in st.session_state:
+            allowed = set(values)
+            st.session_state[key] = [v for v in st.session_state[key] if v in allowed]
+        filters[col] = sidebar.multiselect(col, values, key=key, placeholder="ทั้งหมด")
+        if filters[col]:
+            selection[col] = filters[col]
+
+    started = time.perf_counter()
+    filtered = index.frame(months, filters)
+    ms = (time.perf_counter() - started) * 1000
+    total = int(index.cube[COUNT].sum())
+    shown = int(filtered[COUNT].sum())
+    sidebar.caption(f"แสดง {shown:,} จาก {total:,} เคส ({ms:.1f} ms)")
+    if filtered.empty:
+        st.warning("ไม่มีข้อมูลตามตัวกรองที่เลือก")
+        return None, selection
+    return filtered, selection
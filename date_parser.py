@@ -0,0 +1,172 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# แปลงวันที่จาก Excel ที่ปนหลายรูปแบบ โดยแปลงเฉพาะค่าที่ไม่ซ้ำ
+# -----------------------------
+# คอลัมน์วันที่ 1 ล้านแถวมักมีค่าไม่ซ้ำแค่หลักร้อย/พัน จึง factorize ก่อน แปลงเฉพาะ uniques
+# แล้ว broadcast กลับด้วย code (ต้นทุนต่อแถว = การ take ครั้งเดียว)
+#
+# รูปแบบที่รองรับ (ตรวจตามลำดับ):
+#   datetime       : cell ที่ Excel จัดรูปแบบเป็นวันที่อยู่แล้ว
+#   excel_serial   : ตัวเลข serial ของ Excel (เช่น 45321) นับจาก 1899-12-30
+#   yyyymmdd       : ตัวเลข/ข้อความ 8 หลัก (เช่น 20240115, ตัวเลขที่อ่านเป็น float "20240115.0" ก็ได้)
+#   dd/mm/yyyy     : วันขึ้นก่อน คั่นด้วย / - . (มีเวลาต่อท้ายได้)
+#   yyyy-mm-dd     : ISO (มีเวลาต่อท้ายได้)
+#   thai_month     : ชื่อเดือนไทยเต็ม/ย่อ เช่น "15 ม.ค. 2567", "3 มีนาคม 67"
+#   fallback       : ค่าที่เหลือ ส่งให้ pd.to_datetime(dayfirst=True) ทีละค่าที่ไม่ซ้ำ
+# ปี 4 หลัก ≥ 2400 ถือเป็น พ.ศ. (ลบ 543)
+# ปี 2 หลัก: เลือกศตวรรษให้ปีไม่เกินปีปัจจุบัน + TWO_DIGIT_AHEAD (ปี 2569/2026 -> 00-46 = 20xx, 47-99 = 19xx)
+#   thai_month (เช่น "3 มี.ค. 67") ใช้ปี พ.ศ. ปัจจุบันเป็นฐานแทน (67 = พ.ศ. 2567)
+# เลขไทย (๐-๙) ถูกแปลงเป็นเลขอารบิกก่อน
+
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+# serial ที่ถือว่าเป็นวันที่ได้ (1954-10-09 .. 2173-10-14)
+SERIAL_RANGE = (20000, 100000)
+BE_OFFSET = 543
+TWO_DIGIT_AHEAD = 20
+
+THAI_MONTHS = {
+    "มกราคม": 1, "ม.ค.": 1, "มค": 1,
+    "กุมภาพันธ์": 2, "ก.พ.": 2, "กพ": 2,
+    "มีนาคม": 3, "มี.ค.": 3, "มีค": 3,
+    "เมษายน": 4, "เม.ย.": 4, "เมย": 4,
+    "พฤษภาคม": 5, "พ.ค.": 5, "พค": 5,
+    "มิถุนายน": 6, "มิ.ย.": 6, "มิย": 6,
+    "กรกฎาคม": 7, "ก.ค.": 7, "กค": 7,
+    "สิงหาคม": 8, "ส.ค.": 8, "สค": 8,
+    "กันยายน": 9, "ก.ย.": 9, "กย": 9,
+    "ตุลาคม": 10, "ต.ค.": 10, "ตค": 10,
+    "พฤศจิกายน": 11, "พ.ย.": 11, "พย": 11,
+    "ธันวาคม": 12, "ธ.ค.": 12, "ธค": 12,
+}
+# เทียบชื่อเดือนแบบตัดจุดออก ("ม.ค." = "มค")
+THAI_MONTH_KEYS = {k.replace(".", ""): v for k, v in THAI_MONTHS.items()}
+THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+
+_TIME = r"(?:[ T]+(?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.](?P<second>\d{2}))?)?\s*$"
+PATTERNS = {
+    "yyyymmdd": r"^\s*(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})\s*$",
+    "dd/mm/yyyy": r"^\s*(?P<day>\d{1,2})[/\-.](?P<month>\d{1,2})[/\-.](?P<year>\d{4}|\d{2})" + _TIME,
+    "yyyy-mm-dd": r"^\s*(?P<year>\d{4})[/\-.](?P<month>\d{1,2})[/\-.](?P<day>\d{1,2})" + _TIME,
+    "thai_month": r"^\s*(?P<day>\d{1,2})\s*(?P<month>[ก-๙.]+)\s*(?P<year>\d{4}|\d{2})" + _TIME,
+}
+FORMATS = ["datetime", "excel_serial"] + list(PATTERNS) + ["fallback", "unparsed"]
+
+
+def _normalize_year(year: pd.Series, buddhist=False) -> pd.Series:
+    # buddhist: ปี 2 หลักเป็น พ.ศ. (ชื่อเดือนไทย) ไม่ใช่ ค.ศ.
+    year = year.astype("float64")
+    offset = BE_OFFSET if buddhist else 0
+    pivot = dt.date.today().year + offset + TWO_DIGIT_AHEAD
+    full = pivot // 100 * 100 + year
+    full = full.where(full <= pivot, full - 100) - offset
+    two_digit = year < 100
+    year = year.where(~two_digit, full)
+    return year.where(two_digit | (year < 2400), year - BE_OFFSET)
+
+
+def _build(parts: pd.DataFrame, buddhist=False) -> pd.Series:
+    # parts: คอลัมน์ year/month/day(/hour/minute/second) เป็นข้อความ -> Timestamp (NaT ถ้าไม่ใช่วันที่จริง)
+    fields = {}
+    for name in ["year", "month", "day", "hour", "minute", "second"]:
+        if name in parts.columns:
+            fields[name] = pd.to_numeric(parts[name], errors="coerce")
+    # ปีนอกช่วงของ datetime64[ns] (เช่น 2399 ที่ไม่ถึงเกณฑ์ พ.ศ.) เป็น NaT แทน overflow
+    fields["year"] = _normalize_year(fields["year"], buddhist).where(lambda y: y.between(1678, 2261))
+    for name in ["hour", "minute", "second"]:
+        if name in fields:
+            fields[name] = fields[name].fillna(0)
+    frame = pd.DataFrame(fields, index=parts.index)
+    return pd.to_datetime(frame, errors="coerce")
+
+
+def _parse_uniques(uniques: pd.Index):
+    # คืน (Timestamp ต่อค่าที่ไม่ซ้ำ, ชื่อรูปแบบต่อค่าที่ไม่ซ้ำ)
+    values = pd.Series(uniques.to_numpy(dtype=object), dtype=object)
+    result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    fmt = pd.Series("unparsed", index=values.index, dtype=object)
+    todo = pd.Series(True, index=values.index)
+
+    # cell ที่เป็นวันที่อยู่แล้ว
+    is_dt = values.map(lambda v: isinstance(v, (dt.datetime, dt.date, np.datetime64)))
+    if is_dt.any():
+        result[is_dt] = pd.to_datetime(values[is_dt], errors="coerce")
+        fmt[is_dt] = "datetime"
+        todo &= ~is_dt
+
+    # ตัวเลข: Excel serial หรือ yyyymmdd (ข้อความที่เป็นตัวเลขล้วนก็นับด้วย)
+    text = values[todo].map(lambda v: str(v).translate(THAI_DIGITS).strip())
+    # yyyymmdd ที่ถูกอ่านเป็น float ("20240115.0")
+    text = text.str.replace(r"^(\d{8})\.0+$", r"\1", regex=True)
+    numbers = pd.to_numeric(text, errors="coerce")
+    serial = numbers.between(*SERIAL_RANGE)
+    if serial.any():
+        idx = serial[serial].index
+        result[idx] = EXCEL_EPOCH + pd.to_timedelta(numbers[idx], unit="D")
+        fmt[idx] = "excel_serial"
+        todo[idx] = False
+
+    # ข้อความ: ลองแต่ละรูปแบบด้วย regex แบบ vectorized บนค่าที่ยังแปลงไม่ได้
+    for name, pattern in PATTERNS.items():
+        rest = text[todo[text.index]]
+        if rest.empty:
+            break
+        parts = rest.str.extract(pattern).dropna(subset=["year", "month", "day"])
+        if parts.empty:
+            continue
+        if name == "thai_month":
+            parts["month"] = parts["month"].map(lambda m: THAI_MONTH_KEYS.get(m.replace(".", "")))
+            parts = parts.dropna(subset=["month"])
+        parsed = _build(parts, buddhist=name == "thai_month").dropna()
+        result[parsed.index] = parsed
+        fmt[parsed.index] = name
+        todo[parsed.index] = False
+
+    # ค่าที่เหลือ (มักมีไม่กี่ค่า) ให้ pandas เดารูปแบบ
+    rest = text[todo[text.index] & (text != "") & numbers.isna()]
+    if not rest.empty:
+        parsed = pd.to_datetime(rest, errors="coerce", dayfirst=True, format="mixed").dropna()
+        parsed = parsed[parsed.between(pd.Timestamp.min, pd.Timestamp.max)]
+        result[parsed.index] = parsed
+        fmt[parsed.index] = "fallback"
+    return result, fmt
+
+
+def parse_dates(series: pd.Series):
+    # คืน (Series datetime64, ตารางจำนวนแถวที่แปลงได้ต่อรูปแบบ)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        report = pd.DataFrame({"รูปแบบ": ["datetime", "unparsed"],
+                               "จำนวนแถว": [int(series.notna().sum()), int(series.isna().sum())]})
+        return series, report
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed, fmt = _parse_uniques(pd.Index(uniques, dtype=object))
+
+    values = parsed.to_numpy(dtype="datetime64[ns]")
+    out = np.full(len(codes), np.datetime64("NaT"), dtype="datetime64[ns]")
+    valid = codes >= 0
+    out[valid] = values[codes[valid]]
+
+    # จำนวนแถวต่อรูปแบบ (ค่าว่างนับเป็น unparsed)
+    rows = np.bincount(codes[valid], minlength=len(uniques))
+    counts = pd.Series(rows, index=fmt.to_numpy()).groupby(level=0).sum()
+    counts["unparsed"] = counts.get("unparsed", 0) + int((~valid).sum())
+    counts = counts.reindex(FORMATS, fill_value=0)
+    report = pd.DataFrame({"รูปแบบ": counts.index, "จำนวนแถว": counts.to_numpy()})
+    report = report[report["จำนวนแถว"] > 0].reset_index(drop=True)
+    return pd.Series(out, index=series.index, name=series.name), report
+
+
+def report_counts(report: pd.DataFrame) -> dict:
+    # {รูปแบบ: จำนวนแถว} สำหรับเก็บใน df.attrs (คัดลอกตาม DataFrame ได้ถูกกว่าตาราง)
+    return {str(k): int(v) for k, v in zip(report["รูปแบบ"], report["จำนวนแถว"])}
+
+
+def counts_report(counts: dict) -> pd.DataFrame:
+    total = sum(counts.values()) or 1
+    report = pd.DataFrame({"รูปแบบ": list(counts), "จำนวนแถว": list(counts.values())})
+    report["สัดส่วน %"] = (report["จำนวนแถว"] / total * 100).round(2)
+    return report
@@ -0,0 +1,369 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# รวมชื่อ Defect ที่สะกดต่างกันเป็นชื่อมาตรฐาน (alias map)
+# -----------------------------
+# Defect เป็นข้อความอิสระ ("รอยยับ", "รอยยับ ", "คาเลนเดอร์" / "คาร์เลนเดอร์", ...) ถ้าไม่รวม
+# ทุก groupby / cube / series ที่พยากรณ์จะแตกเป็นหลาย key ทั้งที่เป็นปัญหาเดียวกัน
+# ทำงานเฉพาะค่าที่ไม่ซ้ำ (factorize แล้ว broadcast กลับด้วย code เหมือน rule_engine):
+#   1. key = ข้อความที่ normalize แบบรู้จักภาษาไทย (NFC, ตัด zero-width/เว้นวรรค/เครื่องหมาย
+#      และตัวการันต์ เช่น "ร์") ค่าที่ได้ key เดียวกันคือชื่อเดียวกัน วรรณยุกต์คงไว้ (เปลี่ยนความหมายได้)
+#   2. key ที่เคยเห็นแล้ว -> ชื่อมาตรฐานจาก alias map (SQLite)
+#   3. key ใหม่ (พบบ่อยก่อน) -> MinHash ของ character 3-gram + LSH (BANDS x ROWS) หาตัวแทนกลุ่มที่น่าจะคล้าย
+#      โดยไม่ต้องเทียบทุกคู่ แล้วยืนยันด้วย Jaccard กับตัวแทนกลุ่ม >= SIMILARITY (ตัวเลขในข้อความต้องตรงกัน)
+#      เข้ากลุ่มที่คล้ายที่สุด ไม่มีก็เป็นตัวแทนของกลุ่มใหม่ (เทียบกับตัวแทนเท่านั้น A~B, B~C ไม่ทำให้ A~C)
+#      ตัวแทนของกลุ่มเดิม = key ของชื่อมาตรฐาน กลุ่มใหม่ใช้รูปแบบที่พบบ่อยที่สุดในกลุ่มเป็นชื่อมาตรฐาน
+#   4. resolve อ่าน alias map อย่างเดียว บันทึก key ใหม่ลง alias map เฉพาะเมื่อผู้เรียกขอ (learn=True:
+#      งานจากหน้าเว็บ / alias_editor) CLI และ benchmark จึงไม่เขียนไฟล์ alias
+#      (บันทึกครั้งแรกแล้วไม่เปลี่ยนเอง ชื่อจึงคงที่ข้ามไฟล์)
+# ชื่อมาตรฐานแก้ได้ใน sidebar (alias_editor) แถวที่แก้เป็น manual และรวมอยู่ใน key ของแคชการอ่านไฟล์
+ALIAS_PATH = os.environ.get(
+    "CLAIM_ALIAS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".claim_store", "defect_aliases.sqlite"),
+)
+
+SHINGLE = 3
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SIMILARITY = 0.6
+MAX_CANDIDATES = 32
+# รูปแบบของ key (เก็บใน PRAGMA user_version) alias map ที่สร้างด้วยรูปแบบเก่าถูกคำนวณ key ใหม่ตอนเปิด
+# 2 = คงวรรณยุกต์ไว้ใน key
+ALIAS_KEY_VERSION = 2
+# จำนวน shingle ต่อรอบตอนคำนวณ MinHash (จำกัดหน่วยความจำของ array shingle x permutation)
+CHUNK_SHINGLES = 1 << 16
+
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+_SPACE = re.compile(r"\s+")
+# ตัวการันต์: พยัญชนะ (+ สระ อิ/อุ) ตามด้วยทัณฑฆาต ไม่ออกเสียงและมักสะกดตกหล่น
+_KARAN = re.compile("[ก-ฮ][ิุ]?์")
+_DIGITS = re.compile(r"\d+")
+
+# พารามิเตอร์ของ MinHash (multiply-shift hashing) seed คงที่ ให้ signature เหมือนกันทุก process
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def clean_defect(text) -> str:
+    # รูปแบบที่ใช้แสดง: NFC, นิคหิต + สระอา -> สระอำ, ตัด zero-width และเว้นวรรคซ้ำ
+    text = unicodedata.normalize("NFC", str(text)).translate(_ZERO_WIDTH)
+    text = text.replace("ํา", "ำ")
+    return _SPACE.sub(" ", text).strip()
+
+
+def defect_key(text) -> str:
+    # key ที่ใช้จับคู่: ตัดตัวการันต์ เว้นวรรค และเครื่องหมาย / สัญลักษณ์ ตัวพิมพ์เล็ก
+    text = _KARAN.sub("", clean_defect(text).casefold())
+    return "".join(c for c in text if not c.isspace() and unicodedata.category(c)[0] not in "PS")
+
+
+def shingles(key: str) -> set:
+    if len(key) <= SHINGLE:
+        return {key}
+    return {key[i: i + SHINGLE] for i in range(len(key) - SHINGLE + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_sets: list) -> np.ndarray:
+    # signature (จำนวน set x NUM_PERM) ค่าต่ำสุดของ hash แต่ละ permutation ต่อ set
+    sizes = np.fromiter((len(s) for s in shingle_sets), dtype=np.intp, count=len(shingle_sets))
+    flat = np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) for s in shingle_sets for g in s), dtype=np.uint64, count=int(sizes.sum())
+    )
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+    out = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint32)
+    i = 0
+    while i < len(shingle_sets):
+        # รวม set ต่อกันจนได้ประมาณ CHUNK_SHINGLES shingle ต่อรอบ
+        j = max(i + 1, int(np.searchsorted(starts, starts[i] + CHUNK_SHINGLES, side="right")) - 1)
+        j = min(j, len(shingle_sets))
+        hashed = ((flat[starts[i]: starts[j], None] * _A + _B) >> np.uint64(32)).astype(np.uint32)
+        out[i:j] = np.minimum.reduceat(hashed, starts[i:j] - starts[i], axis=0)
+        i = j
+    return out
+
+
+def lsh_pairs(signatures: np.ndarray, new: np.ndarray, salt=None) -> set:
+    # คู่ (i, j) ที่ signature ตรงกันครบทุกแถวในอย่างน้อยหนึ่ง band และมีอย่างน้อยหนึ่งตัวเป็นค่าใหม่
+    # แต่ละ band รวมเป็น hash 64 บิต (ชนกันบ้างได้ คู่ที่ได้ยังต้องผ่านการยืนยันด้วย Jaccard)
+    # salt = hash ที่ต้องตรงกันด้วย (ตัวเลขในข้อความ) ค่าที่ต่างกันแค่เลขล็อตจึงไม่อยู่ bucket เดียวกัน
+    # bucket ใหญ่เทียบค่าใหม่กับสมาชิกแรก MAX_CANDIDATES ตัวเท่านั้น (ลำดับแถวเดิม: ผู้เรียกวางตัวแทนกลุ่มไว้ก่อน)
+    pairs = set()
+    sig = signatures.astype(np.uint64)
+    for b in range(BANDS):
+        band = sig[:, b * ROWS: (b + 1) * ROWS]
+        bucket = np.zeros(len(sig), dtype=np.uint64) if salt is None else salt.copy()
+        for r in range(ROWS):
+            bucket = bucket * np.uint64(0x100000001B3) + band[:, r]
+        order = np.argsort(bucket, kind="stable")
+        starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        has_new = np.maximum.reduceat(new[order], starts) if len(order) else starts
+        for start, size in zip(starts[(sizes > 1) & has_new], sizes[(sizes > 1) & has_new]):
+            members = order[start: start + size]
+            head = members[:MAX_CANDIDATES]
+            for i in members[new[members]]:
+                pairs.update((min(i, j), max(i, j)) for j in head if j != i)
+    return pairs
+
+
+class DefectAliases:
+    def __init__(self, path=ALIAS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS defect_alias (kind TEXT, key TEXT, alias TEXT, canonical TEXT, "
+                "manual INTEGER DEFAULT 0, PRIMARY KEY (kind, key))"
+            )
+            # เลขที่เพิ่มทุกครั้งที่แก้ชื่อมาตรฐานเอง (digest คำนวณใหม่เฉพาะเมื่อเลขนี้เปลี่ยน)
+            con.execute("CREATE TABLE IF NOT EXISTS alias_version (id INTEGER PRIMARY KEY, version INTEGER)")
+            if con.execute("PRAGMA user_version").fetchone()[0] < ALIAS_KEY_VERSION:
+                self._rekey(con)
+                con.execute(f"PRAGMA user_version = {ALIAS_KEY_VERSION}")
+        self._lock = threading.Lock()
+        # kind -> ({key: ตำแหน่ง}, shingle ของแต่ละ key, signature) ของ key ที่มี signature แล้ว
+        self._index = {}
+        # (version, digest) ล่าสุด
+        self._digest = None
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    @staticmethod
+    def _rekey(con):
+        # alias map ที่สร้างด้วย key รูปแบบเก่า: คำนวณ key ใหม่จากรูปแบบที่พบ (alias)
+        # หลายแถวได้ key ใหม่เดียวกัน เก็บแถวที่แก้เอง (manual) ก่อน รูปแบบอื่นของ key เดิมจะถูกจัดกลุ่มใหม่เมื่อพบอีก
+        rows = con.execute(
+            "SELECT kind, alias, canonical, manual FROM defect_alias ORDER BY manual DESC, kind, key"
+        ).fetchall()
+        if not rows:
+            return
+        con.execute("DELETE FROM defect_alias")
+        con.executemany(
+            "INSERT OR IGNORE INTO defect_alias (kind, key, alias, canonical, manual) VALUES (?, ?, ?, ?, ?)",
+            [(kind, defect_key(alias), alias, canonical, manual) for kind, alias, canonical, manual in rows
+             if defect_key(alias)],
+        )
+
+    def load(self, kind: str) -> dict:
+        # key -> ชื่อมาตรฐาน
+        with closing(self._connect()) as con:
+            return dict(con.execute("SELECT key, canonical FROM defect_alias WHERE kind = ?", (kind,)))
+
+    def table(self, kind: str) -> pd.DataFrame:
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(
+                "SELECT key, alias, canonical, manual FROM defect_alias WHERE kind = ? ORDER BY canonical, alias",
+                con, params=(kind,),
+            )
+
+    def version(self) -> int:
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT version FROM alias_version WHERE id = 0").fetchone()
+        return row[0] if row else 0
+
+    def digest(self) -> str:
+        # hash ของแถวที่แก้เอง (ใช้ใน key ของแคช: แก้ alias map แล้วผลที่แคชไว้หมดอายุ)
+        # ถูกเรียกทุกครั้งที่ค้นแคช จึงอ่านแถว manual ใหม่เฉพาะเมื่อ version เปลี่ยน
+        version = self.version()
+        cached = self._digest
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with closing(self._connect()) as con:
+            rows = con.execute(
+                "SELECT kind, key, canonical FROM defect_alias WHERE manual = 1 ORDER BY kind, key"
+            ).fetchall()
+        digest = hashlib.sha256(repr(rows).encode()).hexdigest()[:16]
+        self._digest = (version, digest)
+        return digest
+
+    def set_canonical(self, kind: str, edits: dict) -> int:
+        # edits = {key: ชื่อมาตรฐานใหม่} บันทึกเป็น manual
+        rows = [(clean_defect(canonical), kind, key) for key, canonical in edits.items() if clean_defect(canonical)]
+        with closing(self._connect()) as con, con:
+            con.executemany("UPDATE defect_alias SET canonical = ?, manual = 1 WHERE kind = ? AND key = ?", rows)
+            con.execute(
+                "INSERT INTO alias_version VALUES (0, 1) ON CONFLICT(id) DO UPDATE SET version = version + 1"
+            )
+        return len(rows)
+
+    def _signatures(self, kind: str, keys: list):
+        # shingle + signature ของ key เดิม (คำนวณเพิ่มเฉพาะ key ที่ยังไม่เคยคำนวณใน process นี้)
+        with self._lock:
+            position, sets, sigs = self._index.get(kind, ({}, [], np.empty((0, NUM_PERM), dtype=np.uint32)))
+            missing = [k for k in dict.fromkeys(keys) if k not in position]
+            if missing:
+                extra = [shingles(k) for k in missing]
+                position = {**position, **{k: len(sets) + i for i, k in enumerate(missing)}}
+                sets = sets + extra
+                sigs = np.vstack([sigs, minhash(extra)])
+                self._index[kind] = (position, sets, sigs)
+        rows = [position[k] for k in keys]
+        return [sets[i] for i in rows], sigs[rows]
+
+    def resolve(self, kind: str, values: list, counts=None, learn=False) -> list:
+        # ชื่อมาตรฐานของแต่ละค่า (counts = จำนวนแถวต่อค่า ใช้เรียงลำดับและเลือกชื่อของกลุ่มใหม่)
+        # learn=False อ่าน alias map อย่างเดียว (key ใหม่จัดกลุ่มในหน่วยความจำ) learn=True บันทึก key ใหม่ลง alias map
+        counts = np.ones(len(values)) if counts is None else counts
+        cleaned = [clean_defect(v) for v in values]
+        keys = [defect_key(v) for v in cleaned]
+        mapping = self.load(kind)
+
+        # key ใหม่: รูปแบบที่พบบ่อยที่สุดของแต่ละ key และจำนวนแถวรวม
+        new_rows = {}
+        for key, text, count in zip(keys, cleaned, counts):
+            if not key or key in mapping:
+                continue
+            variants = new_rows.setdefault(key, Counter())
+            variants[text] += count
+        if new_rows:
+            learned = self._cluster(kind, mapping, new_rows)
+            if learn:
+                with closing(self._connect()) as con, con:
+                    con.executemany(
+                        "INSERT OR IGNORE INTO defect_alias (kind, key, alias, canonical) VALUES (?, ?, ?, ?)",
+                        [(kind, key, alias, canonical) for key, (alias, canonical) in learned.items()],
+                    )
+                # process อื่นอาจบันทึก key เดียวกันไปก่อน ใช้ค่าที่อยู่ในฐานข้อมูล
+                mapping = self.load(kind)
+            else:
+                mapping.update((key, canonical) for key, (_, canonical) in learned.items())
+        return [mapping.get(key, text) if key else text for key, text in zip(keys, cleaned)]
+
+    def _cluster(self, kind: str, mapping: dict, new_rows: dict) -> dict:
+        # จัดกลุ่ม key ใหม่กับตัวแทนกลุ่มด้วย MinHash LSH คืน {key ใหม่: (alias, ชื่อมาตรฐาน)}
+        # ตัวแทนกลุ่มเดิม = key ของชื่อมาตรฐาน (ถ้าไม่มีใน alias map ใช้ key แรกของกลุ่ม)
+        reps = {}
+        for key, canonical in sorted(mapping.items()):
+            if reps.setdefault(canonical, key) != key and key == defect_key(canonical):
+                reps[canonical] = key
+        known = list(reps.values())
+        known_sets, known_sigs = self._signatures(kind, known)
+        # key ใหม่ที่พบบ่อยก่อน (เป็นตัวแทนของกลุ่มใหม่ก่อนรูปแบบที่สะกดต่างออกไป)
+        new_keys = sorted(new_rows, key=lambda k: (-sum(new_rows[k].values()), k))
+        new_sets = [shingles(k) for k in new_keys]
+        keys = known + new_keys
+        sets = known_sets + new_sets
+        signatures = np.vstack([known_sigs, minhash(new_sets)])
+        is_new = np.zeros(len(keys), dtype=bool)
+        is_new[len(known):] = True
+
+        digits = np.fromiter(
+            (zlib.crc32(" ".join(_DIGITS.findall(k)).encode()) for k in keys), dtype=np.uint64, count=len(keys)
+        )
+        neighbours = {}
+        for i, j in lsh_pairs(signatures, is_new, salt=digits):
+            # i < j: j เป็นค่าใหม่เสมอ และ i มาก่อนในลำดับ (ตัวแทนที่เป็นไปได้ของ j)
+            neighbours.setdefault(j, []).append(i)
+
+        # ตัวแทนของแต่ละ key (ตัวแทนเดิมคือตัวเอง) ค่าใหม่เทียบกับตัวแทนเท่านั้น ไม่เชื่อมต่อกันเป็นทอด
+        owner = list(range(len(known))) + [None] * len(new_keys)
+        for j in range(len(known), len(keys)):
+            best, score = j, SIMILARITY
+            for i in sorted(neighbours.get(j, ())):
+                if owner[i] != i:
+                    continue
+                similarity = jaccard(sets[i], sets[j])
+                # คล้ายที่สุด (เท่ากันใช้ตัวแทนที่มาก่อน)
+                if similarity >= score and (best == j or similarity > score):
+                    best, score = i, similarity
+            owner[j] = best
+
+        groups = {}
+        for j in range(len(known), len(keys)):
+            groups.setdefault(owner[j], []).append(keys[j])
+
+        learned = {}
+        for head, fresh in groups.items():
+            if head < len(known):
+                canonical = mapping[keys[head]]
+            else:
+                # รูปแบบที่มีแถวมากที่สุด (เท่ากันใช้ข้อความที่ยาวกว่า มักเป็นแบบที่ใส่วรรณยุกต์/การันต์ครบ)
+                totals = Counter()
+                for key in fresh:
+                    totals.update(new_rows[key])
+                canonical = min(totals, key=lambda text: (-totals[text], -len(text), text))
+            for key in fresh:
+                alias = min(new_rows[key], key=lambda text: (-new_rows[key][text], text))
+                learned[key] = (alias, canonical)
+        return learned
+
+
+def canonicalize_defects(df: pd.DataFrame, kind: str, source="Defect", aliases=None, learn=False) -> pd.DataFrame:
+    # แทน Defect ด้วยชื่อมาตรฐาน (categorical) และเก็บข้อความเดิมไว้ใน DefectRaw
+    # aliases = alias map ที่ใช้ (None = ทำความสะอาดข้อความอย่างเดียว ไม่อ่าน/เขียนไฟล์ alias)
+    # learn = บันทึก Defect รูปแบบใหม่ลง aliases (เฉพาะงานจากหน้าเว็บ)
+    if source not in df.columns:
+        return df
+    codes, uniques = pd.factorize(df[source])
+    if aliases is None:
+        canonical = [clean_defect(u) for u in uniques]
+    else:
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        canonical = aliases.resolve(kind, [str(u) for u in uniques], counts, learn=learn)
+    canon_codes, categories = pd.factorize(np.array(canonical, dtype=object))
+    row_codes = np.append(canon_codes, -1)[codes]
+    df["DefectRaw"] = df[source]
+    df[source] = pd.Categorical.from_codes(row_codes, categories=categories)
+    return df
+
+
+_default_aliases = None
+
+
+def get_aliases() -> DefectAliases:
+    global _default_aliases
+    if _default_aliases is None:
+        _default_aliases = DefectAliases()
+    return _default_aliases
+
+
+def alias_editor(kind: str, store):
+    # sidebar: ดู/แก้ชื่อมาตรฐานของ Defect แล้วปรับข้อมูลในคลังตาม alias map
+    import streamlit as st
+
+    aliases = get_aliases()
+    table = aliases.table(kind)
+    with st.sidebar.expander("🔤 ชื่อ Defect ที่รวมกัน"):
+        st.caption(f"{len(table):,} รูปแบบ → {table['canonical'].nunique():,} ชื่อมาตรฐาน")
+        query = st.text_input("ค้นหา", key=f"{kind}_alias_query")
+        if query:
+            mask = table["alias"].str.contains(query, regex=False) | table["canonical"].str.contains(query, regex=False)
+            shown = table[mask]
+        else:
+            # ค่าเริ่มต้นแสดงเฉพาะชื่อที่รวมหลายรูปแบบ / แถวที่แก้เอง
+            shared = table["canonical"].duplicated(keep=False)
+            shown = table[shared | (table["alias"] != table["canonical"]) | (table["manual"] == 1)]
+        shown = shown.head(500)
+        edited = st.data_editor(
+            shown[["alias", "canonical"]].rename(columns={"alias": "รูปแบบที่พบ", "canonical": "ชื่อมาตรฐาน"}),
+            disabled=["รูปแบบที่พบ"], hide_index=True, key=f"{kind}_alias_editor",
+        )
+        changed = edited["ชื่อมาตรฐาน"].to_numpy() != shown["canonical"].to_numpy()
+        if st.button("บันทึกและปรับข้อมูลในคลัง", key=f"{kind}_alias_save"):
+            aliases.set_canonical(kind, dict(zip(shown["key"][changed], edited["ชื่อมาตรฐาน"][changed])))
+            rows = store.apply_defect_aliases(kind, aliases)
+            if rows:
+                # Defect ในคลังเปลี่ยน: ประมวลผล control chart รายสัปดาห์ใหม่ (import ตอนใช้ กัน import วน)
+                from control_monitor import refresh_monitor
+
+                refresh_monitor(store, kind)
+            st.success(f"ปรับชื่อ Defect ในคลัง {rows:,} แถว")
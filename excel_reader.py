@@ -0,0 +1,249 @@
+from xml.etree.ElementTree import XMLParser
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# ตัวอ่าน Excel แบบเลือกเฉพาะคอลัมน์ที่ใช้
+# -----------------------------
+# อ่าน header แถวแรกด้วย openpyxl read_only แล้ว resolve ชื่อคอลัมน์ไทย/อังกฤษ
+# ผ่าน rename_map ครั้งเดียว จากนั้น stream ทีละแถวและเก็บเฉพาะคอลัมน์ที่ต้องการ
+# หน่วยความจำจึงขึ้นกับจำนวนคอลัมน์ที่เลือก ไม่ใช่ความกว้างของชีตทั้งหมด
+# openpyxl import ตอนอ่านไฟล์ครั้งแรก หน้าเว็บที่ยังไม่มีไฟล์อัปโหลดจึงไม่ต้องรอ (warmup.py โหลดไว้ล่วงหน้า)
+
+# ชนิดข้อมูลของคอลัมน์มาตรฐาน (คอลัมน์วันที่เก็บค่าดิบไว้ให้ขั้นตอน prepare แปลง)
+column_dtypes = {
+    "SUP": "object",
+    "Defect": "object",
+    "Grade": "object",
+    "Date": "object",
+    "ShipDate": "object",
+    "IssueDate": "object",
+    "DocNo": "object",
+    "ShipNo": "object",
+    "Lot": "object",
+    "Code": "object",
+    "Width": "float64",
+    "Weight": "float64",
+    "Month": "Int64",
+    "Week": "Int64",
+    "Quarter": "Int64",
+    "Year": "Int64",
+}
+
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_CELL, _VALUE, _ROW, _TEXT = _NS + "c", _NS + "v", _NS + "row", _NS + "t"
+# ขนาด chunk ที่ส่งให้ XMLParser ต่อครั้ง
+CHUNK_BYTES = 1 << 16
+
+
+def _header_key(value):
+    return str(value).strip() if value is not None else ""
+
+
+def read_headers(file) -> dict:
+    # {ชื่อชีต: header แถวแรก} ของทุกชีตในไฟล์ (เปิด workbook ครั้งเดียว)
+    from openpyxl import load_workbook
+
+    if hasattr(file, "seek"):
+        file.seek(0)
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        return {
+            ws.title: list(next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None) or [])
+            for ws in wb.worksheets
+        }
+    finally:
+        wb.close()
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+
+def resolve_columns(header, rename_map: dict, columns=None) -> dict:
+    # คืน {ชื่อคอลัมน์มาตรฐาน: ตำแหน่งคอลัมน์ในชีต} (ถ้ามีหลายชื่อ alias ใช้คอลัมน์แรกที่พบ)
+    aliases = {_header_key(k): v for k, v in rename_map.items()}
+    wanted = set(columns) if columns is not None else None
+    positions = {}
+    for idx, name in enumerate(header):
+        key = _header_key(name)
+        canonical = aliases.get(key, key)
+        if not canonical or canonical in positions:
+            continue
+        if wanted is not None and canonical not in wanted:
+            continue
+        positions[canonical] = idx
+    return positions
+
+
+def _column_index(ref: str) -> int:
+    # "AB12" -> 27 (นับจาก 0)
+    n = 0
+    for ch in ref:
+        if ch.isdigit():
+            break
+        n = n * 26 + (ord(ch) - 64)
+    return n - 1
+
+
+def _can_scan(ws) -> bool:
+    # _scan_cells ใช้ของภายในของ ReadOnlyWorksheet (ทดสอบกับ openpyxl 3.1 ตาม requirements.txt)
+    # ถ้า openpyxl รุ่นอื่นไม่มี attribute เหล่านี้ ใช้ iter_rows(values_only=True) แทน
+    parent = getattr(ws, "parent", None)
+    return (
+        hasattr(ws, "_get_source") and hasattr(ws, "_shared_strings")
+        and hasattr(parent, "_date_formats") and hasattr(parent, "epoch")
+    )
+
+
+class _SheetTarget:
+    # target ของ XMLParser: expat เรียก start/data/end ตรง ๆ โดยไม่สร้าง element tree
+    # จึงไม่มี element ของแถวที่อ่านแล้วค้างอยู่ หน่วยความจำคงที่ไม่ว่าชีตจะยาวแค่ไหน
+    def __init__(self, slots: dict, shared, date_formats, epoch):
+        from openpyxl.utils.datetime import from_excel, from_ISO8601
+
+        self.slots = slots
+        self.shared = shared
+        self.date_formats = date_formats
+        self.epoch = epoch
+        self.from_excel = from_excel
+        self.from_iso = from_ISO8601
+        self.values = [None] * len(slots)
+        self.rows = []  # แถวที่อ่านครบแล้ว (_scan_cells ดึงออกหลัง feed แต่ละ chunk)
+        self.row_count = 0  # นับ element <row> (แอตทริบิวต์ r ไม่บังคับ แถวแรกคือ header)
+        self.col = -1
+        self.slot = None
+        self.type = None
+        self.style = None
+        self.text = []
+        self.capture = False
+
+    def start(self, tag, attrib):
+        if tag == _CELL:
+            ref = attrib.get("r")
+            self.col = _column_index(ref) if ref else self.col + 1
+            self.slot = self.slots.get(self.col)
+            if self.slot is not None:
+                self.type = attrib.get("t", "n")
+                self.style = attrib.get("s")
+                self.text = []
+        elif self.slot is not None and (tag == _VALUE or tag == _TEXT):
+            self.capture = True
+        elif tag == _ROW:
+            self.row_count += 1
+
+    def data(self, text):
+        if self.capture:
+            self.text.append(text)
+
+    def end(self, tag):
+        if tag == _CELL:
+            if self.slot is not None:
+                self._cell_value()
+            self.slot = None
+        elif tag == _VALUE or tag == _TEXT:
+            self.capture = False
+        elif tag == _ROW:
+            if self.row_count > 1:
+                self.rows.append(self.values)
+            self.values = [None] * len(self.slots)
+            self.col = -1
+
+    def close(self):
+        return None
+
+    def _cell_value(self):
+        t = self.type
+        v = "".join(self.text)
+        if t == "inlineStr":
+            self.values[self.slot] = v
+            return
+        if not self.text:
+            return
+        if t == "s":
+            v = self.shared[int(v)]
+        elif t == "n":
+            v = float(v) if ("." in v or "E" in v or "e" in v) else int(v)
+            if self.style is not None and int(self.style) in self.date_formats:
+                v = self.from_excel(v, self.epoch)
+        elif t == "b":
+            v = v == "1"
+        elif t == "d":
+            # วันที่แบบ ISO 8601 (ไฟล์ strict OOXML / LibreOffice) แปลงเป็น datetime เหมือน openpyxl
+            v = self.from_iso(v)
+        self.values[self.slot] = v
+
+
+def _scan_cells(ws, slots: dict):
+    # parse XML ของชีตเอง และแปลงค่าเฉพาะ cell ที่อยู่ในคอลัมน์ที่เลือก
+    # (openpyxl สร้างค่า/แปลงชนิดให้ทุก cell ในแถว ซึ่งเป็นต้นทุนหลักของชีตกว้าง)
+    target = _SheetTarget(slots, ws._shared_strings, ws.parent._date_formats, ws.parent.epoch)
+    parser = XMLParser(target=target)
+    with ws._get_source() as src:
+        for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+            parser.feed(chunk)
+            yield from target.rows
+            target.rows.clear()
+    parser.close()
+    yield from target.rows
+
+
+def _to_dtype(values: list, dtype: str) -> pd.Series:
+    if dtype == "object":
+        return pd.Series(values, dtype="object")
+    s = pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce")
+    if dtype == "Int64":
+        # ถ้ามีค่าที่ไม่ใช่จำนวนเต็มให้คงเป็น float แทนการปัดทิ้ง
+        valid = s.dropna()
+        if (np.floor(valid) == valid).all():
+            return s.astype("Int64")
+        return s.astype("float64")
+    return s.astype(dtype)
+
+
+def read_projected_excel(file, rename_map: dict, columns=None, dtypes=None, sheet_name=None) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    dtypes = {**column_dtypes, **(dtypes or {})}
+
+    if hasattr(file, "seek"):
+        file.seek(0)
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        header = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None)
+        if header is None:
+            return pd.DataFrame(columns=list(columns or []))
+
+        positions = resolve_columns(header, rename_map, columns)
+        if columns is not None:
+            order = [c for c in columns if c in positions]
+        else:
+            order = sorted(positions, key=positions.get)
+        if not order:
+            return pd.DataFrame()
+
+        idx = [positions[c] for c in order]
+        buffers = [[] for _ in order]
+        if _can_scan(ws):
+            rows = _scan_cells(ws, {i: slot for slot, i in enumerate(idx)})
+        else:
+            width = max(idx) + 1
+            rows = (
+                [row[i] if i < len(row) else None for i in idx]
+                for row in ws.iter_rows(min_row=2, max_col=width, values_only=True)
+            )
+        for picked in rows:
+            # ข้ามแถวว่าง (เช่น แถวท้ายชีตที่ถูกจัดรูปแบบไว้)
+            if all(v is None or v == "" for v in picked):
+                continue
+            for buf, v in zip(buffers, picked):
+                buf.append(v)
+    finally:
+        wb.close()
+
+    data = {}
+    for name, buf in zip(order, buffers):
+        data[name] = _to_dtype(buf, dtypes.get(name, "object"))
+        buf.clear()
+    return pd.DataFrame(data)
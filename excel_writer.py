@@ -0,0 +1,133 @@
+import re
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# ตัวเขียน XLSX แบบ streaming (หน่วยความจำคงที่)
+# -----------------------------
+# เขียน XML ของชีตลงไฟล์ zip ทีละ chunk โดยตรง (ไม่สร้าง object ต่อ cell แบบ openpyxl)
+# แต่ละ chunk แปลงเป็นข้อความแบบ vectorized ทีละคอลัมน์ด้วย pandas string ops
+# ข้อความเขียนเป็น inline string (ไม่ต้องเก็บ shared strings ทั้งไฟล์ไว้ใน RAM)
+# ตัวเลขเป็นตัวเลข, ค่าว่างเป็น cell ว่าง, แถวแรก (header) ตัวหนา
+CHUNK_ROWS = 20_000
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# อักขระควบคุมที่ XML ไม่อนุญาต
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_STYLES = (
+    _XML_HEADER + f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    "</styleSheet>"
+)
+
+
+def _text_cells(values: pd.Series, style="") -> pd.Series:
+    text = values.astype(str).str.replace(_INVALID_XML, "", regex=True)
+    text = text.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False) \
+        .str.replace(">", "&gt;", regex=False)
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">' + text + "</t></is></c>"
+
+
+def _column_cells(values: pd.Series) -> pd.Series:
+    # cell XML ของทั้งคอลัมน์ใน chunk
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(values):
+        cells = '<c t="b"><v>' + values.astype("int64").astype(str) + "</v></c>"
+    elif pd.api.types.is_numeric_dtype(values):
+        if pd.api.types.is_float_dtype(values):
+            missing = missing | np.isinf(values.to_numpy(dtype=np.float64, na_value=np.nan))
+        cells = "<c><v>" + values.astype(str) + "</v></c>"
+    elif pd.api.types.is_datetime64_any_dtype(values):
+        cells = _text_cells(values.dt.strftime("%Y-%m-%d %H:%M:%S").str.replace(" 00:00:00", "", regex=False))
+    else:
+        cells = _text_cells(values)
+    if missing.any():
+        cells = cells.where(~missing, "<c/>")
+    return cells
+
+
+class XlsxStreamWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self._sheets = []
+
+    def write_frame(self, name: str, df: pd.DataFrame, chunk_rows=CHUNK_ROWS):
+        index = len(self._sheets) + 1
+        self._sheets.append(name)
+        with self._zip.open(f"xl/worksheets/sheet{index}.xml", "w", force_zip64=True) as f:
+            f.write((_XML_HEADER + f'<worksheet xmlns="{_MAIN_NS}"><sheetData>').encode())
+            header = "".join(_text_cells(pd.Series([str(c) for c in df.columns]), ' s="1"'))
+            f.write(f"<row>{header}</row>".encode())
+            for start in range(0, len(df) if df.shape[1] else 0, chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                rows = "<row>"
+                for col in range(chunk.shape[1]):
+                    rows = rows + _column_cells(chunk.iloc[:, col]).to_numpy(dtype=object)
+                f.write(("</row>".join(rows) + "</row>").encode())
+            f.write(b"</sheetData></worksheet>")
+
+    def close(self):
+        n = len(self._sheets)
+        sheets = "".join(
+            f"<sheet name={quoteattr(name)} sheetId=\"{i}\" r:id=\"rId{i}\"/>"
+            for i, name in enumerate(self._sheets, 1)
+        )
+        rels = "".join(
+            f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, n + 1)
+        )
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, n + 1)
+        )
+        self._zip.writestr(
+            "[Content_Types].xml",
+            _XML_HEADER + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{overrides}</Types>",
+        )
+        self._zip.writestr(
+            "_rels/.rels",
+            _XML_HEADER + f'<Relationships xmlns="{_PKG_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>",
+        )
+        self._zip.writestr(
+            "xl/workbook.xml",
+            _XML_HEADER + f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>',
+        )
+        self._zip.writestr(
+            "xl/_rels/workbook.xml.rels",
+            _XML_HEADER + f'<Relationships xmlns="{_PKG_REL_NS}">{rels}'
+            f'<Relationship Id="rId{n + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/></Relationships>',
+        )
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
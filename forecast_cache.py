@@ -0,0 +1,181 @@
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from forecasting import holt_fit_batch, holt_states
+from ingest_cache import CACHE_DIR
+
+# -----------------------------
+# แคชผลพยากรณ์ต่อ series (SQLite) fit ใหม่เฉพาะ series ที่ข้อมูลเปลี่ยน
+# -----------------------------
+# แต่ละ series (SUP x Defect) เก็บ fingerprint ของข้อมูลรายเดือน (เดือนแรก + จำนวนเคสทุกเดือน)
+# พร้อมพารามิเตอร์ (alpha, beta) และ state (level, trend) หลังเดือนสุดท้าย และหลังเดือนก่อนสุดท้าย
+#   hit        : fingerprint เหมือนเดิม -> ใช้ค่าพยากรณ์ที่เก็บไว้
+#   update     : ข้อมูลเดิมเป็นส่วนต้นของข้อมูลใหม่ (เพิ่มเดือนใหม่ หรือแก้แค่เดือนล่าสุด)
+#                -> เดิน state ต่อเฉพาะเดือนที่เพิ่ม/เปลี่ยน ด้วยพารามิเตอร์เดิม (O(เดือนที่เพิ่ม))
+#   warm refit : update ต่อกันเกิน MAX_STALE_MONTHS เดือนนับจาก fit ครั้งล่าสุด
+#                -> optimize ใหม่ โดยเริ่ม pattern search จากพารามิเตอร์เดิม (ไม่ทำ grid search)
+#   refit      : series ใหม่ หรือข้อมูลย้อนหลังเปลี่ยน -> fit เต็มเหมือนไม่มีแคช
+# scope แยกชุดข้อมูล (เช่น roll / sheet) ที่มีชื่อ SUP x Defect ซ้ำกันไม่ให้ทับกัน
+FORECAST_CACHE_PATH = os.environ.get(
+    "CLAIM_FORECAST_CACHE", os.path.join(CACHE_DIR, "forecast_cache.sqlite")
+)
+MAX_STALE_MONTHS = 3
+
+STATE_COLUMNS = [
+    "length", "fitted_length", "fp_full", "fp_head", "alpha", "beta",
+    "level", "trend", "level_head", "trend_head", "forecast",
+]
+
+
+def fingerprint(first_month: int, values) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.int64(first_month).tobytes())
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class ForecastCache:
+    def __init__(self, path=FORECAST_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        columns = ", ".join(
+            f"{c} TEXT" if c.startswith("fp_") else f"{c} INTEGER" if "length" in c else f"{c} REAL"
+            for c in STATE_COLUMNS
+        )
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                f'CREATE TABLE IF NOT EXISTS forecast_state (scope TEXT, "SUP" TEXT, "Defect" TEXT, '
+                f'{columns}, PRIMARY KEY (scope, "SUP", "Defect"))'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    def load(self, scope: str) -> pd.DataFrame:
+        with closing(self._connect()) as con:
+            stored = pd.read_sql_query(
+                "SELECT * FROM forecast_state WHERE scope = ?", con, params=(scope,)
+            )
+        return stored.drop(columns="scope").set_index(["SUP", "Defect"])
+
+    def save(self, scope: str, states: pd.DataFrame):
+        if states.empty:
+            return
+        columns = ["SUP", "Defect"] + STATE_COLUMNS
+        rows = [(scope,) + tuple(r) for r in states[columns].itertuples(index=False, name=None)]
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        with closing(self._connect()) as con, con:
+            con.executemany(
+                f"INSERT OR REPLACE INTO forecast_state (scope, {quoted}) VALUES ({placeholders})", rows
+            )
+
+    def clear(self, scope=None):
+        with closing(self._connect()) as con, con:
+            if scope is None:
+                con.execute("DELETE FROM forecast_state")
+            else:
+                con.execute("DELETE FROM forecast_state WHERE scope = ?", (scope,))
+
+    def forecast(self, keys_df: pd.DataFrame, Y, lengths, first, scope="default", batch_size=1024):
+        # คืน (ค่าพยากรณ์ต่อ series, สถิติ {hits, updates, warm_refits, refits})
+        S = len(keys_df)
+        sup = keys_df["SUP"].astype(str).to_numpy()
+        defect = keys_df["Defect"].astype(str).to_numpy()
+        stored = self.load(scope).reindex(pd.MultiIndex.from_arrays([sup, defect]))
+
+        fp_full = [fingerprint(first[i], Y[i, : lengths[i]]) for i in range(S)]
+        fp_head = [fingerprint(first[i], Y[i, : lengths[i] - 1]) for i in range(S)]
+
+        # ตัดสินว่าแต่ละ series เป็น hit / update / warm refit / refit
+        action = np.full(S, "refit", dtype=object)
+        start = np.zeros(S, dtype=np.intp)  # เดือนแรกที่ต้องเดิน state ต่อ (กรณี update)
+        from_head = np.zeros(S, dtype=bool)
+        old_len = pd.to_numeric(stored["length"]).to_numpy(dtype=np.float64)
+        old_fitted = pd.to_numeric(stored["fitted_length"]).to_numpy(dtype=np.float64)
+        old_full = stored["fp_full"].to_numpy()
+        old_head = stored["fp_head"].to_numpy()
+        for i in np.flatnonzero(~np.isnan(old_len)):
+            n = int(old_len[i])
+            if n == lengths[i] and old_full[i] == fp_full[i]:
+                action[i] = "hit"
+            elif n < lengths[i] and old_full[i] == fingerprint(first[i], Y[i, :n]):
+                action[i], start[i] = "update", n
+            elif 1 < n <= lengths[i] and old_head[i] == fingerprint(first[i], Y[i, : n - 1]):
+                action[i], start[i], from_head[i] = "update", n - 1, True
+            if action[i] == "update" and lengths[i] - old_fitted[i] > MAX_STALE_MONTHS:
+                action[i] = "warm_refit"
+
+        forecasts = np.full(S, np.nan)
+        states = pd.DataFrame({"SUP": sup, "Defect": defect, "length": lengths.astype(np.int64),
+                               "fp_full": fp_full, "fp_head": fp_head})
+        for col in ["fitted_length", "alpha", "beta", "level", "trend", "level_head", "trend_head", "forecast"]:
+            states[col] = pd.to_numeric(stored[col]).to_numpy(dtype=np.float64)
+
+        hit = action == "hit"
+        forecasts[hit] = stored["forecast"].to_numpy()[hit]
+
+        # update: เดิน state ต่อเฉพาะเดือนใหม่ ด้วยพารามิเตอร์เดิม
+        idx = np.flatnonzero(action == "update")
+        if idx.size:
+            steps = (lengths[idx] - start[idx]).astype(np.intp)
+            Ynew = np.zeros((idx.size, int(steps.max())))
+            for j, i in enumerate(idx):
+                Ynew[j, : steps[j]] = Y[i, start[i]: lengths[i]]
+            level0 = np.where(from_head[idx], states["level_head"].to_numpy()[idx], states["level"].to_numpy()[idx])
+            trend0 = np.where(from_head[idx], states["trend_head"].to_numpy()[idx], states["trend"].to_numpy()[idx])
+            alpha = states["alpha"].to_numpy()[idx]
+            beta = states["beta"].to_numpy()[idx]
+            level, trend, level_head, trend_head = holt_states(Ynew, steps, alpha, beta, level0, trend0)
+            self._set_states(states, idx, level, trend, level_head, trend_head)
+            forecasts[idx] = level + trend
+
+        # warm refit / refit: optimize ใหม่ทีละ batch
+        for name in ["warm_refit", "refit"]:
+            idx = np.flatnonzero(action == name)
+            for b in range(0, idx.size, batch_size):
+                part = idx[b: b + batch_size]
+                lens = lengths[part]
+                Yb = Y[part, : int(lens.max())]
+                if name == "warm_refit":
+                    fit = holt_fit_batch(Yb, lens, start_alpha=states["alpha"].to_numpy()[part],
+                                         start_beta=states["beta"].to_numpy()[part])
+                else:
+                    fit = holt_fit_batch(Yb, lens)
+                level, trend, level_head, trend_head = holt_states(
+                    Yb, lens, fit["alpha"], fit["beta"], fit["initial_level"], fit["initial_trend"]
+                )
+                states.loc[part, "alpha"] = fit["alpha"]
+                states.loc[part, "beta"] = fit["beta"]
+                states.loc[part, "fitted_length"] = lens
+                self._set_states(states, part, level, trend, level_head, trend_head)
+                forecasts[part] = fit["forecast"]
+
+        states["forecast"] = forecasts
+        states["fitted_length"] = states["fitted_length"].astype(np.int64)
+        self.save(scope, states[~hit])
+        stats = {name: int((action == name).sum()) for name in ["hit", "update", "warm_refit", "refit"]}
+        return forecasts, stats
+
+    @staticmethod
+    def _set_states(states, idx, level, trend, level_head, trend_head):
+        states.loc[idx, "level"] = level
+        states.loc[idx, "trend"] = trend
+        states.loc[idx, "level_head"] = level_head
+        states.loc[idx, "trend_head"] = trend_head
+
+
+_default_cache = None
+
+
+def get_forecast_cache() -> ForecastCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ForecastCache()
+    return _default_cache
@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# พยากรณ์เดือนถัดไปด้วย Holt (additive trend) แบบ batch ด้วย NumPy
+# -----------------------------
+# จัดทุก series (SUP x Defect) เป็น matrix เดียว (series x เดือน) ชิดซ้ายตามเดือนแรกของแต่ละ series
+# แล้ว fit smoothing_level / smoothing_trend ของทุก series พร้อมกัน
+#
+# สมการเหมือน statsmodels ExponentialSmoothing(trend="add"):
+#   l_t = a*y_t + (1-a)*(l_{t-1} + b_{t-1})
+#   b_t = b*(l_t - l_{t-1}) + (1-b)*b_{t-1},  0 <= b <= a <= 1
+# เมื่อกำหนด (a, b) แล้ว ค่าพยากรณ์เป็นฟังก์ชันเชิงเส้นของ (initial_level, initial_trend)
+# จึงหาค่าเริ่มต้นที่ดีที่สุดได้ด้วย least squares แบบ closed form ไม่ต้องใช้ optimizer
+
+FORECAST_COLUMN = "คาดการณ์เดือนหน้า"
+COUNT_COLUMN = "จำนวนเคส"
+
+# grid เริ่มต้นของ smoothing_level และสัดส่วน smoothing_trend / smoothing_level
+ALPHA_GRID = np.linspace(0.0, 1.0, 21)
+TREND_RATIO_GRID = np.linspace(0.0, 1.0, 11)
+REFINE_ROUNDS = 4
+PARAM_EPS = 1e-4
+
+
+def month_ordinal(month_key: pd.Series) -> pd.Series:
+    # "YYYY-MM" -> จำนวนเดือนนับจากปี 0 (ค่าที่แปลงไม่ได้เป็น NaN)
+    dates = pd.to_datetime(month_key.astype(str) + "-01", errors="coerce", format="%Y-%m-%d")
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+
+def build_series_matrix(monthly: pd.DataFrame, keys=("SUP", "Defect"), value_col=COUNT_COLUMN):
+    # คืน (keys_df, Y, lengths, last_month)
+    # Y[s, t] = จำนวนเคสของ series s ในเดือนที่ t นับจากเดือนแรกของ series นั้น (เดือนที่ไม่มีเคส = 0)
+    keys = list(keys)
+    data = monthly[keys + [value_col]].copy()
+    data["_m"] = month_ordinal(monthly["MonthKey"])
+    data = data.dropna(subset=keys + ["_m"])
+    if data.empty:
+        return pd.DataFrame(columns=keys), np.zeros((0, 0)), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    data["_m"] = data["_m"].astype(np.int64)
+    series_id, keys_df = _factorize_keys(data, keys)
+    first = np.full(len(keys_df), np.iinfo(np.int64).max, dtype=np.int64)
+    last = np.full(len(keys_df), np.iinfo(np.int64).min, dtype=np.int64)
+    months = data["_m"].to_numpy()
+    np.minimum.at(first, series_id, months)
+    np.maximum.at(last, series_id, months)
+
+    lengths = (last - first + 1).astype(np.intp)
+    Y = np.zeros((len(keys_df), int(lengths.max())), dtype=np.float64)
+    np.add.at(Y, (series_id, months - first[series_id]), data[value_col].to_numpy(dtype=np.float64))
+    return keys_df, Y, lengths, last
+
+
+def _factorize_keys(data: pd.DataFrame, keys: list):
+    # เรียง series ตาม key เหมือน groupby(keys)
+    grouped = data.groupby(keys, sort=True, observed=True)
+    series_id = grouped.ngroup().to_numpy()
+    keys_df = grouped.size().reset_index()[keys]
+    return series_id, keys_df
+
+
+def _evaluate(Y, lengths, alpha, beta):
+    # ประเมิน SSE ของทุกคู่พารามิเตอร์พร้อมกัน
+    # Y: (S, T), lengths: (S,), alpha/beta: (K, S)
+    # คืน sse (K, S), theta = (initial_level, initial_trend) (K, S, 2), forecast 1 เดือน (K, S)
+    K, S = alpha.shape
+    T = Y.shape[1]
+    f11 = 1.0 - alpha
+    f21 = -alpha * beta
+    f22 = 1.0 - alpha * beta
+
+    lvl = np.zeros((K, S))
+    trend = np.zeros((K, S))
+    # u_t = [1, 1] @ F^t : ผลของ (initial_level, initial_trend) ต่อค่าพยากรณ์ ณ เวลา t
+    u1 = np.ones((K, S))
+    u2 = np.ones((K, S))
+    srr = np.zeros((K, S))
+    sur1 = np.zeros((K, S))
+    sur2 = np.zeros((K, S))
+    m11 = np.zeros((K, S))
+    m12 = np.zeros((K, S))
+    m22 = np.zeros((K, S))
+    fy = np.zeros((K, S))
+    fu1 = np.zeros((K, S))
+    fu2 = np.zeros((K, S))
+
+    for t in range(T + 1):
+        pred = lvl + trend
+        end = lengths == t
+        if end.any():
+            fy[:, end] = pred[:, end]
+            fu1[:, end] = u1[:, end]
+            fu2[:, end] = u2[:, end]
+        if t == T:
+            break
+        live = (lengths > t).astype(np.float64)
+        y = Y[:, t]
+        r = (y - pred) * live
+        srr += r * r
+        sur1 += u1 * r
+        sur2 += u2 * r
+        m11 += u1 * u1 * live
+        m12 += u1 * u2 * live
+        m22 += u2 * u2 * live
+
+        new_lvl = alpha * y + f11 * pred
+        trend = beta * (new_lvl - lvl) + (1.0 - beta) * trend
+        lvl = new_lvl
+        u1, u2 = u1 * f11 + u2 * f21, u1 * f11 + u2 * f22
+
+    # แก้ระบบ 2x2 ของ least squares (เพิ่ม ridge เล็กน้อยกันกรณี matrix singular)
+    ridge = 1e-9 * (m11 + m22) + 1e-12
+    m11 = m11 + ridge
+    m22 = m22 + ridge
+    det = m11 * m22 - m12 * m12
+    theta1 = (m22 * sur1 - m12 * sur2) / det
+    theta2 = (m11 * sur2 - m12 * sur1) / det
+    sse = np.maximum(srr - (theta1 * sur1 + theta2 * sur2), 0.0)
+    forecast = fy + fu1 * theta1 + fu2 * theta2
+    theta = np.stack([theta1, theta2], axis=-1)
+    return sse, theta, forecast
+
+
+def _pick_best(sse, *arrays):
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(sse.shape[1])
+    return (sse[best, cols],) + tuple(a[best, cols] for a in arrays)
+
+
+def holt_fit_batch(Y, lengths, refine_rounds=REFINE_ROUNDS, start_alpha=None, start_beta=None):
+    # fit Holt ให้ทุก series พร้อมกัน: grid search หยาบ แล้ว pattern search รอบจุดที่ดีที่สุดของแต่ละ series
+    # start_alpha/start_beta (ขนาด (S,)): warm start จากพารามิเตอร์เดิม ข้าม grid search ไปเริ่ม pattern search เลย
+    # คืน dict ของ array ขนาด (S,): alpha, beta, initial_level, initial_trend, sse, forecast
+    S = Y.shape[0]
+    if start_alpha is not None:
+        alpha = np.clip(np.asarray(start_alpha, dtype=np.float64), PARAM_EPS, 1.0 - PARAM_EPS)[None, :]
+        ratio = np.clip(np.asarray(start_beta, dtype=np.float64) / alpha, 0.0, 1.0)
+    else:
+        a_grid, r_grid = np.meshgrid(ALPHA_GRID, TREND_RATIO_GRID, indexing="ij")
+        a_grid = a_grid.ravel()
+        r_grid = r_grid.ravel()
+        alpha = np.repeat(np.clip(a_grid, PARAM_EPS, 1.0 - PARAM_EPS)[:, None], S, axis=1)
+        ratio = np.repeat(r_grid[:, None], S, axis=1)
+
+    sse, theta, forecast = _evaluate(Y, lengths, alpha, alpha * ratio)
+    best = _pick_best(sse, alpha, ratio, theta[..., 0], theta[..., 1], forecast)
+    sse_b, alpha_b, ratio_b, l0_b, b0_b, fc_b = best
+
+    step_a = (ALPHA_GRID[1] - ALPHA_GRID[0]) / 2
+    step_r = (TREND_RATIO_GRID[1] - TREND_RATIO_GRID[0]) / 2
+    offsets = np.array([(da, dr) for da in (-1, 0, 1) for dr in (-1, 0, 1)], dtype=np.float64)
+    for _ in range(refine_rounds):
+        cand_a = np.clip(alpha_b[None, :] + offsets[:, :1] * step_a, PARAM_EPS, 1.0 - PARAM_EPS)
+        cand_r = np.clip(ratio_b[None, :] + offsets[:, 1:] * step_r, 0.0, 1.0)
+        sse, theta, forecast = _evaluate(Y, lengths, cand_a, cand_a * cand_r)
+        sse_b, alpha_b, ratio_b, l0_b, b0_b, fc_b = _pick_best(
+            sse, cand_a, cand_r, theta[..., 0], theta[..., 1], forecast
+        )
+        step_a /= 2
+        step_r /= 2
+
+    return {
+        "alpha": alpha_b,
+        "beta": alpha_b * ratio_b,
+        "initial_level": l0_b,
+        "initial_trend": b0_b,
+        "sse": sse_b,
+        "forecast": fc_b,
+    }
+
+
+def holt_states(Y, lengths, alpha, beta, initial_level, initial_trend):
+    # state (level, trend) ของแต่ละ series หลังรับข้อมูลครบ lengths เดือน และหลังรับ lengths-1 เดือน
+    # ค่าพยากรณ์เดือนถัดไป = level + trend ของ state แรก
+    level = np.asarray(initial_level, dtype=np.float64).copy()
+    trend = np.asarray(initial_trend, dtype=np.float64).copy()
+    level_head, trend_head = level.copy(), trend.copy()
+    for t in range(Y.shape[1]):
+        last = lengths - 1 == t
+        level_head[last], trend_head[last] = level[last], trend[last]
+        live = lengths > t
+        new_level = alpha * Y[:, t] + (1.0 - alpha) * (level + trend)
+        new_trend = beta * (new_level - level) + (1.0 - beta) * trend
+        level = np.where(live, new_level, level)
+        trend = np.where(live, new_trend, trend)
+    return level, trend, level_head, trend_head
+
+
+def _forecast_numpy(Y, lengths, batch_size):
+    forecasts = np.empty(Y.shape[0])
+    for start in range(0, Y.shape[0], batch_size):
+        sl = slice(start, start + batch_size)
+        lens = lengths[sl]
+        Yb = Y[sl, : int(lens.max())]
+        forecasts[sl] = holt_fit_batch(Yb, lens)["forecast"]
+    return forecasts
+
+
+def _forecast_statsmodels(Y, lengths):
+    # โหมดเดิม (fit ทีละ series ด้วย statsmodels) ไว้ตรวจสอบความถูกต้อง
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    forecasts = np.empty(Y.shape[0])
+    for i in range(Y.shape[0]):
+        ts = pd.Series(Y[i, : lengths[i]])
+        fit = ExponentialSmoothing(ts, trend="add", seasonal=None).fit()
+        forecasts[i] = fit.forecast(1).iloc[0]
+    return forecasts
+
+
+def forecast_next_month(monthly: pd.DataFrame, method="numpy", min_months=3, batch_size=1024,
+                        cache=None, scope="default") -> pd.DataFrame:
+    # monthly: คอลัมน์ MonthKey, SUP, Defect, จำนวนเคส
+    # คืน DataFrame [SUP, Defect, คาดการณ์เดือนหน้า] เฉพาะ series ที่มีข้อมูลอย่างน้อย min_months เดือน
+    # cache (forecast_cache.ForecastCache): fit ใหม่เฉพาะ series ที่ข้อมูลเปลี่ยน สถิติอยู่ใน result.attrs
+    keys_df, Y, lengths, last = build_series_matrix(monthly)
+    columns = ["SUP", "Defect", FORECAST_COLUMN]
+    keep = lengths >= min_months
+    if not keep.any():
+        return pd.DataFrame(columns=columns)
+
+    keys_df = keys_df[keep].reset_index(drop=True)
+    Y = Y[keep]
+    lengths = lengths[keep]
+    first = last[keep] - lengths + 1
+
+    stats = None
+    if method == "statsmodels":
+        forecasts = _forecast_statsmodels(Y, lengths)
+    elif cache is not None:
+        forecasts, stats = cache.forecast(keys_df, Y, lengths, first, scope, batch_size)
+    else:
+        forecasts = _forecast_numpy(Y, lengths, batch_size)
+
+    result = keys_df.copy()
+    if stats is not None:
+        result.attrs["forecast_cache"] = stats
+    # ตัดทศนิยมแบบ int() เหมือนเดิม
+    result[FORECAST_COLUMN] = np.trunc(forecasts).astype(int)
+    return result[columns]
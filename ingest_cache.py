@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from analysis import (
+    columns_roll,
+    columns_sheet,
+    compact_claims,
+    concat_claims,
+    memory_report,
+    prepare_roll_claims,
+    prepare_sheet_claims,
+    rename_map_roll,
+    rename_map_sheet,
+)
+from cube import build_cube
+from date_parser import counts_report
+from excel_reader import read_headers, read_projected_excel, resolve_columns
+from rule_engine import rules_digest
+
+# -----------------------------
+# แคชผลการอ่านไฟล์ Excel ตาม hash ของเนื้อไฟล์
+# -----------------------------
+# ชั้นที่ 1: DataFrame ในหน่วยความจำ (LRU จำกัดขนาดเป็นไบต์)
+# ชั้นที่ 2: สำเนา Parquet บนดิสก์ ใช้ร่วมกันข้ามผู้ใช้และหลังรีสตาร์ทเซิร์ฟเวอร์
+CACHE_DIR = os.environ.get(
+    "CLAIM_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".claim_cache"),
+)
+MAX_MEMORY_BYTES = int(os.environ.get("CLAIM_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# เพิ่มเลขนี้เมื่อแก้ขั้นตอน prepare เพื่อไม่ให้ใช้ไฟล์แคชเก่า
+CACHE_VERSION = 11
+
+# ชีตที่ header มีคอลัมน์เหล่านี้ครบถือเป็นชีตข้อมูลเคลม (ชีตสรุป/หน้าปกถูกข้าม)
+REQUIRED_COLUMNS = ["SUP", "Defect"]
+
+# kind -> (rename_map, คอลัมน์ที่ใช้, ฟังก์ชัน prepare)
+PREPARERS = {
+    "roll": (rename_map_roll, columns_roll, prepare_roll_claims),
+    "sheet": (rename_map_sheet, columns_sheet, prepare_sheet_claims),
+}
+
+
+def file_digest(file, chunk_size=1 << 20) -> str:
+    # hash เนื้อไฟล์ (รองรับ path, bytes และ UploadedFile ของ Streamlit)
+    h = hashlib.sha256()
+    if isinstance(file, (bytes, bytearray)):
+        h.update(file)
+        return h.hexdigest()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    if hasattr(file, "getbuffer"):
+        h.update(file.getbuffer())
+        return h.hexdigest()
+    pos = file.tell()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        h.update(chunk)
+    file.seek(pos)
+    return h.hexdigest()
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class IngestCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_MEMORY_BYTES, aliases=None, learn_aliases=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # alias map ที่ prepare ใช้รวมชื่อ Defect (None = ไม่ใช้) และจะบันทึกรูปแบบใหม่ลงไปหรือไม่
+        self.aliases = aliases
+        self.learn_aliases = learn_aliases
+        self._frames = OrderedDict()  # key -> (df, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        # key -> ตารางหน่วยความจำก่อน/หลัง compact_claims ของไฟล์ที่ parse ในรอบนี้
+        self.memory_reports = {}
+        # (digest, kind) -> รายชื่อชีตข้อมูลเคลมในไฟล์
+        self.sheets = {}
+        # key -> จำนวนแถวต่อรูปแบบวันที่ของชีต (มีสำเนา JSON คู่ไฟล์แคชบนดิสก์ ไม่พึ่ง attrs ของ DataFrame)
+        self.date_counts = {}
+
+    # ---------- หน่วยความจำ ----------
+    def _get_memory(self, key):
+        with self._lock:
+            item = self._frames.get(key)
+            if item is None:
+                return None
+            self._frames.move_to_end(key)
+            return item[0]
+
+    def _put_memory(self, key, df):
+        nbytes = frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._frames:
+                self._bytes -= self._frames.pop(key)[1]
+            self._frames[key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._frames:
+                _, (_, old_bytes) = self._frames.popitem(last=False)
+                self._bytes -= old_bytes
+
+    # ---------- ดิสก์ ----------
+    def _disk_paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".parquet", base + ".pkl"
+
+    def _get_disk(self, key):
+        parquet_path, pickle_path = self._disk_paths(key)
+        try:
+            if os.path.exists(parquet_path):
+                return pd.read_parquet(parquet_path)
+            if os.path.exists(pickle_path):
+                return pd.read_pickle(pickle_path)
+        except Exception:
+            # ไฟล์แคชเสีย/อ่านไม่ได้ ให้อ่าน Excel ใหม่แทน
+            return None
+        return None
+
+    def _put_disk(self, key, df):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        parquet_path, pickle_path = self._disk_paths(key)
+        tmp = f"{parquet_path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, parquet_path)
+            return
+        except (ImportError, ValueError, TypeError):
+            # คอลัมน์ที่มีชนิดข้อมูลปนกัน (เช่น Lot เป็นทั้งตัวเลขและข้อความ) เขียน Parquet ไม่ได้
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        tmp = f"{pickle_path}.{os.getpid()}.tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, pickle_path)
+
+    # ---------- API ----------
+    def get(self, key):
+        df = self._get_memory(key)
+        if df is not None:
+            self.stats["memory_hits"] += 1
+            return df
+        df = self._get_disk(key)
+        if df is not None:
+            self.stats["disk_hits"] += 1
+            self._put_memory(key, df)
+        return df
+
+    def put(self, key, df):
+        self._put_memory(key, df)
+        try:
+            self._put_disk(key, df)
+        except OSError:
+            # ดิสก์เต็ม/ไม่มีสิทธิ์เขียน ยังใช้แคชในหน่วยความจำได้
+            pass
+
+    def put_date_counts(self, key, counts):
+        self.date_counts[key] = counts
+        path = os.path.join(self.cache_dir, key + ".dates.json")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(counts, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def get_date_counts(self, key):
+        counts = self.date_counts.get(key)
+        if counts is None:
+            try:
+                with open(os.path.join(self.cache_dir, key + ".dates.json"), encoding="utf-8") as f:
+                    counts = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self.date_counts[key] = counts
+        return counts
+
+    def clear_memory(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+
+_default_cache = IngestCache()
+
+
+def cache_key(digest: str, kind: str, sheet: str = None, aliases=None) -> str:
+    # RootCause/Advice และชื่อ Defect มาตรฐานอยู่ในผลที่แคช จึงรวม hash ของไฟล์กฎ
+    # และของ alias ที่แก้เอง (หรือ "noalias" ถ้าไม่ใช้ alias map) ไว้ใน key ด้วย
+    alias_digest = "noalias" if aliases is None else aliases.digest()
+    key = f"{kind}-v{CACHE_VERSION}-{rules_digest()}-{alias_digest}-{digest}"
+    if sheet is not None:
+        key += "-" + hashlib.sha256(sheet.encode()).hexdigest()[:12]
+    return key
+
+
+def claim_sheets(file, kind: str, cache: IngestCache = None, digest: str = None) -> list:
+    # ชื่อชีตที่มีคอลัมน์ REQUIRED_COLUMNS (หลัง map ชื่อด้วย rename_map) เรียงตามลำดับในไฟล์
+    cache = cache or _default_cache
+    digest = digest or file_digest(file)
+    sheets = cache.sheets.get((digest, kind))
+    if sheets is None:
+        rename_map = PREPARERS[kind][0]
+        sheets = [
+            name for name, header in read_headers(file).items()
+            if all(c in resolve_columns(header, rename_map) for c in REQUIRED_COLUMNS)
+        ]
+        cache.sheets[(digest, kind)] = sheets
+    return sheets
+
+
+def load_claims(file, kind: str, cache: IngestCache = None, digest: str = None, sheet: str = None) -> pd.DataFrame:
+    # อ่านไฟล์เคลม (kind = "roll" หรือ "sheet") ผ่านแคช (sheet=None = ชีตแรก)
+    cache = cache or _default_cache
+    key = cache_key(digest or file_digest(file), kind, sheet, cache.aliases)
+
+    df = cache.get(key)
+    if df is None:
+        cache.stats["misses"] += 1
+        rename_map, columns, prepare = PREPARERS[kind]
+        raw = read_projected_excel(file, rename_map, columns, sheet_name=sheet)
+        prepared = prepare(raw, aliases=cache.aliases, learn_aliases=cache.learn_aliases)
+        # เก็บเป็น categorical / ตัวเลขขนาดเล็ก ให้ประวัติหลายล้านแถวอยู่ใน RAM ได้
+        df = compact_claims(prepared)
+        cache.memory_reports[key] = memory_report(prepared, df)
+        cache.put_date_counts(key, prepared.attrs.get("date_formats") or {})
+        del raw, prepared
+        cache.put(key, df)
+
+    # คืน shallow copy เพื่อไม่ให้หน้าเว็บแก้ DataFrame ที่อยู่ในแคช
+    return df.copy(deep=False)
+
+
+def load_workbook_claims(file, kind: str, cache: IngestCache = None, digest: str = None) -> pd.DataFrame:
+    # ทุกชีตข้อมูลเคลมในไฟล์ ต่อกันเป็น schema เดียว (แต่ละชีตแคชแยกกัน จึง parse ขนานกันได้)
+    digest = digest or file_digest(file)
+    sheets = claim_sheets(file, kind, cache, digest)
+    if not sheets:
+        # ไม่มีชีตไหนมีคอลัมน์ครบ ใช้ชีตแรกเหมือนเดิม (ให้ prepare / AI tips รายงานคอลัมน์ที่ขาด)
+        return load_claims(file, kind, cache, digest)
+    return concat_claims([load_claims(file, kind, cache, digest, sheet) for sheet in sheets])
+
+
+def combine_memory_reports(reports) -> pd.DataFrame:
+    # รวมตารางหน่วยความจำของหลายชีต (MB รวมกันต่อคอลัมน์ แถว "รวม" อยู่ท้ายสุด)
+    reports = [r for r in reports if r is not None]
+    if len(reports) <= 1:
+        return reports[0] if reports else None
+    combined = pd.concat(reports).groupby("คอลัมน์", sort=False).agg(
+        {"dtype เดิม": "first", "dtype ใหม่": "first", "MB เดิม": "sum", "MB ใหม่": "sum"}
+    ).reset_index()
+    total = combined["คอลัมน์"] == "รวม"
+    return pd.concat([combined[~total], combined[total]], ignore_index=True)
+
+
+def get_memory_report(file, kind: str, cache: IngestCache = None, digest: str = None, sheets=None):
+    # ตารางหน่วยความจำก่อน/หลัง compact ของไฟล์ รวมทุกชีต หรือเฉพาะ sheets ที่ระบุ
+    # (None ถ้าไฟล์ถูกโหลดจากแคชดิสก์)
+    cache = cache or _default_cache
+    digest = digest or file_digest(file)
+    sheets = sheets or claim_sheets(file, kind, cache, digest) or [None]
+    return combine_memory_reports(
+        cache.memory_reports.get(cache_key(digest, kind, sheet, cache.aliases)) for sheet in sheets
+    )
+
+
+def combine_date_reports(reports) -> pd.DataFrame:
+    # รวมตารางรูปแบบวันที่ของหลายไฟล์ (จำนวนแถวรวมกัน สัดส่วนคิดใหม่)
+    reports = [r for r in reports if r is not None]
+    if not reports:
+        return None
+    counts = pd.concat(reports).groupby("รูปแบบ", sort=False)["จำนวนแถว"].sum()
+    return counts_report({str(k): int(v) for k, v in counts.items()})
+
+
+def get_date_report(file, kind: str, cache: IngestCache = None, digest: str = None, sheets=None):
+    # จำนวนแถวที่แปลงวันที่ได้ต่อรูปแบบ รวมทุกชีต หรือเฉพาะ sheets ที่ระบุ (None ถ้าไม่มีคอลัมน์วันที่)
+    cache = cache or _default_cache
+    digest = digest or file_digest(file)
+    sheets = sheets or claim_sheets(file, kind, cache, digest) or [None]
+    totals = {}
+    for sheet in sheets:
+        key = cache_key(digest, kind, sheet, cache.aliases)
+        counts = cache.get_date_counts(key)
+        if counts is None:
+            # ชีตที่ยังไม่เคย parse ด้วยแคชนี้
+            load_claims(file, kind, cache, digest, sheet)
+            counts = cache.get_date_counts(key) or {}
+        for name, n in counts.items():
+            totals[name] = totals.get(name, 0) + n
+    return counts_report(totals) if totals else None
+
+
+def load_claim_cube(file, kind: str, cache: IngestCache = None, digest: str = None) -> pd.DataFrame:
+    # count cube ของไฟล์ (แคชแยกจาก DataFrame ดิบ ไฟล์ใหญ่จึงเสียค่า scan เต็มแค่ครั้งแรก)
+    cache = cache or _default_cache
+    digest = digest or file_digest(file)
+    key = "cube-" + cache_key(digest, kind, aliases=cache.aliases)
+
+    cube = cache.get(key)
+    if cube is None:
+        cache.stats["misses"] += 1
+        cube = build_cube(load_workbook_claims(file, kind, cache, digest))
+        cache.put(key, cube)
+    return cube.copy(deep=False)
@@ -0,0 +1,180 @@
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# -----------------------------
+# จับเวลา / จำนวนแถว / หน่วยความจำ ของแต่ละขั้นตอน
+# -----------------------------
+# - หน้า dashboard ห่อแต่ละส่วนของหน้า (ไม่ใช่ทุกฟังก์ชันย่อย) ด้วย `with stage("ชื่อ"):`
+# - ตาราง debug ใน sidebar เปิดด้วย env CLAIM_DEBUG=1 หรือ query ?debug=1
+# - JSON log หนึ่งบรรทัดต่อขั้นตอน (logger "claim_dashboard.perf") เขียนเฉพาะเมื่อเปิด debug หรือตั้ง CLAIM_PERF_LOG
+#   (ปกติไม่เขียนอะไรลง stderr ทุก rerun)
+# - cProfile ต่อขั้นตอนเปิดด้วย env CLAIM_PROFILE=1 หรือ query ?profile=1 (ช้าลง ใช้ตอนไล่ปัญหาเท่านั้น)
+# - log ไปไฟล์ (JSON lines) ได้ด้วย env CLAIM_PERF_LOG=<path>
+
+DEBUG = os.environ.get("CLAIM_DEBUG", "") not in ("", "0")
+PROFILE = os.environ.get("CLAIM_PROFILE", "") not in ("", "0")
+PERF_LOG = os.environ.get("CLAIM_PERF_LOG")
+
+# จำนวนบรรทัดของ pstats ที่เก็บต่อขั้นตอน
+PROFILE_LINES = 25
+
+logger = logging.getLogger("claim_dashboard.perf")
+
+
+def _setup_logger():
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(PERF_LOG, encoding="utf-8") if PERF_LOG else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_setup_logger()
+
+
+def rss_bytes():
+    # RSS ของ process จาก /proc (ไม่มีบน Windows/macOS -> None)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PerfRun:
+    # ผลการวัดของการรันสคริปต์หนึ่งรอบ (Streamlit rerun หนึ่งครั้ง)
+    def __init__(self, page: str, debug=DEBUG, profile=PROFILE):
+        self.page = page
+        self.run_id = uuid.uuid4().hex[:12]
+        self.debug = debug
+        self.profile = profile
+        # เขียน JSON log เฉพาะเมื่อเปิด debug หรือมีไฟล์ log
+        self.log = debug or bool(PERF_LOG)
+        self.records = []
+        self.profiles = {}
+        self._depth = 0
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, rows=None):
+        record = {"stage": name, "rows": rows, "depth": self._depth}
+        profiler = None
+        # cProfile ซ้อนกันไม่ได้ จึงเก็บเฉพาะขั้นตอนชั้นนอกสุด
+        if self.profile and self._depth == 0:
+            profiler = cProfile.Profile()
+        # เพิ่มลง records ตอนเริ่ม เพื่อให้ตารางเรียงตามลำดับการทำงาน (ขั้นตอนแม่อยู่ก่อนขั้นตอนย่อย)
+        self.records.append(record)
+        rss_before = rss_bytes()
+        self._depth += 1
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            self._depth -= 1
+            rss_after = rss_bytes()
+            record["seconds"] = round(seconds, 4)
+            record["mem_mb"] = (
+                round((rss_after - rss_before) / 1024 / 1024, 2) if rss_before is not None and rss_after is not None else None
+            )
+            if profiler is not None:
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+                self.profiles[name] = out.getvalue()
+            if self.log:
+                logger.info(json.dumps({
+                    "event": "stage",
+                    "page": self.page,
+                    "run_id": self.run_id,
+                    **record,
+                }, ensure_ascii=False, default=str))
+
+    def table(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.records, columns=["stage", "depth", "rows", "seconds", "mem_mb"])
+        df["stage"] = ["  " * d + s for s, d in zip(df["stage"], df["depth"])]
+        df["rows"] = df["rows"].astype("Int64")
+        return df.drop(columns="depth")
+
+    def finish(self):
+        total = round(time.perf_counter() - self._started, 4)
+        if self.log:
+            logger.info(json.dumps({
+                "event": "run",
+                "page": self.page,
+                "run_id": self.run_id,
+                "seconds": total,
+                "stages": len(self.records),
+            }, ensure_ascii=False))
+        return total
+
+
+_current = contextvars.ContextVar("claim_perf_run", default=None)
+
+
+def start_run(page: str, debug=None, profile=None) -> PerfRun:
+    # เริ่มการวัดรอบใหม่ของ thread/context ปัจจุบัน (Streamlit รันแต่ละ session คนละ thread)
+    run = PerfRun(
+        page,
+        debug=DEBUG if debug is None else debug,
+        profile=PROFILE if profile is None else profile,
+    )
+    _current.set(run)
+    return run
+
+
+def current_run():
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str, rows=None):
+    # ถ้ายังไม่ได้ start_run (เช่นเรียกจาก claim_batch) จะไม่วัดอะไร
+    run = _current.get()
+    if run is None:
+        yield {"stage": name, "rows": rows}
+        return
+    with run.stage(name, rows) as record:
+        yield record
+
+
+def debug_flags(query_params) -> tuple:
+    # อ่าน ?debug=1 / ?profile=1 จาก st.query_params (ค่าจาก env ใช้เป็นค่าเริ่มต้น)
+    def on(key, default):
+        value = query_params.get(key)
+        if value is None:
+            return default
+        return str(value) not in ("", "0", "false")
+
+    return on("debug", DEBUG), on("profile", PROFILE)
+
+
+def render_debug_sidebar(run: PerfRun):
+    # ตารางเวลาแต่ละขั้นตอนใน sidebar (แสดงเฉพาะเมื่อเปิด debug)
+    import streamlit as st
+
+    total = run.finish()
+    if not run.debug:
+        return
+    with st.sidebar.expander(f"⏱️ เวลาแต่ละขั้นตอน ({total:.2f} s)", expanded=True):
+        st.caption(f"run_id {run.run_id}")
+        st.dataframe(run.table(), hide_index=True)
+        for name, text in run.profiles.items():
+            st.markdown(f"**cProfile: {name}**")
+            st.code(text)
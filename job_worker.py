@@ -0,0 +1,45 @@
+import io
+import os
+from multiprocessing import context, forkserver, popen_forkserver, reduction, spawn, util
+
+# -----------------------------
+# context ของ worker process ใน jobs.JobPool
+# -----------------------------
+# worker ได้ข้อมูลเตรียม process จาก process แม่ ซึ่งรวม module __main__ ไว้ด้วย (โหลดซ้ำตอนเริ่ม)
+# ภายใต้ Streamlit __main__ คือสคริปต์ของหน้า (worker จะรันทั้งหน้าซ้ำ: ส่ง job / สร้าง pool ซ้อน)
+# context นี้คือ forkserver ที่ตัด __main__ ออกจากข้อมูลนั้นตั้งแต่ฝั่ง process แม่ ใช้กับ pool ตั้งแต่สร้าง
+# จึงมีผลกับ worker ทุกตัว รวมตัวทดแทนที่ executor สร้างเองจาก thread ภายใน
+# งานทั้งหมดเป็นฟังก์ชันระดับ module ใน jobs.py ไม่ต้องใช้ __main__
+MAIN_KEYS = ("init_main_from_name", "init_main_from_path")
+
+
+class _Popen(popen_forkserver.Popen):
+    def _launch(self, process_obj):
+        # เหมือน popen_forkserver.Popen._launch ต่างกันแค่ตัด MAIN_KEYS
+        prep_data = spawn.get_preparation_data(process_obj._name)
+        for key in MAIN_KEYS:
+            prep_data.pop(key, None)
+        buf = io.BytesIO()
+        context.set_spawning_popen(self)
+        try:
+            reduction.dump(prep_data, buf)
+            reduction.dump(process_obj, buf)
+        finally:
+            context.set_spawning_popen(None)
+
+        self.sentinel, w = forkserver.connect_to_new_process(self._fds)
+        _parent_w = os.dup(w)
+        self.finalizer = util.Finalize(self, util.close_fds, (_parent_w, self.sentinel))
+        with open(w, "wb", closefd=True) as f:
+            f.write(buf.getbuffer())
+        self.pid = forkserver.read_signed(self.sentinel)
+
+
+class WorkerProcess(context.ForkServerProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _Popen(process_obj)
+
+
+class WorkerContext(context.ForkServerContext):
+    Process = WorkerProcess
@@ -0,0 +1,431 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from claim_store import ClaimStore
+from control_monitor import get_monitor, monitor_scope, refresh_monitor
+from defect_alias import get_aliases
+from forecast_cache import get_forecast_cache
+from forecasting import forecast_next_month
+from ingest_cache import (
+    CACHE_DIR,
+    IngestCache,
+    claim_sheets,
+    combine_date_reports,
+    combine_memory_reports,
+    file_digest,
+    get_date_report,
+    get_memory_report,
+    load_claim_cube,
+    load_claims,
+)
+
+# -----------------------------
+# งานหนักรันใน process pool แยกจาก script thread ของ Streamlit
+# -----------------------------
+# Streamlit รันสคริปต์ของหน้าใหม่ทั้งหมดทุกครั้งที่ผู้ใช้กดอะไร งานที่ใช้เวลานาน (นำเข้าไฟล์, สร้าง cube,
+# พยากรณ์) จึงถูกส่งเป็น job ให้ process pool ตัวเดียวของเซิร์ฟเวอร์ โดยใช้ hash ของ input เป็น key
+#   - ทุก session / ทุก rerun ที่ส่ง input เดียวกันได้ job เดียวกัน (คำนวณครั้งเดียว ใช้ผลร่วมกัน)
+#   - หน้าเว็บวาดส่วนที่พร้อมก่อน ส่วนที่ยังไม่เสร็จแสดง progress แล้ว rerun ทุก POLL_SECONDS
+#   - worker ส่งความคืบหน้า (สัดส่วน 0..1 + ข้อความ) กลับมาทาง multiprocessing.Queue
+#   - worker fork จาก forkserver ผ่าน job_worker.WorkerContext (ไม่โหลด __main__ ของ process แม่
+#     ซึ่งใต้ Streamlit คือสคริปต์ของหน้า) ระบบที่ไม่มี forkserver (Windows) รันงานใน thread ของสคริปต์
+# CLAIM_JOB_WORKERS=0 รันงานทันทีใน thread ของสคริปต์ (พฤติกรรมเดิม ใช้ตอนดีบัก)
+WORKERS = int(os.environ.get("CLAIM_JOB_WORKERS", str(min(4, os.cpu_count() or 1))))
+# pool ถูกสร้างใหม่ทุก N งานต่อ worker เพื่อคืนหน่วยความจำของแคช DataFrame ใน worker
+TASKS_PER_WORKER = 8
+# จำผลของ job ที่เสร็จแล้วไว้กี่ตัว (ตัวที่เก่าสุดถูกลบก่อน)
+MAX_FINISHED = 64
+POLL_SECONDS = 0.5
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+
+_progress_queue = None
+_current_key = None
+_cache = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def report_progress(fraction: float, message=""):
+    # เรียกจากฟังก์ชันของ job เพื่อแจ้งความคืบหน้า (ไม่มีผลเมื่อรันนอก pool)
+    if _progress_queue is not None and _current_key is not None:
+        _progress_queue.put((_current_key, float(fraction), message))
+
+
+def _run(key, func, args, kwargs):
+    global _current_key
+    _current_key = key
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current_key = None
+
+
+def _warm_worker():
+    from warmup import import_modules
+
+    import_modules(["openpyxl", "pyarrow.parquet"])
+
+
+class Job:
+    def __init__(self, key: str, label: str, future: Future):
+        self.key = key
+        self.label = label
+        self.future = future
+        self.submitted = time.time()
+        self.fraction = 0.0
+        self.message = ""
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    @property
+    def status(self) -> str:
+        if self.future.done():
+            return "error" if self.future.exception() is not None else "done"
+        return "running" if self.future.running() else "queued"
+
+    def result(self):
+        return self.future.result()
+
+    def elapsed(self) -> float:
+        return time.time() - self.submitted
+
+
+class JobPool:
+    def __init__(self, workers=WORKERS):
+        if "forkserver" not in multiprocessing.get_all_start_methods():
+            workers = 0
+        self.workers = workers
+        self._jobs = OrderedDict()  # key -> Job
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queue = None
+        self._submitted = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # forkserver: ไม่ fork process ของ Streamlit ที่มีหลาย thread อยู่แล้ว
+            from job_worker import WorkerContext
+
+            ctx = WorkerContext()
+            if self._queue is None:
+                self._queue = ctx.Queue()
+                threading.Thread(target=self._listen, args=(self._queue,), daemon=True).start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._queue,),
+            )
+            self._submitted = 0
+        return self._executor
+
+    def _submit(self, func, *args) -> Future:
+        # ไม่ใช้ max_tasks_per_child: บน Python 3.11 executor ค้างได้เมื่อ worker ที่ครบจำนวนงาน
+        # ออกไประหว่างที่ยังมีงานรอ จึงสร้าง pool ใหม่ทั้งชุดเองเมื่อครบ TASKS_PER_WORKER งานต่อ worker
+        executor = self._get_executor()
+        future = executor.submit(func, *args)
+        self._submitted += 1
+        if self._submitted >= TASKS_PER_WORKER * self.workers:
+            # pool เดิมทำงานที่ส่งไปแล้วจนเสร็จแล้วปิดตัว งานถัดไปใช้ pool ใหม่
+            executor.shutdown(wait=False)
+            self._executor = None
+        return future
+
+    def _listen(self, progress_queue):
+        # รับความคืบหน้าจาก worker แล้วเก็บไว้ที่ Job
+        while True:
+            key, fraction, message = progress_queue.get()
+            job = self._jobs.get(key)
+            if job is not None:
+                job.fraction, job.message = fraction, message
+
+    def _start(self, key, func, args, kwargs) -> Future:
+        try:
+            return self._submit(_run, key, func, args, kwargs)
+        except BrokenProcessPool:
+            # worker ตาย (เช่น หน่วยความจำไม่พอ) สร้าง pool ใหม่แล้วส่งอีกครั้ง
+            self._executor = None
+            return self._submit(_run, key, func, args, kwargs)
+
+    @staticmethod
+    def _run_inline(future, func, args, kwargs):
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+    def submit(self, key: str, func, *args, label="", **kwargs) -> Job:
+        # ส่ง job (ถ้ามี job key เดียวกันที่ยังรันอยู่หรือสำเร็จแล้ว คืน job เดิม)
+        inline = None
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != "error":
+                self._jobs.move_to_end(key)
+                return job
+            if self.workers <= 0:
+                # ลงทะเบียน job ไว้ก่อน (session อื่นที่ส่ง key เดียวกันได้ job นี้) แล้วรันหลังปล่อย lock
+                inline = Future()
+                job = Job(key, label or key, inline)
+            else:
+                job = Job(key, label or key, self._start(key, func, args, kwargs))
+            self._jobs[key] = job
+            self._prune()
+        if inline is not None:
+            self._run_inline(inline, func, args, kwargs)
+        return job
+
+    def warm(self):
+        # สร้าง worker ครบทุกตัวล่วงหน้า (worker import module ของงานตอนเริ่ม) job แรกจึงไม่ต้องรอ spawn
+        if self.workers <= 0:
+            return
+        with self._lock:
+            futures = [self._submit(_warm_worker) for _ in range(self.workers)]
+        wait(futures)
+
+    def get(self, key: str):
+        return self._jobs.get(key)
+
+    def _prune(self):
+        finished = [k for k, j in self._jobs.items() if j.done]
+        for key in finished[: max(0, len(finished) - MAX_FINISHED)]:
+            del self._jobs[key]
+
+    def table(self) -> pd.DataFrame:
+        rows = [
+            {"job": j.label, "สถานะ": j.status, "ความคืบหน้า": round(j.fraction, 2), "วินาที": round(j.elapsed(), 1)}
+            for j in list(self._jobs.values())
+        ]
+        return pd.DataFrame(rows)
+
+
+_default_pool = None
+
+
+def get_pool() -> JobPool:
+    # ใช้ JobPool ตัวเดียวทั้ง process (ทุก session ใช้ผลร่วมกัน)
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = JobPool()
+    return _default_pool
+
+
+# -----------------------------
+# key ของ input
+# -----------------------------
+def frame_digest(df: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    h.update(",".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def upload_digest(file) -> str:
+    # หน้าเว็บ rerun ทุก POLL_SECONDS ระหว่างรอ job: hash ไฟล์ที่อัปโหลด (หลายสิบ MB) ครั้งเดียวต่อไฟล์
+    # แล้วจำไว้ใน session ตาม (file_id, ขนาด) ของ UploadedFile (ไฟล์ที่ไม่ได้มาจาก file_uploader hash ทุกครั้ง)
+    file_id = getattr(file, "file_id", None)
+    if file_id is None:
+        return file_digest(file)
+    import streamlit as st
+
+    digests = st.session_state.setdefault("upload_digests", {})
+    key = (file_id, getattr(file, "size", None))
+    if key not in digests:
+        digests[key] = file_digest(file)
+    return digests[key]
+
+
+def spool_upload(file, digest: str) -> str:
+    # เขียนไฟล์ที่อัปโหลดลงดิสก์ครั้งเดียว ให้ worker อ่านจาก path แทนการส่ง bytes ทุกครั้ง
+    path = os.path.join(UPLOAD_DIR, f"{digest}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(file.getbuffer() if hasattr(file, "getbuffer") else file.read())
+        os.replace(tmp, path)
+    return path
+
+
+def get_cache() -> IngestCache:
+    # แคชการอ่านไฟล์ของงานจากหน้าเว็บ (หนึ่งตัวต่อ process): รวมชื่อ Defect ตาม alias map
+    # และบันทึกรูปแบบใหม่ลง alias map (CLI / benchmark ใช้แคชของตัวเองที่ไม่เขียน alias)
+    global _cache
+    if _cache is None:
+        _cache = IngestCache(aliases=get_aliases(), learn_aliases=True)
+    return _cache
+
+
+# -----------------------------
+# งานที่รันใน worker (ต้องเป็นฟังก์ชันระดับ module เพื่อ pickle ได้)
+# -----------------------------
+def sheet_job(path: str, kind: str, digest: str, sheet) -> dict:
+    # parse ชีตเดียว (rename + prepare + compact) เก็บลงแคช Parquet ให้ ingest / cube อ่านต่อ
+    report_progress(0.1, "อ่านและเตรียมข้อมูล")
+    start = time.perf_counter()
+    df = load_claims(path, kind, cache=get_cache(), digest=digest, sheet=sheet)
+    return {
+        "rows": len(df),
+        "seconds": time.perf_counter() - start,
+        "memory_report": get_memory_report(path, kind, cache=get_cache(), digest=digest, sheets=[sheet]),
+        "date_report": get_date_report(path, kind, cache=get_cache(), digest=digest, sheets=[sheet]),
+    }
+
+
+def ingest_job(path: str, kind: str, name: str, store_path: str, digest: str) -> dict:
+    report_progress(0.1, "บันทึกลงคลังข้อมูล")
+    # ทุกชีตถูก parse ไว้ในแคชแล้ว (sheet_job) ingest อ่านจาก Parquet ไม่ต้องอ่าน Excel ซ้ำ
+    store = ClaimStore(store_path)
+    rows = store.ingest(path, kind, name=name, cache=get_cache())
+    if rows:
+        # อัปเดต control chart รายสัปดาห์เฉพาะสัปดาห์ใหม่ (หน้าเว็บแค่อ่านสัญญาณ)
+        report_progress(0.8, "อัปเดต control chart รายสัปดาห์")
+        refresh_monitor(store, kind)
+    return {"rows": rows}
+
+
+def monitor_job(store_path: str, kind: str) -> dict:
+    report_progress(0.1, "อัปเดต control chart รายสัปดาห์")
+    return refresh_monitor(ClaimStore(store_path), kind)
+
+
+def cube_job(path: str, kind: str, digest: str) -> pd.DataFrame:
+    report_progress(0.1, "สร้าง count cube")
+    return load_claim_cube(path, kind, cache=get_cache(), digest=digest)
+
+
+def forecast_job(monthly: pd.DataFrame, scope) -> pd.DataFrame:
+    # scope None = ไม่ใช้แคชพยากรณ์ (fit ทุก series ใหม่ ไม่ทับ state ของ series เต็ม)
+    if scope is None:
+        report_progress(0.1, "fit Holt ทุก SUP x Defect ที่ผ่านตัวกรอง")
+        return forecast_next_month(monthly)
+    report_progress(0.1, "fit Holt เฉพาะ SUP x Defect ที่ข้อมูลเปลี่ยน")
+    return forecast_next_month(monthly, cache=get_forecast_cache(), scope=scope)
+
+
+# -----------------------------
+# ใช้ในหน้า Streamlit
+# -----------------------------
+class Upload:
+    # ไฟล์ที่อัปโหลดหนึ่งไฟล์: parse ทุกชีตข้อมูลเคลมพร้อมกัน (job ละชีต) แล้วนำเข้าคลังเมื่อครบทุกชีต
+    def __init__(self, file, kind: str, store: ClaimStore):
+        self.name = getattr(file, "name", str(file))
+        self.kind = kind
+        self.digest = upload_digest(file)
+        self.path = spool_upload(file, self.digest)
+        pool = get_pool()
+        self.sheets = {
+            sheet: pool.submit(
+                f"sheet-{kind}-{self.digest}-{sheet}", sheet_job, self.path, kind, self.digest, sheet,
+                label=f"อ่าน {self.name}" + (f" [{sheet}]" if sheet else ""),
+            )
+            for sheet in claim_sheets(self.path, kind, cache=get_cache(), digest=self.digest) or [None]
+        }
+        self.ingest = None
+        if all(job.status == "done" for job in self.sheets.values()):
+            self.ingest = pool.submit(
+                f"ingest-{kind}-{self.digest}-{store.path}", ingest_job,
+                self.path, kind, self.name, store.path, self.digest,
+                label=f"นำเข้า {self.name}",
+            )
+
+    @property
+    def jobs(self) -> list:
+        return list(self.sheets.values()) + ([self.ingest] if self.ingest else [])
+
+    @property
+    def done(self) -> bool:
+        return self.ingest is not None and self.ingest.status == "done"
+
+    def timings(self) -> pd.DataFrame:
+        rows = []
+        for sheet, job in self.sheets.items():
+            result = job.result() if job.status == "done" else {}
+            rows.append({
+                "ไฟล์": self.name,
+                "ชีต": sheet or "(ชีตแรก)",
+                "แถว": result.get("rows"),
+                "วินาที": round(result["seconds"], 2) if result else round(job.elapsed(), 1),
+                "สถานะ": job.status,
+            })
+        return pd.DataFrame(rows)
+
+    def submit_cube(self) -> Job:
+        return get_pool().submit(
+            f"cube-{self.kind}-{self.digest}", cube_job, self.path, self.kind, self.digest,
+            label=f"สร้าง cube {self.name}",
+        )
+
+
+def submit_uploads(files, kind: str, store: ClaimStore) -> list:
+    # file_uploader(accept_multiple_files=True) คืน list ไฟล์ซ้ำ (เนื้อหาเดียวกัน) นับครั้งเดียว
+    uploads = {}
+    for file in files or []:
+        upload = Upload(file, kind, store)
+        uploads.setdefault(upload.digest, upload)
+    return list(uploads.values())
+
+
+def upload_summary(uploads) -> dict:
+    # ผลรวมของทุกไฟล์ที่นำเข้าเสร็จแล้ว: จำนวนแถว, เวลาต่อไฟล์/ชีต, หน่วยความจำ, รูปแบบวันที่
+    done = [u for u in uploads if u.done]
+    sheet_results = [j.result() for u in uploads for j in u.sheets.values() if j.status == "done"]
+    return {
+        "rows": sum(u.ingest.result()["rows"] for u in done),
+        "timings": pd.concat([u.timings() for u in uploads], ignore_index=True) if uploads else None,
+        "memory_report": combine_memory_reports(r["memory_report"] for r in sheet_results),
+        "date_report": combine_date_reports(r["date_report"] for r in sheet_results),
+    }
+
+
+def submit_forecast(monthly: pd.DataFrame, scope) -> Job:
+    # scope: ชุดของ series ในแคชพยากรณ์ (None = ข้อมูลที่ถูกกรอง ไม่ใช้แคช)
+    return get_pool().submit(
+        f"forecast-{scope}-{frame_digest(monthly)}", forecast_job, monthly, scope, label="พยากรณ์"
+    )
+
+
+def submit_monitor_refresh(store: ClaimStore, kind: str):
+    # ตอนเปิดหน้า: monitor ยังไม่ได้ประมวลผลถึง cube_version ปัจจุบันของคลัง (คลังที่มีข้อมูลก่อนมี monitor
+    # หรือนำเข้าผ่าน ClaimStore.ingest โดยตรง เช่น CLI) ส่ง refresh เข้า pool โดยไม่รอผล
+    # คืน None เมื่อ monitor เป็นปัจจุบันแล้ว
+    version = store.cube_version(kind)
+    scope = monitor_scope(store, kind)
+    if get_monitor().store_version(scope) == version:
+        return None
+    return get_pool().submit(
+        f"monitor-{scope}-{version}", monitor_job, store.path, kind, label="อัปเดต control chart รายสัปดาห์"
+    )
+
+
+def render_progress(job: Job, container=None):
+    import streamlit as st
+
+    box = container or st
+    if job.status == "error":
+        box.error(f"{job.label} ไม่สำเร็จ: {job.future.exception()}")
+        return
+    text = f"⏳ {job.label}: {job.message or 'รอคิว'} ({job.elapsed():.0f} s)"
+    box.progress(min(max(job.fraction, 0.0), 1.0), text=text)
+
+
+def rerun_while_pending(jobs):
+    # เรียกท้ายหน้า: ถ้ายังมี job ที่ไม่เสร็จ รอสักครู่แล้ว rerun เพื่ออัปเดต progress / แสดงผลที่เสร็จแล้ว
+    import streamlit as st
+
+    if any(not job.done for job in jobs):
+        time.sleep(POLL_SECONDS)
+        st.rerun()
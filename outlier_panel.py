@@ -0,0 +1,51 @@
+import pandas as pd
+
+from claim_store import SKETCH_COLUMNS
+from quantile_sketch import merge_sketches, sketch_iqr_outliers
+
+# -----------------------------
+# ตารางค่าผิดปกติ Width/Weight ต่อ SUP จาก quantile sketch ในคลัง
+# -----------------------------
+# sketch แยกตาม (เดือน, SUP) จึงใช้ได้เฉพาะตัวกรองช่วงเดือนและ SUP ไม่ต้องโหลดแถวดิบ
+
+
+def outlier_table(store, kind: str, selection: dict) -> pd.DataFrame:
+    # IQR fence + จำนวนค่าผิดปกติ (โดยประมาณ) ต่อ SUP แถวแรกของแต่ละคอลัมน์คือรวมทุก SUP ที่เลือก
+    months = selection.get("MonthKey")
+    sups = [str(s) for s in selection.get("SUP", [])]
+    tables = []
+    for col in SKETCH_COLUMNS:
+        fences = store.iqr_fences(kind, col, "SUP", months)
+        if sups:
+            fences = fences[fences["SUP"].isin(sups)]
+        if fences.empty:
+            continue
+        # แถวรวม: sketch ของทุกแถว หรือ merge sketch ของ SUP ที่เลือก
+        overall = merge_sketches(
+            store.column_sketch(kind, col, "SUP", sup, months) for sup in sups
+        ) if sups else store.column_sketch(kind, col, months=months)
+        outliers, (low, high) = sketch_iqr_outliers(overall)
+        total = pd.DataFrame([{"SUP": "ทั้งหมด", "n": overall.n, "low": low, "high": high, "outliers": outliers}])
+        table = pd.concat([total, fences.sort_values("outliers", ascending=False)], ignore_index=True)
+        table.insert(0, "คอลัมน์", col)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=["คอลัมน์", "SUP", "n", "low", "high", "outliers"])
+    return pd.concat(tables, ignore_index=True)
+
+
+def outlier_panel(store, kind: str, selection: dict) -> int:
+    # แสดง outlier_table ในหน้าเว็บ คืนจำนวนแถวที่แสดง
+    import streamlit as st
+
+    table = outlier_table(store, kind, selection)
+    st.markdown("**📏 ค่าผิดปกติ Width/Weight ต่อ SUP (IQR 1.5 เท่า จาก quantile sketch):**")
+    if table.empty:
+        st.info("ไม่มีค่า Width/Weight ในคลังสำหรับช่วงที่เลือก")
+        return 0
+    table = table.rename(columns={
+        "n": "จำนวนค่า", "low": "ขอบล่าง", "high": "ขอบบน", "outliers": "ค่าผิดปกติ (ประมาณ)",
+    })
+    st.dataframe(table, hide_index=True)
+    st.caption("ใช้เฉพาะตัวกรองช่วงเดือนและ SUP (ตัวกรอง Grade/Defect/RootCause ไม่มีผลกับตารางนี้)")
+    return len(table)
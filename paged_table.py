@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# ตารางแบ่งหน้าฝั่ง server
+# -----------------------------
+# ตารางเต็มอยู่ใน server เท่านั้น ค้นหา / กรอง / เรียง ด้วย pandas แล้วส่งไป browser เฉพาะหน้าที่แสดง
+# ข้อความค้นหาเทียบกับค่าที่ไม่ซ้ำของแต่ละคอลัมน์ (categories) ก่อน แล้วค่อย map กลับเป็นแถวด้วย isin
+PAGE_SIZE = 50
+PAGE_SIZES = [25, 50, 100, 200]
+
+
+def _text_match(series: pd.Series, text: str) -> pd.Series:
+    # ค้นหาแบบไม่สนตัวพิมพ์ใหญ่/เล็ก บนค่าที่ไม่ซ้ำ (ถูกกว่าการ .str.contains ทุกแถวมาก)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.cat.categories
+    else:
+        values = pd.Index(series.dropna().unique())
+    hits = values[values.astype(str).str.contains(text, case=False, regex=False)]
+    return series.isin(hits)
+
+
+def filter_frame(df: pd.DataFrame, search="", filters=None, search_columns=None) -> pd.DataFrame:
+    mask = np.ones(len(df), dtype=bool)
+    for col, selected in (filters or {}).items():
+        if selected:
+            mask &= df[col].isin(selected).to_numpy()
+    if search:
+        cols = search_columns or [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        hit = np.zeros(len(df), dtype=bool)
+        for col in cols:
+            hit |= _text_match(df[col], search).to_numpy()
+        mask &= hit
+    return df if mask.all() else df[mask]
+
+
+def query_page(df: pd.DataFrame, search="", filters=None, sort_by=None, ascending=True,
+               page=1, page_size=PAGE_SIZE, search_columns=None):
+    # คืน (แถวของหน้าที่ขอ, จำนวนแถวทั้งหมดหลังกรอง)
+    data = filter_frame(df, search, filters, search_columns)
+    total = len(data)
+    start = (max(page, 1) - 1) * page_size
+    if sort_by:
+        end = start + page_size
+        if end <= total // 4 and pd.api.types.is_numeric_dtype(data[sort_by]):
+            # หน้าแรก ๆ ของคอลัมน์ตัวเลข: เลือกเฉพาะ end แถวบนสุด ไม่ต้องเรียงทั้งตาราง
+            top = data.nsmallest(end, sort_by) if ascending else data.nlargest(end, sort_by)
+            return top.iloc[start:end], total
+        data = data.sort_values(sort_by, ascending=ascending, kind="stable")
+    return data.iloc[start:start + page_size], total
+
+
+def paged_table(df: pd.DataFrame, key: str, page_size=PAGE_SIZE, filter_columns=None, search_columns=None):
+    # แสดงตารางแบบแบ่งหน้า (ค้นหา / กรอง / เรียง / เลือกหน้า) key ต้องไม่ซ้ำกันในหน้าเดียวกัน
+    import streamlit as st
+
+    if df.empty:
+        st.dataframe(df, hide_index=True)
+        return
+
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    search = c1.text_input("🔍 ค้นหา", key=f"{key}_search")
+    sort_by = c2.selectbox("เรียงตาม", [None] + list(df.columns), key=f"{key}_sort",
+                           format_func=lambda c: "-" if c is None else c)
+    ascending = c3.radio("ลำดับ", ["น้อย→มาก", "มาก→น้อย"], key=f"{key}_order") == "น้อย→มาก"
+    page_size = c4.selectbox("แถว/หน้า", PAGE_SIZES, index=PAGE_SIZES.index(page_size)
+                             if page_size in PAGE_SIZES else 1, key=f"{key}_size")
+
+    filters = {}
+    if filter_columns:
+        cols = st.columns(len(filter_columns))
+        for col, box in zip(filter_columns, cols):
+            values = df[col]
+            options = list(values.cat.categories) if isinstance(values.dtype, pd.CategoricalDtype) \
+                else sorted(values.dropna().unique(), key=str)
+            filters[col] = box.multiselect(col, options, key=f"{key}_filter_{col}")
+
+    data = filter_frame(df, search, filters, search_columns)
+    total = len(data)
+    pages = max(1, math.ceil(total / page_size))
+    page_key = f"{key}_page"
+    # ผลการกรองเปลี่ยน -> จำนวนหน้าลดลง ให้เลขหน้าที่จำไว้ไม่เกินหน้าสุดท้าย
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = int(st.number_input(f"หน้า (ทั้งหมด {pages:,})", min_value=1, max_value=pages, step=1,
+                               key=page_key))
+
+    rows, total = query_page(data, sort_by=sort_by, ascending=ascending, page=page, page_size=page_size)
+    st.dataframe(rows, hide_index=True)
+    first = (page - 1) * page_size + 1 if total else 0
+    st.caption(f"แสดงแถว {first:,}–{first + len(rows) - 1 if total else 0:,} จาก {total:,} แถว")
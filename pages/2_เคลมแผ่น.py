@@ -1,125 +1,175 @@
+import functools
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import numpy as np
-import re
+
+from analysis import executive_summary_sections, watchlist_above_mean
+from charts import bar_chart, line_chart, pie_chart
+from claim_store import get_store
+from control_monitor import ALERT_LABELS, get_monitor, monitor_scope
+from cube import merge_cubes, nunique, rollup, top_n, total_count
+from cube_index import filter_sidebar
+from defect_alias import alias_editor
+from instrumentation import debug_flags, render_debug_sidebar, stage, start_run
+from jobs import (
+    render_progress,
+    rerun_while_pending,
+    submit_forecast,
+    submit_monitor_refresh,
+    submit_uploads,
+    upload_summary,
+)
+from outlier_panel import outlier_panel
+from paged_table import paged_table
+from report_export import export_buttons
+from warmup import start_prewarm
 
 st.title("📑 วิเคราะห์เคลมแผ่น")
 
-# -----------------------------
-# Utility Functions
-# -----------------------------
-def map_root_cause(defect_text):
-    if not defect_text or pd.isna(defect_text):
-        return "อื่น ๆ/ไม่ระบุ"
-    if "ยับ" in str(defect_text):
-        return "Tension/Handling"
-    return "อื่น ๆ/ไม่ระบุ"
-
-def advise_for(defect):
-    if "ยับ" in str(defect):
-        return "ตรวจสอบการขนส่งและการจัดเก็บ"
-    return "ตรวจสอบกระบวนการผลิต"
+# import module หนัก + สร้าง worker ของ process pool ใน background (ครั้งเดียวต่อ process)
+start_prewarm()
+
+# จับเวลาแต่ละส่วนของหน้า (ตาราง debug: CLAIM_DEBUG=1 หรือ ?debug=1, cProfile: ?profile=1)
+perf = start_run("sheet", *debug_flags(st.query_params))
 
 # -----------------------------
 # Upload File
 # -----------------------------
-uploaded_file = st.file_uploader("📄 อัปโหลดไฟล์ Excel (เคลมแผ่น)", type=["xlsx"])
-
-if uploaded_file:
-    df = pd.read_excel(uploaded_file)
-
-    # Rename columns
-    rename_map_sheet = {
-        "SUPPLIER": "SUP",
-        "สิ่งที่ไม่เป็นไปตามข้อกำหนด": "Defect",
-        "เกรดแกรม": "Grade",
-        "วันที่รับของ": "Date",
-        "MONTH": "Month",
-        "QUARTER": "Quarter",
-        "YEAR": "Year"
-    }
-    df = df.rename(columns={c: rename_map_sheet.get(c, c) for c in df.columns})
-
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce", dayfirst=True)
-        df["MonthKey"] = df["Date"].dt.strftime("%Y-%m")
-        df["Month"] = df["Date"].dt.month
-        df["Quarter"] = df["Date"].dt.quarter
-    elif "Month" in df.columns and "Year" in df.columns:
-        df["MonthKey"] = df["Year"].astype(str) + "-" + df["Month"].astype(str).str.zfill(2)
-
-    df["RootCause"] = df["Defect"].apply(map_root_cause)
-    df["Advice"] = df["Defect"].apply(advise_for)
-
+uploaded_files = st.file_uploader(
+    "📄 อัปโหลดไฟล์ Excel (เคลมแผ่น) เลือกได้หลายไฟล์ อ่านทุกชีตที่มีคอลัมน์ SUP/Defect",
+    type=["xlsx"], accept_multiple_files=True,
+)
+
+source = st.sidebar.radio("📂 ข้อมูลที่ใช้วิเคราะห์", ["คลังข้อมูลสะสม", "เฉพาะไฟล์ที่อัปโหลด"])
+store = get_store()
+
+# ทุกส่วนด้านล่างคำนวณจาก roll-up ของ count cube แทนการ groupby ข้อมูลดิบซ้ำ
+# ตารางรายละเอียดแสดงผ่าน paged_table (ส่งไป browser เฉพาะหน้าที่แสดง)
+cube = None
+# key ของข้อมูลชุดนี้ (index ของตัวกรองแคชตาม key ไม่ต้องสร้างใหม่ทุก rerun)
+cube_key = None
+# งานหนัก (นำเข้า / สร้าง cube / พยากรณ์) รันใน process pool ส่วนที่พร้อมแล้วแสดงก่อน
+pending = []
+# แต่ละไฟล์: parse ทุกชีตพร้อมกัน (job ละชีต) แล้วบันทึกลงคลังข้อมูลสะสม (upsert กันซ้ำ, ไฟล์ที่เคยนำเข้าแล้วข้ามทันที)
+uploads = submit_uploads(uploaded_files, "sheet", store)
+for upload in uploads:
+    pending += upload.jobs
+    for job in upload.jobs:
+        if job.status != "done":
+            render_progress(job, st.sidebar)
+ingesting = any(not upload.done for upload in uploads)
+if uploads:
+    summary = upload_summary(uploads)
+    if summary["rows"]:
+        st.sidebar.success(f"บันทึกลงคลังข้อมูล {summary['rows']:,} แถว")
+    with st.sidebar.expander(f"📂 ไฟล์/ชีตที่อ่าน ({len(uploads)} ไฟล์)"):
+        st.dataframe(summary["timings"], hide_index=True)
+    if summary["memory_report"] is not None:
+        with st.sidebar.expander("🧮 หน่วยความจำข้อมูล (ก่อน/หลัง compact)"):
+            st.dataframe(summary["memory_report"], hide_index=True)
+    if summary["date_report"] is not None:
+        with st.sidebar.expander("📅 รูปแบบวันที่ที่อ่านได้"):
+            st.dataframe(summary["date_report"], hide_index=True)
+    if source == "เฉพาะไฟล์ที่อัปโหลด" and not ingesting:
+        # อ่าน + rename + แปลงวันที่ + RootCause/Advice แล้วสรุปเป็น cube ต่อไฟล์ (ใช้แคชตาม hash ของไฟล์)
+        # แล้วรวม cube ของทุกไฟล์
+        cube_jobs = [upload.submit_cube() for upload in uploads]
+        pending += cube_jobs
+        if all(job.status == "done" for job in cube_jobs):
+            # merge เฉพาะเมื่อยังไม่มี index ของชุดไฟล์นี้ (get_index เรียกตอนไม่พบในแคช)
+            cube = functools.partial(merge_cubes, [job.result() for job in cube_jobs])
+            cube_key = "upload:" + ",".join(sorted(upload.digest for upload in uploads))
+        else:
+            for job in cube_jobs:
+                if job.status != "done":
+                    render_progress(job)
+# ชื่อ Defect มาตรฐาน (รวมรูปแบบที่สะกดต่างกัน) แก้ได้ใน sidebar แล้วปรับข้อมูลในคลังก่อนโหลด cube
+alias_editor("sheet", store)
+if source == "คลังข้อมูลสะสม" and store.row_count("sheet"):
+    # cube ในคลังอัปเดตแบบ incremental ตอนนำเข้า ไม่ต้องอ่านประวัติทั้งหมดใหม่
+    # ระหว่างนำเข้าไฟล์ใหม่ แสดงข้อมูลสะสมเดิมไปก่อน
+    if ingesting:
+        st.info("กำลังนำเข้าไฟล์ที่อัปโหลด ข้อมูลด้านล่างยังไม่รวมไฟล์ที่ยังนำเข้าไม่เสร็จ")
+    with stage("store.load_cube") as s:
+        # อ่านเวอร์ชันก่อนโหลด: ถ้ามีการนำเข้าระหว่างนี้ key เก่าจะได้ cube ที่ใหม่กว่า (ไม่ใช่กลับกัน)
+        cube_key = f"{store.path}:sheet:{store.cube_version('sheet')}"
+        cube = store.load_cube("sheet")
+        s["rows"] = len(cube)
+
+if cube is not None:
+    # ตัวกรองใน sidebar (index ของ cube สร้างครั้งเดียว) ทุกส่วนด้านล่างใช้ cube ที่กรองแล้ว
+    with stage("filters") as s:
+        cube, selection = filter_sidebar(cube, "sheet", cube_key)
+        s["rows"] = 0 if cube is None else len(cube)
+
+if cube is not None:
     # 1) สรุปภาพรวม
-    st.subheader("📌 สรุปภาพรวมเคลมแผ่น")
-    col1, col2, col3 = st.columns(3)
-    col1.metric("จำนวนเคส", len(df))
-    col2.metric("ซัพพลายเออร์", df["SUP"].nunique())
-    col3.metric("ประเภทข้อบกพร่อง", df["Defect"].nunique())
+    with stage("kpi", len(cube)):
+        st.subheader("📌 สรุปภาพรวมเคลมแผ่น")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("จำนวนเคส", total_count(cube))
+        col2.metric("ซัพพลายเออร์", nunique(cube, "SUP"))
+        col3.metric("ประเภทข้อบกพร่อง", nunique(cube, "Defect"))
 
     # 2) ข้อบกพร่องรายเดือน/Quarter
-    st.subheader("📊 จำนวนข้อบกพร่องรายเดือน/Quarter")
-    monthly_summary = df.groupby(["MonthKey", "SUP", "Defect"]).size().reset_index(name="จำนวนเคส")
-    st.dataframe(monthly_summary, hide_index=True)
+    with stage("table:monthly_summary") as s:
+        st.subheader("📊 จำนวนข้อบกพร่องรายเดือน/Quarter")
+        monthly_summary = rollup(cube, ["MonthKey", "SUP", "Defect"], "จำนวนเคส")
+        s["rows"] = len(monthly_summary)
+        paged_table(monthly_summary, "monthly_summary", filter_columns=["MonthKey", "SUP"])
 
     # 3) เกรดแกรมแต่ละอาการ
-    st.subheader("📋 เกรดแกรมของแต่ละสาเหตุ")
-    defect_grade = df.groupby(["Defect", "Grade", "SUP"]).size().reset_index(name="จำนวนเคส")
-    st.dataframe(defect_grade, hide_index=True)
+    with stage("table:defect_grade") as s:
+        st.subheader("📋 เกรดแกรมของแต่ละสาเหตุ")
+        defect_grade = rollup(cube, ["Defect", "Grade", "SUP"], "จำนวนเคส")
+        s["rows"] = len(defect_grade)
+        paged_table(defect_grade, "defect_grade", filter_columns=["Defect", "Grade"])
 
         # -----------------------------
     # 🧩 สัดส่วนประเภทข้อบกพร่อง (Top 12)
     # -----------------------------
-    st.subheader("🧩 สัดส่วนประเภทข้อบกพร่อง (Top 12)")
-
-    defect_count = (
-        df.groupby("Defect")
-          .size()
-          .reset_index(name="Count")
-          .sort_values("Count", ascending=False)
-          .head(12)
-    )
-
-    fig_pie = px.pie(
-        defect_count,
-        names="Defect",
-        values="Count",
-        title="สัดส่วนประเภทข้อบกพร่อง (Top 12)",
-        hole=0.3  # ถ้าอยากให้เป็น donut chart
-    )
+    with stage("chart:defect_top12"):
+        st.subheader("🧩 สัดส่วนประเภทข้อบกพร่อง (Top 12)")
+
+        # Top 12 + รวมที่เหลือเป็น "อื่น ๆ"
+        fig_pie = pie_chart(
+            rollup(cube, "Defect"),
+            names="Defect",
+            values="Count",
+            title="สัดส่วนประเภทข้อบกพร่อง (Top 12)",
+            text_options={"textposition": "inside", "textinfo": "percent+label"},
+            hole=0.3  # ถ้าอยากให้เป็น donut chart
+        )
 
-    fig_pie.update_traces(textposition="inside", textinfo="percent+label")
-    st.plotly_chart(fig_pie, use_container_width=True)
+        st.plotly_chart(fig_pie, use_container_width=True)
 
     # 4) แนวโน้มรายเดือน
-    st.subheader("📅 แนวโน้มรายเดือน (จำนวนเคส) แยกตาม SUP")
+    with stage("chart:monthly_sup") as s:
+        st.subheader("📅 แนวโน้มรายเดือน (จำนวนเคส) แยกตาม SUP")
 
-    monthly_sup = (
-        df.groupby(["MonthKey", "SUP"])
-          .size()
-          .reset_index(name="Count")
-          .sort_values("MonthKey")
-    )
-
-    fig_monthly = px.line(
-        monthly_sup,
-        x="MonthKey",
-        y="Count",
-        color="SUP",
-        markers=True,
-        title="จำนวนเคลมรายเดือนแยกตาม SUP"
-    )
+        monthly_sup = (
+            rollup(cube, ["MonthKey", "SUP"])
+              .sort_values("MonthKey")
+        )
+        s["rows"] = len(monthly_sup)
+
+        # Top-N SUP ต่อเส้น ที่เหลือรวมเป็น "อื่น ๆ" (WebGL เมื่อจุดมาก)
+        fig_monthly = line_chart(
+            monthly_sup,
+            x="MonthKey",
+            y="Count",
+            color="SUP",
+            markers=True,
+            title="จำนวนเคลมรายเดือนแยกตาม SUP"
+        )
 
-    fig_monthly.update_layout(
-        xaxis_title="เดือน",
-        yaxis_title="จำนวนเคส",
-        legend_title="SUP",
-        height=500
-    )
+        fig_monthly.update_layout(
+            xaxis_title="เดือน",
+            yaxis_title="จำนวนเคส",
+            legend_title="SUP",
+            height=500
+        )
 
-    st.plotly_chart(fig_monthly, use_container_width=True)
+        st.plotly_chart(fig_monthly, use_container_width=True)
 
     # -----------------------------
     # 🤖 AI วิเคราะห์เชิงลึกเคลมแผ่น
@@ -127,74 +177,109 @@ if uploaded_file:
     st.subheader("🤖 AI วิเคราะห์เชิงลึกเคลมแผ่น")
 
     # 1) Watchlist SUP + Defect
-    sup_defect = (
-        df.groupby(["SUP", "Defect"])
-          .size()
-          .reset_index(name="จำนวนเคส")
-          .sort_values("จำนวนเคส", ascending=False)
-    )
+    with stage("watchlist") as s:
+        sup_defect = (
+            rollup(cube, ["SUP", "Defect"], "จำนวนเคส")
+              .sort_values("จำนวนเคส", ascending=False)
+        )
+        s["rows"] = len(sup_defect)
 
-    threshold = sup_defect["จำนวนเคส"].mean()
-    watchlist = sup_defect[sup_defect["จำนวนเคส"] > threshold]
+        watchlist = watchlist_above_mean(sup_defect)
 
-    st.markdown("**📌 SUP ที่ต้องเฝ้าระวัง (เกินค่าเฉลี่ย):**")
-    st.dataframe(watchlist, hide_index=True)
+        st.markdown("**📌 SUP ที่ต้องเฝ้าระวัง (เกินค่าเฉลี่ย):**")
+        st.dataframe(watchlist, hide_index=True)
 
     # 2) คำแนะนำเชิงกลยุทธ์
-    st.subheader("💡 สรุปเชิงกลยุทธ์สำหรับผู้บริหาร")
-    for _, row in watchlist.iterrows():
-        sup = row["SUP"]
-        defect = row["Defect"]
-        count = row["จำนวนเคส"]
-
-        if "ยับ" in defect:
-            advice = (
-                f"SUP {sup} พบปัญหา “{defect}” จำนวน {count} ครั้ง "
-                "ซึ่งสะท้อนถึงความเสี่ยงด้านการจัดการวัสดุและการขนส่ง "
-                "ข้อเสนอเชิงกลยุทธ์คือการทบทวนขั้นตอนการจัดเก็บและการเคลื่อนย้ายภายในโรงงาน "
-                "รวมถึงกำหนดมาตรการควบคุมคุณภาพในจุดรับเข้า"
-            )
-        else:
-            advice = (
-                f"SUP {sup} พบปัญหา “{defect}” จำนวน {count} ครั้ง "
-                "ซึ่งควรได้รับการจัดลำดับความสำคัญในการแก้ไข "
-                "ข้อเสนอเชิงกลยุทธ์คือการทบทวนกระบวนการผลิตโดยรวม "
-                "และกำหนดมาตรการเชิงป้องกันในระยะกลางถึงยาว"
-            )
-
-        st.success(advice)
+    if source == "คลังข้อมูลสะสม":
+        # control chart รายสัปดาห์ (EWMA/CUSUM) ต่อ SUP x Defect จากคลัง แสดงเฉพาะคู่ที่ผ่านตัวกรอง
+        # (อัปเดตตอนนำเข้า / แก้ชื่อ Defect หน้าเว็บอ่าน state อย่างเดียว ไม่เขียนคลังทุก rerun)
+        # state ที่ยังไม่ถึงเวอร์ชันปัจจุบันของคลัง: refresh ใน pool (ไม่รอ) ระหว่างนี้แสดง state เดิม
+        with stage("control_monitor") as s:
+            refresh = submit_monitor_refresh(store, "sheet")
+            refreshing = refresh is not None and refresh.status != "done"
+            if refreshing:
+                pending.append(refresh)
+            scope = monitor_scope(store, "sheet")
+            through = get_monitor().through_week(scope)
+            alerts = get_monitor().alerts(scope, among=sup_defect)
+            s["rows"] = len(alerts)
+
+            st.markdown("**🚨 SUP x Defect ที่หลุดการควบคุม (control chart รายสัปดาห์ EWMA/CUSUM):**")
+            if refreshing:
+                render_progress(refresh)
+            if through is None:
+                if not refreshing:
+                    st.info("ยังไม่มีข้อมูลครบสัปดาห์ที่มีวันที่ สำหรับ control chart รายสัปดาห์")
+            else:
+                st.caption(f"ประมวลผลถึงสัปดาห์ที่เริ่ม {through} (สัปดาห์ล่าสุดในข้อมูลรอจนครบสัปดาห์)")
+                st.dataframe(alerts.rename(columns=ALERT_LABELS), hide_index=True)
+
+        # ค่าผิดปกติ Width/Weight ต่อ SUP จาก quantile sketch ในคลัง (merge sketch รายเดือน ไม่โหลดแถวดิบ)
+        with stage("sketch_outliers") as s:
+            s["rows"] = outlier_panel(store, "sheet", selection)
+
+    with stage("executive_summary", len(watchlist)):
+        st.subheader("💡 สรุปเชิงกลยุทธ์สำหรับผู้บริหาร")
+        # แยกตาม SUP (เคสรวมมากสุดก่อน) SUP ละหนึ่ง expander + ข้อความของ Defect อันดับต้น
+        # จำนวน element คงที่ไม่ว่า watchlist จะยาวแค่ไหน
+        sections = executive_summary_sections(watchlist, "sheet")
+        for i, section in enumerate(sections):
+            title = f"SUP {section['sup']} · {section['count']:,} เคส · {section['rows']:,} รายการ"
+            with st.expander(title, expanded=i == 0):
+                st.success("\n".join(f"- {advice}" for advice in section["advice"]))
+                if section["hidden"]:
+                    st.caption(f"และอีก {section['hidden']:,} รายการ (ดูทั้งหมดในตาราง SUP ที่ต้องเฝ้าระวัง)")
+        sup_count = watchlist["SUP"].nunique()
+        if sup_count > len(sections):
+            st.caption(f"แสดง {len(sections)} จาก {sup_count:,} SUP ที่มีเคสรวมสูงสุด")
 
     # 3) Forecasting เดือนถัดไป
     st.subheader("📈 การพยากรณ์ปัญหาเดือนถัดไป")
 
     monthly = (
-        df.groupby(["MonthKey", "SUP", "Defect"])
-          .size()
-          .reset_index(name="จำนวนเคส")
+        rollup(cube, ["MonthKey", "SUP", "Defect"], "จำนวนเคส")
     )
 
-    forecast_results = []
-    for (sup, defect), group in monthly.groupby(["SUP", "Defect"]):
-        ts = group.set_index("MonthKey")["จำนวนเคส"]
-        ts.index = pd.to_datetime(ts.index + "-01", errors="coerce")
-        ts = ts.sort_index().asfreq("MS").fillna(0)
-
-        if len(ts) >= 3:
-            from statsmodels.tsa.holtwinters import ExponentialSmoothing
-            model = ExponentialSmoothing(ts, trend="add", seasonal=None)
-            fit = model.fit()
-            pred = fit.forecast(1)
-            forecast_results.append([sup, defect, int(pred.values[0])])
-
-    forecast_df = pd.DataFrame(forecast_results, columns=["SUP", "Defect", "คาดการณ์เดือนหน้า"])
-    st.dataframe(forecast_df, hide_index=True)
-
-    if not forecast_df.empty:
-        fig_forecast = px.bar(
-            forecast_df,
-            x="SUP",
-            y="คาดการณ์เดือนหน้า",
-            color="Defect",
-            title="📊 คาดการณ์จำนวนปัญหา SUP + Defect เดือนถัดไป"
+    # fit Holt (additive trend) แบบ batch (job ใน process pool) ใช้ผลเดิมของ series ที่ข้อมูลไม่เปลี่ยน
+    # series ที่ผ่านตัวกรอง (เช่นช่วงเดือนที่สั้นลง) ไม่ใช่ประวัติเต็ม จึงไม่อ่าน/เขียนแคชพยากรณ์เมื่อมีตัวกรอง
+    forecast = submit_forecast(monthly, None if selection else f"sheet:{source}")
+    pending.append(forecast)
+    if forecast.status == "done":
+        forecast_df = forecast.result()
+        cache_stats = forecast_df.attrs.get("forecast_cache")
+        if cache_stats:
+            st.caption(
+                f"แคชพยากรณ์: ใช้ผลเดิม {cache_stats['hit']:,} · อัปเดต state {cache_stats['update']:,} · "
+                f"fit ใหม่ (warm start) {cache_stats['warm_refit']:,} · fit ใหม่ทั้งหมด {cache_stats['refit']:,} series"
+            )
+        with stage("table:forecast", len(forecast_df)):
+            st.dataframe(forecast_df, hide_index=True)
+
+        if not forecast_df.empty:
+            with stage("chart:forecast", len(forecast_df)):
+                fig_forecast = bar_chart(
+                    forecast_df,
+                    x="SUP",
+                    y="คาดการณ์เดือนหน้า",
+                    color="Defect",
+                    title="📊 คาดการณ์จำนวนปัญหา SUP + Defect เดือนถัดไป"
+                )
+                st.plotly_chart(fig_forecast, use_container_width=True)
+    else:
+        render_progress(forecast)
+
+    # -----------------------------
+    # 📥 ส่งออกรายงาน (XLSX / PDF สร้างใน process pool)
+    # -----------------------------
+    with stage("export"):
+        st.subheader("📥 ส่งออกรายงาน")
+        figures = {
+            "สัดส่วนประเภทข้อบกพร่อง (Top 12)": fig_pie,
+            "จำนวนเคลมรายเดือนแยกตาม SUP": fig_monthly,
+        }
+        pending += export_buttons(
+            cube, "sheet", forecast.result() if forecast.status == "done" else None, figures
         )
-        st.plotly_chart(fig_forecast, use_container_width=True)
+
+render_debug_sidebar(perf)
+rerun_while_pending(pending)
@@ -0,0 +1,180 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# KLL quantile sketch (หน่วยความจำจำกัด, merge ได้)
+# -----------------------------
+# เก็บตัวอย่างเป็นชั้น ๆ (compactor) ชั้นที่ h แทนค่า 2^h ค่า เมื่อชั้นใดเต็มจะเรียงแล้วเก็บไว้
+# ครึ่งหนึ่ง (ตัวคู่หรือตัวคี่แบบสุ่ม) ส่งขึ้นชั้นถัดไป ขนาด sketch ~ O(k log(n/k)) ไม่ขึ้นกับจำนวนแถว
+# sketch ของ chunk / ไฟล์ / เดือน merge กันได้ตรง ๆ โดยไม่ต้องอ่านข้อมูลดิบซ้ำ
+#
+# ความคลาดเคลื่อนของ rank (สัดส่วน 0..1) สำหรับ quantile เดียว ไม่เกิน rank_error() ที่ความเชื่อมั่น 99%
+# (ค่าคงที่ตาม Apache DataSketches KLL) เช่น k=200 -> ~1.3%
+DEFAULT_K = 200
+CAPACITY_DECAY = 2 / 3
+MIN_CAPACITY = 2
+
+
+class KLLSketch:
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    # ---------- รับข้อมูล ----------
+    def update(self, values):
+        # เพิ่มค่าทีละ batch (ค่าที่ไม่ใช่ตัวเลข/NaN ถูกข้าม)
+        values = np.asarray(pd.to_numeric(pd.Series(values), errors="coerce"), dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch"):
+        if other.n == 0:
+            return self
+        self.k = min(self.k, other.k)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+        return self
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - h - 1
+        return max(MIN_CAPACITY, int(math.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    def _compress(self):
+        # compact ชั้นล่างสุดที่เกินความจุ จนขนาดรวมไม่เกินความจุรวมของทุกชั้น
+        while self.size() > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            # จำนวนคี่: เก็บตัวสุดท้ายไว้ชั้นเดิม ที่เหลือจับคู่แล้วส่งขึ้นไปครึ่งหนึ่ง (ตัวคู่หรือตัวคี่แบบสุ่ม)
+            keep = items[len(items) - 1:] if len(items) % 2 else items[:0]
+            pairs = items[: len(items) - len(keep)]
+            offset = int(self._rng.integers(2))
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], pairs[offset::2]])
+
+    # ---------- query ----------
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lv), 1 << h, dtype=np.int64) for h, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        # q เป็นตัวเลขหรือ list ของ 0..1 (คืนชนิดเดียวกับที่ส่งเข้า)
+        if self.n == 0:
+            return None if np.isscalar(q) else [None] * len(q)
+        qs = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        items, cum = self._weighted()
+        total = cum[-1]
+        idx = np.searchsorted(cum, qs * total, side="left")
+        out = items[np.clip(idx, 0, len(items) - 1)]
+        out = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, out))
+        return float(out[0]) if np.isscalar(q) else out.tolist()
+
+    def rank(self, x) -> float:
+        # สัดส่วนของค่าที่ < x (โดยประมาณ)
+        if self.n == 0:
+            return 0.0
+        items, cum = self._weighted()
+        i = np.searchsorted(items, x, side="left")
+        return float(cum[i - 1] / cum[-1]) if i > 0 else 0.0
+
+    def count_outside(self, low, high) -> int:
+        # จำนวนค่าที่ < low หรือ > high (โดยประมาณ)
+        if self.n == 0:
+            return 0
+        items, cum = self._weighted()
+        total = cum[-1]
+        below = cum[np.searchsorted(items, low, side="left") - 1] if items[0] < low else 0
+        i = np.searchsorted(items, high, side="right")
+        above = total - (cum[i - 1] if i > 0 else 0)
+        return int(round((below + above) * self.n / total))
+
+    def rank_error(self) -> float:
+        return rank_error(self.k)
+
+    def size(self) -> int:
+        return int(sum(len(lv) for lv in self.levels))
+
+    # ---------- เก็บ/โหลด ----------
+    def to_bytes(self) -> bytes:
+        header = np.array([self.k, self.n, len(self.levels)] + [len(lv) for lv in self.levels], dtype=np.int64)
+        bounds = np.array([self.min, self.max], dtype=np.float64)
+        return header.tobytes() + bounds.tobytes() + np.concatenate(self.levels).astype(np.float64).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KLLSketch":
+        k, n, n_levels = np.frombuffer(data, dtype=np.int64, count=3)
+        sizes = np.frombuffer(data, dtype=np.int64, count=int(n_levels), offset=24)
+        offset = 24 + 8 * int(n_levels)
+        bounds = np.frombuffer(data, dtype=np.float64, count=2, offset=offset)
+        items = np.frombuffer(data, dtype=np.float64, offset=offset + 16)
+        sketch = cls(int(k))
+        sketch.n = int(n)
+        sketch.min, sketch.max = float(bounds[0]), float(bounds[1])
+        sketch.levels = [a.copy() for a in np.split(items, np.cumsum(sizes)[:-1])]
+        return sketch
+
+
+def rank_error(k: int) -> float:
+    # normalized rank error (quantile เดียว, ความเชื่อมั่น 99%)
+    return 2.296 / k ** 0.9723
+
+
+def sketch_values(values, k=DEFAULT_K, seed=None) -> KLLSketch:
+    return KLLSketch(k, seed).update(values)
+
+
+def merge_sketches(sketches, k=DEFAULT_K) -> KLLSketch:
+    out = KLLSketch(k)
+    for s in sketches:
+        out.merge(s)
+    return out
+
+
+def iqr_fence(sketch: KLLSketch, whisker=1.5):
+    # (low, high) = Q1 - 1.5 IQR, Q3 + 1.5 IQR จาก sketch
+    if sketch.n == 0:
+        return None, None
+    q1, q3 = sketch.quantile([0.25, 0.75])
+    iqr = q3 - q1
+    return q1 - whisker * iqr, q3 + whisker * iqr
+
+
+def sketch_iqr_outliers(sketch: KLLSketch, whisker=1.5):
+    # ผลรูปแบบเดียวกับ analysis.iqr_outliers: (จำนวน outlier โดยประมาณ, (low, high))
+    low, high = iqr_fence(sketch, whisker)
+    if low is None:
+        return 0, (None, None)
+    return sketch.count_outside(low, high), (low, high)
+
+
+def max_rank_error(sketch: KLLSketch, values, qs=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)) -> float:
+    # ความคลาดเคลื่อนของ rank สูงสุดเทียบกับค่าจริง (ใช้ตรวจ sketch กับ np.percentile)
+    values = np.sort(np.asarray(pd.to_numeric(pd.Series(values), errors="coerce").dropna(), dtype=np.float64))
+    estimates = np.asarray(sketch.quantile(list(qs)), dtype=np.float64)
+    lo = np.searchsorted(values, estimates, side="left") / len(values)
+    hi = np.searchsorted(values, estimates, side="right") / len(values)
+    qs = np.asarray(qs)
+    # rank จริงของค่าที่ได้อยู่ในช่วง [lo, hi] (ค่าซ้ำกัน) -> error = ระยะจาก q ถึงช่วงนั้น
+    return float(np.max(np.maximum(0, np.maximum(lo - qs, qs - hi))))
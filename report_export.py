@@ -0,0 +1,258 @@
+import hashlib
+import math
+import os
+
+import pandas as pd
+
+from analysis import executive_summary, watchlist_above_mean
+from cube import nunique, rollup, total_count
+from excel_writer import XlsxStreamWriter
+from ingest_cache import CACHE_DIR
+from jobs import Job, frame_digest, get_pool, render_progress, report_progress
+
+# -----------------------------
+# ส่งออกรายงานผลวิเคราะห์ (XLSX / PDF)
+# -----------------------------
+# สร้างไฟล์เป็น job ใน process pool (jobs.py) ไฟล์ผลลัพธ์อยู่ที่ EXPORT_DIR ตาม hash ของเนื้อหา
+# XLSX: excel_writer เขียน XML ของชีตลง zip ทีละ chunk (หน่วยความจำคงที่ ไม่ขึ้นกับจำนวนแถว)
+#       ตารางที่เกินจำนวนแถวสูงสุดของ Excel แบ่งต่อเป็นชีตถัดไป
+# PDF : ตารางแสดงเฉพาะ PDF_TABLE_ROWS แถวแรก (ฉบับเต็มอยู่ใน XLSX) กราฟถูกแปลงเป็น PNG
+#       แล้วแคชไว้ตาม hash ของ figure (ต้องมี kaleido + Chrome/Chromium ถ้าแปลงไม่ได้ PDF จะระบุชื่อกราฟที่ขาด)
+#       ต้องใช้ฟอนต์ TTF ที่มีอักษรไทย: ตั้ง CLAIM_PDF_FONT, วางไฟล์ไว้ใน fonts/ หรือติดตั้งตาม packages.txt
+#       (fonts-tlwg-*-ttf) ถ้าไม่พบฟอนต์ ปุ่ม PDF จะถูกปิดพร้อมข้อความแจ้ง
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports")
+CHART_DIR = os.path.join(CACHE_DIR, "charts")
+EXCEL_MAX_ROWS = 1_048_576
+PDF_TABLE_ROWS = 200
+CHART_SIZE = (1000, 500)
+
+NO_FONT_MESSAGE = "ไม่พบฟอนต์ภาษาไทยสำหรับ PDF (ตั้งค่า CLAIM_PDF_FONT เป็น path ของไฟล์ .ttf หรือติดตั้งแพ็กเกจใน packages.txt)"
+
+FONT_CANDIDATES = [
+    os.environ.get("CLAIM_PDF_FONT", ""),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "THSarabunNew.ttf"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "NotoSansThai-Regular.ttf"),
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
+    "/usr/share/fonts/truetype/tlwg/Garuda.ttf",
+    "/usr/share/fonts/truetype/tlwg/Loma.ttf",
+    "C:/Windows/Fonts/tahoma.ttf",
+    "C:/Windows/Fonts/leelawad.ttf",
+]
+
+
+def build_report(cube: pd.DataFrame, kind: str, forecast_df: pd.DataFrame = None) -> dict:
+    # เนื้อหารายงานชุดเดียวกับหน้า dashboard: KPI, ตารางสรุป, watchlist, คำแนะนำ, พยากรณ์
+    sup_defect = rollup(cube, ["SUP", "Defect"], "จำนวนเคส").sort_values("จำนวนเคส", ascending=False)
+    watchlist = watchlist_above_mean(sup_defect)
+    tables = {
+        "รายเดือน SUP+Grade+Defect": rollup(cube, ["MonthKey", "SUP", "Grade", "Defect"], "จำนวนเคส")
+        .sort_values(["MonthKey", "SUP", "Grade", "Defect"]),
+        "รายQuarter SUP+Grade+Defect": rollup(cube, ["Quarter", "SUP", "Grade", "Defect"], "จำนวนเคส")
+        .sort_values(["Quarter", "SUP", "Grade", "Defect"]),
+        "SUP ที่ต้องเฝ้าระวัง": watchlist,
+        "คำแนะนำ": rollup(cube, ["SUP", "Defect", "Advice"])[["SUP", "Defect", "Advice"]],
+    }
+    if forecast_df is not None:
+        tables["พยากรณ์เดือนหน้า"] = forecast_df
+    return {
+        "kind": kind,
+        "kpi": {
+            "จำนวนเคส": total_count(cube),
+            "ซัพพลายเออร์": nunique(cube, "SUP"),
+            "ประเภทข้อบกพร่อง": nunique(cube, "Defect"),
+        },
+        "summary": executive_summary(watchlist, kind),
+        "tables": tables,
+    }
+
+
+def _cell(value):
+    # ค่าว่าง (NaN/NaT/None) -> None
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _sheet_title(name: str, part: int) -> str:
+    # ชื่อชีตยาวได้ไม่เกิน 31 ตัวและห้ามมี []:*?/\
+    title = "".join("_" if c in "[]:*?/\\" else c for c in name)
+    suffix = f" ({part})" if part > 1 else ""
+    return title[: 31 - len(suffix)] + suffix
+
+
+def summary_frame(report: dict) -> pd.DataFrame:
+    rows = [(name, f"{value:,}") for name, value in report["kpi"].items()]
+    rows += [("สรุปเชิงกลยุทธ์สำหรับผู้บริหาร", text) for text in report["summary"]]
+    return pd.DataFrame(rows, columns=["หัวข้อ", "รายละเอียด"])
+
+
+def write_xlsx(report: dict, path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    per_sheet = EXCEL_MAX_ROWS - 1
+    with XlsxStreamWriter(tmp) as writer:
+        writer.write_frame("สรุป", summary_frame(report))
+        for name, table in report["tables"].items():
+            parts = max(1, math.ceil(len(table) / per_sheet))
+            for part in range(1, parts + 1):
+                writer.write_frame(_sheet_title(name, part), table.iloc[(part - 1) * per_sheet: part * per_sheet])
+    os.replace(tmp, path)
+    return path
+
+
+def figure_digest(fig_json: str) -> str:
+    return hashlib.sha256(fig_json.encode()).hexdigest()
+
+
+def chart_png(fig_json: str):
+    # PNG ของ figure (แคชตาม hash) คืน None ถ้าแปลงไม่ได้ (ไม่มี kaleido หรือ kaleido หา Chrome ไม่เจอ)
+    path = os.path.join(CHART_DIR, f"{figure_digest(fig_json)}.png")
+    if os.path.exists(path):
+        return path
+    try:
+        import plotly.io as pio
+
+        image = pio.from_json(fig_json).to_image(format="png", width=CHART_SIZE[0], height=CHART_SIZE[1])
+    except Exception:
+        # kaleido แต่ละรุ่นแจ้ง error ต่างชนิดกัน (ImportError, ValueError, ChromeNotFoundError, ...)
+        return None
+    os.makedirs(CHART_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(image)
+    os.replace(tmp, path)
+    return path
+
+
+def find_font():
+    return next((p for p in FONT_CANDIDATES if p and os.path.exists(p)), None)
+
+
+def write_pdf(report: dict, path: str, figures=None) -> str:
+    # figures: {ชื่อกราฟ: fig.to_json()} (ส่งเป็น JSON เพื่อส่งข้าม process ได้)
+    from fpdf import FPDF
+
+    font = find_font()
+    if font is None:
+        raise RuntimeError(NO_FONT_MESSAGE)
+
+    pdf = FPDF(orientation="L", format="A4")
+    pdf.set_auto_page_break(True, margin=12)
+    pdf.add_font("thai", "", font, uni=True)
+    width = pdf.w - pdf.l_margin - pdf.r_margin
+
+    def heading(text):
+        pdf.set_font("thai", "", 16)
+        pdf.cell(0, 10, text, ln=1)
+        pdf.set_font("thai", "", 11)
+
+    pdf.add_page()
+    heading(f"รายงานวิเคราะห์เคลม ({'ม้วน' if report['kind'] == 'roll' else 'แผ่น'})")
+    for name, value in report["kpi"].items():
+        pdf.cell(0, 7, f"{name}: {value:,}", ln=1)
+    pdf.ln(3)
+    heading("สรุปเชิงกลยุทธ์สำหรับผู้บริหาร")
+    for text in report["summary"]:
+        pdf.multi_cell(0, 6, f"• {text}")
+        pdf.ln(1)
+
+    images = {name: chart_png(fig_json) for name, fig_json in (figures or {}).items()}
+    missing = [name for name, png in images.items() if png is None]
+    if missing:
+        pdf.ln(2)
+        pdf.multi_cell(0, 6, "กราฟที่แปลงเป็นภาพไม่ได้ (ต้องติดตั้ง kaleido และ Chrome/Chromium): " + ", ".join(missing))
+    for name, png in images.items():
+        if png is None:
+            continue
+        pdf.add_page()
+        heading(name)
+        pdf.image(png, w=width)
+
+    for name, table in report["tables"].items():
+        pdf.add_page()
+        heading(name)
+        columns = [str(c) for c in table.columns]
+        col_w = width / max(len(columns), 1)
+        pdf.set_font("thai", "", 9)
+        for c in columns:
+            pdf.cell(col_w, 6, c, border=1)
+        pdf.ln()
+        for row in table.head(PDF_TABLE_ROWS).itertuples(index=False, name=None):
+            for v in row:
+                text = "" if _cell(v) is None else str(v)
+                pdf.cell(col_w, 6, text[:60], border=1)
+            pdf.ln()
+        if len(table) > PDF_TABLE_ROWS:
+            pdf.ln(2)
+            pdf.cell(0, 6, f"แสดง {PDF_TABLE_ROWS:,} จาก {len(table):,} แถว (ฉบับเต็มอยู่ในไฟล์ XLSX)", ln=1)
+
+    # fpdf 1.7 เก็บ code point ของทุกตัวอักษรที่พิมพ์ซ้ำ ๆ ใน subset (list) แล้วค้นแบบ linear ตอนเขียนฟอนต์
+    # ตัดตัวซ้ำก่อน output ไม่อย่างนั้นรายงานหลายพันบรรทัดใช้เวลาหลายสิบวินาที
+    for font_info in pdf.fonts.values():
+        if font_info.get("subset"):
+            font_info["subset"] = sorted(set(font_info["subset"]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pdf.output(tmp, "F")
+    os.replace(tmp, path)
+    return path
+
+
+def export_report(cube: pd.DataFrame, kind: str, fmt: str, path: str, forecast_df=None, figures=None) -> str:
+    report_progress(0.1, "สรุปตาราง")
+    report = build_report(cube, kind, forecast_df)
+    report_progress(0.4, f"เขียนไฟล์ {fmt.upper()}")
+    if fmt == "xlsx":
+        return write_xlsx(report, path)
+    if fmt == "pdf":
+        return write_pdf(report, path, figures)
+    raise ValueError(f"ไม่รองรับรูปแบบ {fmt}")
+
+
+def submit_export(cube: pd.DataFrame, kind: str, fmt: str, forecast_df=None, figures=None) -> Job:
+    # figures: {ชื่อกราฟ: plotly figure} ส่งต่อให้ worker เป็น JSON
+    figures = {name: fig.to_json() for name, fig in (figures or {}).items()} if fmt == "pdf" else {}
+    parts = [kind, fmt, frame_digest(cube)]
+    if forecast_df is not None:
+        parts.append(frame_digest(forecast_df))
+    parts += [figure_digest(j) for j in figures.values()]
+    key = hashlib.sha256("|".join(parts).encode()).hexdigest()
+    path = os.path.join(EXPORT_DIR, f"{kind}-{key[:16]}.{fmt}")
+    return get_pool().submit(
+        f"export-{key}", export_report, cube, kind, fmt, path, forecast_df, figures,
+        label=f"ส่งออก {fmt.upper()}",
+    )
+
+
+def export_buttons(cube: pd.DataFrame, kind: str, forecast_df=None, figures=None) -> list:
+    # ปุ่มสร้าง/ดาวน์โหลดรายงาน คืน job ที่ยังทำงานอยู่ (ให้หน้าเว็บ rerun จนเสร็จ)
+    import streamlit as st
+
+    jobs = []
+    mime = {
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "pdf": "application/pdf",
+    }
+    for fmt, col in zip(["xlsx", "pdf"], st.columns(2)):
+        flag = f"export_{kind}_{fmt}"
+        if fmt == "pdf" and find_font() is None:
+            col.button(f"สร้างรายงาน {fmt.upper()}", key=f"{flag}_button", disabled=True)
+            col.caption(NO_FONT_MESSAGE)
+            continue
+        if col.button(f"สร้างรายงาน {fmt.upper()}", key=f"{flag}_button"):
+            st.session_state[flag] = True
+        if not st.session_state.get(flag):
+            continue
+        job = submit_export(cube, kind, fmt, forecast_df, figures)
+        jobs.append(job)
+        if job.status == "done":
+            path = job.result()
+            with open(path, "rb") as f:
+                col.download_button(
+                    f"⬇️ ดาวน์โหลด {fmt.upper()}", f, file_name=f"claim_report_{kind}.{fmt}",
+                    mime=mime[fmt], key=f"{flag}_download",
+                )
+        else:
+            render_progress(job, col)
+    return jobs
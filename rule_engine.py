@@ -0,0 +1,119 @@
+import csv
+import hashlib
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Rule engine สำหรับ RootCause / Advice
+# -----------------------------
+# กฎอยู่ในไฟล์ root_cause_rules.csv (kind, target, pattern, value) เรียงตามลำดับความสำคัญ
+# แถวที่ pattern ว่าง = ค่า default ของ kind/target นั้น
+# กฎทั้งหมดของแต่ละ target ถูก compile เป็น regex เดียว และประเมินเฉพาะค่า Defect ที่ไม่ซ้ำ
+RULES_PATH = os.environ.get(
+    "CLAIM_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "root_cause_rules.csv"),
+)
+
+DEFAULT_VALUES = {
+    "RootCause": "อื่น ๆ/ไม่ระบุ",
+    "Advice": "ตรวจสอบกระบวนการผลิต",
+}
+
+
+class RuleSet:
+    def __init__(self, rules, default):
+        # rules: [(pattern, value), ...] กฎแรกที่ match ชนะ
+        self.rules = list(rules)
+        self.default = default
+        self.values = [value for _, value in self.rules]
+        if self.rules:
+            # แต่ละทางเลือกเป็น lookahead ที่ตำแหน่ง 0 ตามด้วย group ว่างที่ระบุเลขกฎ
+            # regex จะลองทางเลือกตามลำดับ จึงคงลำดับความสำคัญเดิมของกฎไว้
+            alternation = "|".join(
+                f"(?=.*?(?:{pattern}))(?P<r{i}>)" for i, (pattern, _) in enumerate(self.rules)
+            )
+            self._regex = re.compile(alternation, flags=re.IGNORECASE | re.DOTALL)
+        else:
+            self._regex = None
+
+    def match_index(self, text) -> int:
+        # คืนเลขกฎที่ match (-1 = ไม่มีกฎไหน match)
+        if self._regex is None or not text:
+            return -1
+        m = self._regex.match(text)
+        if m is None:
+            return -1
+        return int(m.lastgroup[1:])
+
+    def classify(self, values: pd.Series) -> pd.Series:
+        # factorize ค่า Defect แล้วประเมินกฎเฉพาะค่าที่ไม่ซ้ำ จากนั้น broadcast กลับด้วย code
+        codes, uniques = pd.factorize(values)
+        labels = np.array(self.values + [self.default], dtype=object)
+        rule_idx = np.fromiter(
+            (self.match_index(str(u)) for u in uniques), dtype=np.intp, count=len(uniques)
+        )
+        # ค่าว่าง/NaN (code -1) และค่าที่ไม่ match ใช้ default (ตำแหน่งสุดท้ายของ labels)
+        rule_idx[rule_idx < 0] = len(self.values)
+        per_row = np.append(rule_idx, len(self.values))[codes]
+        return pd.Series(labels[per_row], index=values.index, dtype=object)
+
+
+def load_rules(path=RULES_PATH) -> dict:
+    # คืน {(kind, target): RuleSet}
+    grouped = OrderedDict()
+    defaults = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            key = (row["kind"].strip(), row["target"].strip())
+            pattern = (row.get("pattern") or "").strip()
+            value = row["value"].strip()
+            if pattern:
+                grouped.setdefault(key, []).append((pattern, value))
+            else:
+                defaults[key] = value
+    keys = list(OrderedDict.fromkeys(list(grouped) + list(defaults)))
+    return {
+        key: RuleSet(grouped.get(key, []), defaults.get(key, DEFAULT_VALUES.get(key[1])))
+        for key in keys
+    }
+
+
+_rules_cache = {}
+
+
+def get_rules(path=RULES_PATH) -> dict:
+    # โหลดไฟล์กฎใหม่เมื่อไฟล์ถูกแก้ไข (ดูจาก mtime)
+    mtime = os.path.getmtime(path)
+    cached = _rules_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_rules(path))
+        _rules_cache[path] = cached
+    return cached[1]
+
+
+_digest_cache = {}
+
+
+def rules_digest(path=RULES_PATH) -> str:
+    # ใช้ประกอบ key ของแคช เพื่อให้ผลที่แคชไว้หมดอายุเมื่อแก้ไฟล์กฎ
+    # (ถูกเรียกทุกครั้งที่ค้นแคช จึง hash ไฟล์ใหม่เฉพาะเมื่อ mtime เปลี่ยน เหมือน get_rules)
+    mtime = os.path.getmtime(path)
+    cached = _digest_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:16])
+        _digest_cache[path] = cached
+    return cached[1]
+
+
+def apply_rules(df: pd.DataFrame, kind: str, source="Defect", path=RULES_PATH) -> pd.DataFrame:
+    # เติมคอลัมน์ RootCause / Advice ตามกฎของ kind ("roll" หรือ "sheet")
+    rules = get_rules(path)
+    for target in ["RootCause", "Advice"]:
+        ruleset = rules.get((kind, target)) or RuleSet([], DEFAULT_VALUES[target])
+        df[target] = ruleset.classify(df[source])
+    return df
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# module ของแอปอยู่ระดับบนสุดของ repo (ไม่มี package) และ test ใช้ตัวสร้างข้อมูลสังเคราะห์ใน benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# ไฟล์ SQLite / แคชเริ่มต้นของทุก module ชี้ไปโฟลเดอร์ชั่วคราว (ตั้งก่อน import) test จึงไม่แตะข้อมูลจริง
+_TMP = tempfile.mkdtemp(prefix="claim_tests_")
+os.environ["CLAIM_STORE_PATH"] = os.path.join(_TMP, "claims.sqlite")
+os.environ["CLAIM_ALIAS_PATH"] = os.path.join(_TMP, "defect_aliases.sqlite")
+os.environ["CLAIM_MONITOR_PATH"] = os.path.join(_TMP, "control_monitor.sqlite")
+os.environ["CLAIM_FORECAST_CACHE"] = os.path.join(_TMP, "forecast_cache.sqlite")
+os.environ["CLAIM_CACHE_DIR"] = os.path.join(_TMP, "cache")
@@ -0,0 +1,87 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("plotly")
+
+from charts import MIN_TOP_N, OTHER, bar_chart, budgeted, figure_nbytes, fold_top_n, line_chart, pie_chart
+
+
+def many_series(n_sup=80, n_months=36, seed=0):
+    rng = np.random.default_rng(seed)
+    months = pd.period_range("2022-01", periods=n_months, freq="M").strftime("%Y-%m")
+    return pd.DataFrame({
+        "MonthKey": np.repeat(months, n_sup),
+        "SUP": np.tile([f"SUP{i:03d}" for i in range(n_sup)], n_months),
+        "Count": rng.integers(1, 50, n_sup * n_months),
+    })
+
+
+def test_fold_top_n_keeps_totals():
+    df = many_series()
+    folded = fold_top_n(df, "SUP", "Count", 5)
+    assert folded["Count"].sum() == df["Count"].sum()
+    assert folded["SUP"].nunique() == 6
+    assert list(folded["SUP"].cat.categories)[-1] == OTHER
+    top = df.groupby("SUP")["Count"].sum().nlargest(5).index
+    assert set(folded["SUP"].astype(str)) == set(top) | {OTHER}
+
+
+def test_budgeted_halves_n_until_within_budget():
+    import plotly.express as px
+
+    df = many_series()
+    calls = []
+
+    def build(n, lean):
+        calls.append((n, lean))
+        return px.line(fold_top_n(df, "SUP", "Count", n), x="MonthKey", y="Count", color="SUP")
+
+    full = figure_nbytes(build(80, False))
+    calls.clear()
+    fig = budgeted(build, n=80, max_bytes=full // 5)
+    meta = fig.layout.meta
+    assert meta["payload_bytes"] <= full // 5
+    assert not meta["over_budget"] and not meta["lean"]
+    assert [n for n, _ in calls] == [80, 40, 20, 10, 5][: len(calls)]
+    assert meta["top_n"] == calls[-1][0] < 80
+
+
+def test_budgeted_falls_back_to_lean_and_warns(caplog):
+    import plotly.express as px
+
+    df = many_series()
+
+    def build(n, lean):
+        return px.bar(fold_top_n(df, "SUP", "Count", n), x="SUP", y="Count", text=None if lean else "Count")
+
+    with caplog.at_level(logging.WARNING, logger="claim_dashboard.charts"):
+        fig = budgeted(build, n=40, max_bytes=100)
+    meta = fig.layout.meta
+    assert meta["top_n"] == MIN_TOP_N
+    assert meta["lean"] and meta["over_budget"]
+    assert "exceeds budget" in caplog.text
+
+
+def test_line_and_bar_charts_fold_categories():
+    df = many_series()
+    line = line_chart(df, "MonthKey", "Count", "SUP", n=10)
+    assert len(line.data) == 11
+    bar = bar_chart(df.groupby("SUP", as_index=False)["Count"].sum(), "SUP", "Count", text="Count", n=10)
+    assert len(bar.data[0].x) == 11
+    assert bar.data[0].text is not None
+
+
+def test_pie_text_options_only_when_not_lean():
+    df = many_series().groupby("SUP", as_index=False)["Count"].sum()
+    options = {"textposition": "inside", "textinfo": "percent+label"}
+    fig = pie_chart(df, "SUP", "Count", text_options=options)
+    assert not fig.layout.meta["lean"]
+    assert fig.data[0].textinfo == "percent+label"
+    assert fig.data[0].textposition == "inside"
+
+    lean = pie_chart(df, "SUP", "Count", max_bytes=100, text_options=options)
+    assert lean.layout.meta["lean"]
+    assert lean.data[0].textinfo == "none"
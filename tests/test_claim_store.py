@@ -0,0 +1,139 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from claim_store import ClaimStore
+from ingest_cache import IngestCache, load_workbook_claims
+from synth_claims import write_workbook
+
+ROWS = 400
+
+
+@pytest.fixture
+def setup(tmp_path):
+    path = write_workbook(str(tmp_path / "roll.xlsx"), "roll", ROWS, seed=3)
+    store = ClaimStore(str(tmp_path / "claims.sqlite"))
+    cache = IngestCache(cache_dir=str(tmp_path / "cache"))
+    return store, cache, path
+
+
+def snapshot(store, kind="roll"):
+    # แถว, cube และจำนวนรายสัปดาห์ของคลัง (เรียงให้เทียบกันได้)
+    with closing(sqlite3.connect(store.path)) as con:
+        claims = pd.read_sql_query(f"SELECT * FROM claims_{kind} ORDER BY row_key", con)
+        weeks = pd.read_sql_query(f"SELECT * FROM week_{kind}", con)
+    cube = store.load_cube(kind)
+    cube = cube.sort_values(list(cube.columns)).reset_index(drop=True)
+    weeks = weeks.sort_values(list(weeks.columns)).reset_index(drop=True)
+    return claims, cube, weeks
+
+
+def test_reingest_same_file_is_noop(setup):
+    store, cache, path = setup
+    rows = store.ingest(path, "roll", cache=cache)
+    assert rows == store.row_count("roll") == ROWS
+    before = snapshot(store)
+    version = store.cube_version("roll")
+
+    # ไฟล์เดิม (hash เดิม) ไม่ถูกอ่านซ้ำ
+    assert store.ingest(path, "roll", cache=cache) == 0
+    assert store.cube_version("roll") == version
+
+    # upsert แถวเดิมซ้ำ: key เดิมแทนที่แถวเดิม ไม่มีแถวเพิ่ม cube ไม่เปลี่ยน
+    df = load_workbook_claims(path, "roll", cache=cache)
+    assert store.upsert(df, "roll") == ROWS
+    after = snapshot(store)
+    for a, b in zip(before, after):
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_resaved_copy_keeps_row_keys(setup, tmp_path):
+    # ไฟล์เดียวกันที่ถูกบันทึกใหม่ (hash ต่าง, dtype ของคอลัมน์อาจต่าง) ต้องได้ row_key เดิม
+    store, cache, path = setup
+    store.ingest(path, "roll", cache=cache)
+    before = snapshot(store)
+
+    copy = str(tmp_path / "roll_copy.xlsx")
+    pd.read_excel(path).to_excel(copy, index=False)
+    assert store.ingest(copy, "roll", cache=cache) == ROWS
+    after = snapshot(store)
+    assert after[0]["row_key"].tolist() == before[0]["row_key"].tolist()
+    pd.testing.assert_frame_equal(before[1], after[1])
+    pd.testing.assert_frame_equal(before[2], after[2])
+
+
+def test_reopen_keeps_keys(setup):
+    store, cache, path = setup
+    store.ingest(path, "roll", cache=cache)
+    keys = snapshot(store)[0]["row_key"].tolist()
+    reopened = ClaimStore(store.path)
+    assert snapshot(reopened)[0]["row_key"].tolist() == keys
+
+
+def corrected_copy(path, out, drop_ids=False):
+    # ไฟล์สะสมฉบับแก้: แก้ข้อความ Defect และน้ำหนักของแถวที่ 5
+    df = pd.read_excel(path)
+    if drop_ids:
+        df = df.drop(columns=["เลขที่เอกสาร", "Lot"])
+    df.loc[5, "สิ่งที่ไม่เป็นไปตามข้อกำหนด"] = "ข้อความที่แก้แล้ว"
+    df.loc[5, "น้ำหนัก"] = 777.0
+    df.to_excel(out, index=False)
+    return out, df
+
+
+@pytest.mark.parametrize("drop_ids", [False, True])
+def test_corrected_reupload_replaces_rows(tmp_path, drop_ids):
+    store = ClaimStore(str(tmp_path / "claims.sqlite"))
+    cache = IngestCache(cache_dir=str(tmp_path / "cache"))
+    original = str(tmp_path / "original.xlsx")
+    pd.read_excel(write_workbook(str(tmp_path / "roll.xlsx"), "roll", 200, seed=4)).pipe(
+        lambda df: df.drop(columns=["เลขที่เอกสาร", "Lot"]) if drop_ids else df
+    ).to_excel(original, index=False)
+    assert store.ingest(original, "roll", cache=cache) == 200
+
+    corrected, df = corrected_copy(original, str(tmp_path / "corrected.xlsx"))
+    # แถวที่แก้แทนที่แถวเดิม ไม่เพิ่มเป็นแถวใหม่
+    assert store.ingest(corrected, "roll", cache=cache) == 200
+    assert store.row_count("roll") == 200
+
+    claims, cube, weeks = snapshot(store)
+    assert (claims["DefectRaw"] == "ข้อความที่แก้แล้ว").sum() == 1
+    assert claims["Weight"].eq(777.0).sum() == 1
+    assert int(cube["Count"].sum()) == 200
+
+    # ผลเท่ากับคลังใหม่ที่นำเข้าเฉพาะไฟล์ฉบับแก้
+    fresh = ClaimStore(str(tmp_path / "fresh.sqlite"))
+    fresh.ingest(corrected, "roll", cache=cache)
+    fresh_claims, fresh_cube, fresh_weeks = snapshot(fresh)
+    pd.testing.assert_frame_equal(cube, fresh_cube)
+    pd.testing.assert_frame_equal(weeks, fresh_weeks)
+    assert sorted(claims["row_key"]) == sorted(fresh_claims["row_key"])
+
+
+def test_outlier_table(setup):
+    from outlier_panel import outlier_table
+
+    store, cache, path = setup
+    assert outlier_table(store, "roll", {}).empty
+    store.ingest(path, "roll", cache=cache)
+    table = outlier_table(store, "roll", {})
+    assert set(table["คอลัมน์"]) == {"Width", "Weight"}
+    overall = table[table["SUP"] == "ทั้งหมด"].set_index("คอลัมน์")
+    df = load_workbook_claims(path, "roll", cache=cache)
+    assert overall.loc["Weight", "n"] == pd.to_numeric(df["Weight"], errors="coerce").notna().sum()
+
+    sup = df["SUP"].value_counts().index[0]
+    selected = outlier_table(store, "roll", {"SUP": [sup]})
+    assert set(selected["SUP"]) == {"ทั้งหมด", sup}
+
+
+def test_old_key_format_is_rekeyed(setup):
+    store, cache, path = setup
+    store.ingest(path, "roll", cache=cache)
+    keys = snapshot(store)[0]["row_key"].tolist()
+    with closing(sqlite3.connect(store.path)) as con, con:
+        con.execute("UPDATE claims_roll SET row_key = 'row:' || rowid")
+        con.execute("PRAGMA user_version = 2")
+    assert snapshot(ClaimStore(store.path))[0]["row_key"].tolist() == keys
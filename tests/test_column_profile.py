@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_rules import generate_ai_tips
+from analysis import risk_assessment_oct_q4
+from column_profile import ColumnProfile, get_profile
+from ingest_cache import IngestCache, load_workbook_claims
+from synth_claims import write_workbook
+
+
+def baseline_iqr_outliers(series):
+    s = pd.to_numeric(series, errors="coerce").dropna()
+    if s.empty:
+        return 0, (None, None)
+    q1, q3 = np.percentile(s, [25, 75])
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    return ((s < low) | (s > high)).sum(), (low, high)
+
+
+def baseline_tips(df):
+    # generate_ai_tips เดิม (สแกน DataFrame แยกทีละคำถาม)
+    tips = []
+    missing = [c for c in ["SUP", "Defect", "Month", "Week"] if c not in df.columns]
+    if missing:
+        tips.append(f"⚠️ คอลัมน์ขาด: {', '.join(missing)} — โปรดตรวจแหล่งข้อมูลหรือ mapping ชื่อคอลัมน์")
+    if "ShipDate" in df.columns and df["ShipDate"].isna().mean() > 0.2:
+        tips.append("⚠️ วันที่ส่งของ (ShipDate) มีค่าไม่สามารถแปลงเป็นวันที่ได้จำนวนมาก — รูปแบบวันที่อาจไม่สม่ำเสมอ")
+    if "Month" in df.columns:
+        oct_count = int((df["Month"] == 10).sum())
+        if oct_count > 0:
+            tips.append(f"🔎 เดือนตุลาคมพบเคส {oct_count} รายการ — แนะนำวิเคราะห์สาเหตุเชิงลึกและวางแผน Q4")
+    if "Quarter" in df.columns:
+        q4_count = int((df["Quarter"] == 4).sum())
+        if q4_count > 0:
+            tips.append(f"🔎 Q4 พบเคส {q4_count} รายการ — ตรวจความพร้อมซัพพลายเออร์และกระบวนการก่อน peak")
+    if "Defect" in df.columns:
+        common = df["Defect"].value_counts().head(3).index.tolist()
+        if common:
+            tips.append(f"📌 Defect ที่พบมาก: {', '.join(common)} — จัดทำมาตรการป้องกันที่จุดเกิดเหตุ")
+    if "SUP" in df.columns:
+        sup_count = df["SUP"].value_counts()
+        if not sup_count.empty:
+            tips.append(f"🏭 SUP ที่มีเคสสูงสุด: {sup_count.idxmax()} — แนะนำทำ CAPA ร่วมกันและตั้ง KPI รายไตรมาส")
+    for col in ["Width", "Weight"]:
+        if col in df.columns:
+            outliers, (low, high) = baseline_iqr_outliers(df[col])
+            if outliers > 0:
+                tips.append(f"📈 ค่าผิดปกติใน {col}: {outliers} รายการ — ช่วงคาดหวัง ~ {low:.2f} ถึง {high:.2f}")
+    tips.append("✅ แนะนำตั้ง validation เมื่อรับข้อมูล: ตรวจชื่อคอลัมน์, วันที่, และประเภทค่า เพื่อป้องกัน error ในการสรุปผล")
+    tips.append("🧪 ใช้การทดสอบ A/B กับแนวทางแก้ไขที่จุด defect สูง และติดตามผลรายสัปดาห์/รายไตรมาส")
+    return tips
+
+
+def baseline_risk(df):
+    res = {}
+    if "Month" in df.columns:
+        res["Oct_Defects"] = int(df[df["Month"] == 10].shape[0])
+    if "Quarter" in df.columns:
+        res["Q4_Defects"] = int(df[df["Quarter"] == 4].shape[0])
+    for label, cond in [("Oct", df["Month"] == 10 if "Month" in df.columns else None),
+                        ("Q4", df["Quarter"] == 4 if "Quarter" in df.columns else None)]:
+        if cond is not None and "Defect" in df.columns:
+            res[f"{label}_TopDefects"] = df[cond]["Defect"].value_counts().head(5).to_dict()
+        else:
+            res[f"{label}_TopDefects"] = {}
+    return res
+
+
+@pytest.fixture(scope="module")
+def frames(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("profile")
+    cache = IngestCache(cache_dir=str(tmp / "cache"))
+    out = {}
+    for kind in ["roll", "sheet"]:
+        path = write_workbook(str(tmp / f"{kind}.xlsx"), kind, 3000, seed=6)
+        df = load_workbook_claims(path, kind, cache=cache)
+        # รายงานรูปแบบวันที่ (attrs) เป็นข้อความที่ไม่มีในเวอร์ชันเดิม
+        df.attrs = {}
+        out[kind] = df
+        out[f"{kind}_object"] = df.astype({c: object for c in ["SUP", "Defect"]})
+    rng = np.random.default_rng(1)
+    out["plain"] = pd.DataFrame({
+        "SUP": rng.choice(["A", "B", "C"], 500),
+        "Defect": rng.choice(["ยับ", "ขอบแตก", "จุดดำ"], 500),
+        "Month": rng.integers(1, 13, 500),
+        "ShipDate": pd.Series(pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, 500), "D"))
+        .where(rng.random(500) > 0.3),
+        "Width": np.r_[rng.normal(150, 8, 495), [400, -20, 900, 1e4, "n/a"]],
+    })
+    out["missing_columns"] = pd.DataFrame({"SUP": ["A", "A", "B"], "Weight": [1.0, 2.0, None]})
+    return out
+
+
+@pytest.mark.parametrize("name", ["roll", "sheet", "roll_object", "sheet_object", "plain", "missing_columns"])
+def test_tips_match_baseline(frames, name):
+    df = frames[name]
+    assert generate_ai_tips(df) == baseline_tips(df)
+
+
+@pytest.mark.parametrize("name", ["roll", "sheet", "roll_object", "plain"])
+def test_risk_assessment_matches_baseline(frames, name):
+    df = frames[name]
+    assert risk_assessment_oct_q4(df) == baseline_risk(df)
+
+
+def test_iqr_matches_percentile():
+    rng = np.random.default_rng(2)
+    for n in [1, 2, 3, 4, 7, 100, 10_001]:
+        for values in [rng.normal(150, 8, n), rng.integers(0, 4, n).astype(float)]:
+            stats = ColumnProfile._iqr(pd.Series(values))
+            outliers, (low, high) = baseline_iqr_outliers(pd.Series(values))
+            assert stats["count"] == n
+            assert (stats["outliers"], stats["low"], stats["high"]) == (outliers, low, high)
+    assert ColumnProfile._iqr(pd.Series(["x", None]))["count"] == 0
+
+
+def test_profile_is_cached_per_frame(frames):
+    df = frames["roll"]
+    assert get_profile(df) is get_profile(df)
+    assert get_profile(df.copy()) is not get_profile(df)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import control_monitor
+import jobs
+from claim_store import ClaimStore
+from control_monitor import WARMUP_WEEKS, ControlMonitor, monitor_scope, refresh_monitor
+from cube import COUNT
+from ingest_cache import IngestCache
+from synth_claims import write_workbook
+
+
+def weekly_frame(series, start="2024-01-01"):
+    # series = {(SUP, Defect): จำนวนเคสต่อสัปดาห์} -> ตาราง (Week, SUP, Defect, Count) แบบที่คลังเก็บ
+    weeks = pd.date_range(start, periods=max(len(v) for v in series.values()), freq="7D").strftime("%Y-%m-%d")
+    rows = [
+        {"Week": weeks[t], "SUP": sup, "Defect": defect, COUNT: n}
+        for (sup, defect), counts in series.items()
+        for t, n in enumerate(counts)
+        if n
+    ]
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    return ControlMonitor(str(tmp_path / "monitor.sqlite"))
+
+
+def test_step_change_signals_and_stable_series_does_not(monitor):
+    rng = np.random.default_rng(0)
+    weekly = weekly_frame({
+        ("A", "ยับ"): rng.poisson(5, 30),
+        ("B", "ขอบแตก"): np.r_[rng.poisson(5, 24), [20] * 6],
+    })
+    stats = monitor.update("s", weekly)
+    # สัปดาห์ล่าสุดในข้อมูลยังไม่ประมวลผล
+    assert stats["weeks"] == 29 and stats["series"] == 2
+    alerts = monitor.alerts("s")
+    assert alerts["SUP"].tolist() == ["B"]
+    assert alerts["signal_week"].iloc[0] >= sorted(weekly["Week"].unique())[24]
+    assert monitor.alerts("s", among=pd.DataFrame({"SUP": ["A"], "Defect": ["ยับ"]})).empty
+
+
+def test_no_signal_during_warmup(monitor):
+    weekly = weekly_frame({("A", "ยับ"): [1] * (WARMUP_WEEKS - 1) + [50, 50]})
+    monitor.update("s", weekly)
+    assert monitor.alerts("s").empty
+
+
+def test_incremental_update_matches_full_history(monitor):
+    rng = np.random.default_rng(1)
+    weekly = weekly_frame({
+        ("A", "ยับ"): rng.poisson(3, 40),
+        ("B", "ขอบแตก"): np.r_[np.zeros(15, int), rng.poisson(8, 25)],
+        ("C", "จุดดำ"): np.r_[rng.poisson(2, 30), [15] * 10],
+    })
+    monitor.update("full", weekly)
+    weeks = sorted(weekly["Week"].unique())
+    for cut in [10, 22, 31, len(weeks)]:
+        monitor.update("step", weekly[weekly["Week"] <= weeks[cut - 1]])
+    assert monitor.through_week("step") == monitor.through_week("full") == weeks[-2]
+    pd.testing.assert_frame_equal(monitor.load("step").sort_index(), monitor.load("full").sort_index())
+
+
+def test_scopes_are_separate(monitor):
+    monitor.update("a", weekly_frame({("A", "ยับ"): [1] * 12}))
+    assert monitor.through_week("b") is None
+    assert monitor.load("b").empty
+    monitor.clear("a")
+    assert monitor.through_week("a") is None
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = write_workbook(str(tmp_path / "roll.xlsx"), "roll", 2000, seed=22)
+    store = ClaimStore(str(tmp_path / "claims.sqlite"))
+    # นำเข้าผ่าน ClaimStore.ingest โดยตรง (แบบ CLI) monitor จึงยังไม่ถูก refresh
+    store.ingest(path, "roll", cache=IngestCache(cache_dir=str(tmp_path / "cache")))
+    return store
+
+
+def test_refresh_tracks_store_version(store, monitor):
+    scope = monitor_scope(store, "roll")
+    assert monitor.store_version(scope) is None
+    stats = refresh_monitor(store, "roll", monitor)
+    assert stats["weeks"] > 0
+    assert monitor.store_version(scope) == store.cube_version("roll")
+    # คลังไม่เปลี่ยน: ไม่ประมวลผลซ้ำ
+    assert refresh_monitor(store, "roll", monitor) == {"weeks": 0, "series": 0, "signals": 0}
+
+
+def test_page_load_submits_refresh_for_stale_monitor(store, monitor, monkeypatch):
+    monkeypatch.setattr(control_monitor, "_default_monitor", monitor)
+    monkeypatch.setattr(jobs, "_default_pool", jobs.JobPool(workers=0))
+    job = jobs.submit_monitor_refresh(store, "roll")
+    assert job is not None and job.status == "done"
+    assert job.result()["weeks"] > 0
+    assert monitor.through_week(monitor_scope(store, "roll")) is not None
+    # เป็นปัจจุบันแล้ว: ไม่ส่ง job
+    assert jobs.submit_monitor_refresh(store, "roll") is None
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from cube import COUNT, build_cube, merge_cubes, nunique, rollup, top_n, total_count
+from ingest_cache import IngestCache, load_workbook_claims
+from synth_claims import write_workbook
+
+
+@pytest.fixture(scope="module")
+def claims(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("cube")
+    path = write_workbook(str(tmp / "roll.xlsx"), "roll", 2000, seed=11)
+    return load_workbook_claims(path, "roll", cache=IngestCache(cache_dir=str(tmp / "cache")))
+
+
+def sort(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("keys", [["SUP"], ["MonthKey"], ["SUP", "Defect"], ["Quarter", "RootCause"], ["Grade"]])
+def test_rollup_matches_raw_groupby(claims, keys):
+    cube = build_cube(claims)
+    expected = claims.groupby(keys, observed=True).size().reset_index(name="n")
+    pd.testing.assert_frame_equal(sort(rollup(cube, keys, "n")), sort(expected), check_dtype=False)
+
+
+def test_cube_is_smaller_and_keeps_missing_keys(claims):
+    cube = build_cube(claims)
+    assert len(cube) < len(claims)
+    # แถวที่วันที่อ่านไม่ได้ (MonthKey ว่าง) ยังถูกนับใน total
+    assert claims["MonthKey"].isna().any()
+    assert total_count(cube) == len(claims)
+    assert nunique(cube, "SUP") == claims["SUP"].nunique()
+
+
+def test_top_n(claims):
+    cube = build_cube(claims)
+    expected = claims["Defect"].value_counts().head(5)
+    top = top_n(cube, "Defect", n=5)
+    assert top[COUNT].tolist() == expected.tolist()
+
+
+def test_merge_cubes_equals_cube_of_concat(claims):
+    first, second = claims.iloc[:700], claims.iloc[700:]
+    merged = merge_cubes([build_cube(first), build_cube(second)])
+    whole = build_cube(claims)
+    assert total_count(merged) == len(claims)
+    for keys in [["SUP"], ["SUP", "Defect", "MonthKey"]]:
+        pd.testing.assert_frame_equal(sort(rollup(merged, keys)), sort(rollup(whole, keys)), check_dtype=False)
+
+
+def test_merge_cubes_with_different_keys(claims):
+    # ไฟล์ที่ไม่มีคอลัมน์ Grade: key Grade ยังอยู่ในผลรวม (ค่าว่างสำหรับไฟล์นั้น)
+    with_grade = build_cube(claims.iloc[:500])
+    without_grade = build_cube(claims.iloc[500:].drop(columns="Grade"))
+    merged = merge_cubes([with_grade, without_grade])
+    assert "Grade" in merged.columns
+    assert total_count(merged) == len(claims)
+    by_grade = rollup(merged, "Grade")
+    assert by_grade[COUNT].sum() == 500
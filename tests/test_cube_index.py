@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import compact_claims
+from cube import COUNT, build_cube
+from cube_index import CubeIndex, get_index
+from ingest_cache import IngestCache, load_workbook_claims
+from synth_claims import write_workbook
+
+
+@pytest.fixture(scope="module")
+def cube(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("cube_index")
+    path = write_workbook(str(tmp / "roll.xlsx"), "roll", 4000, seed=21)
+    claims = load_workbook_claims(path, "roll", cache=IngestCache(cache_dir=str(tmp / "cache")))
+    return build_cube(claims)
+
+
+def reference(cube, months=None, filters=None):
+    # สแกนทุกแถวด้วย boolean mask (วิธีตรงไปตรงมา)
+    mask = pd.Series(True, index=cube.index)
+    if months is not None:
+        start, end = months
+        month = cube["MonthKey"].astype(object)
+        in_range = month.notna()
+        if start is not None:
+            in_range &= month.astype(str) >= str(start)
+        if end is not None:
+            in_range &= month.astype(str) <= str(end)
+        mask &= in_range
+    for col, selected in (filters or {}).items():
+        if selected:
+            mask &= cube[col].isin(selected)
+    return cube[mask]
+
+
+def same_rows(a, b):
+    keys = [c for c in a.columns if c != COUNT]
+    a = a.assign(**{c: a[c].astype(object) for c in keys}).sort_values(keys, na_position="last")
+    b = b.assign(**{c: b[c].astype(object) for c in keys}).sort_values(keys, na_position="last")
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_dtype=False)
+
+
+def test_options_are_sorted_and_cover_cube(cube):
+    index = CubeIndex(cube)
+    months = cube["MonthKey"].dropna().astype(str).unique()
+    assert index.month_options == sorted(months)
+    for col in ["SUP", "Grade", "Defect", "RootCause"]:
+        assert sorted(index.values[col], key=str) == index.values[col]
+        assert set(index.values[col]) == set(cube[col].dropna())
+
+
+def test_matches_boolean_mask(cube):
+    index = CubeIndex(cube)
+    options = index.month_options
+    sups, defects, grades = index.values["SUP"], index.values["Defect"], index.values["Grade"]
+    cases = [
+        (None, {}),
+        ((options[0], options[-1]), {}),
+        ((options[3], options[8]), {}),
+        ((options[5], options[5]), {"SUP": sups[:2]}),
+        ((None, options[4]), {"Defect": defects[:1]}),
+        ((options[-4], None), {"Grade": grades[:3], "SUP": sups[::2]}),
+        (None, {"SUP": sups[:3], "Defect": defects[1:4], "RootCause": index.values["RootCause"][:1]}),
+        (None, {"SUP": ["ไม่มี SUP นี้"]}),
+        (("2099-01", "2099-12"), {}),
+    ]
+    for months, filters in cases:
+        got = index.frame(months, filters)
+        expected = reference(cube, months, filters)
+        same_rows(got, expected)
+        assert int(got[COUNT].sum()) == int(expected[COUNT].sum())
+
+
+def test_random_filters_match_boolean_mask(cube):
+    index = CubeIndex(cube)
+    rng = np.random.default_rng(5)
+    options = index.month_options
+    for _ in range(50):
+        a, b = sorted(rng.integers(0, len(options), 2))
+        filters = {
+            col: list(rng.choice(values, rng.integers(0, 4), replace=False))
+            for col, values in index.values.items()
+        }
+        same_rows(index.frame((options[a], options[b]), filters), reference(cube, (options[a], options[b]), filters))
+
+
+def test_no_filter_returns_whole_cube(cube):
+    index = CubeIndex(cube)
+    assert index.frame() is index.cube
+    assert len(index.select()) == len(cube)
+
+
+def test_get_index_is_cached_by_key(cube):
+    built = []
+
+    def make():
+        built.append(1)
+        return cube
+
+    first = get_index(make, "test-key")
+    assert get_index(make, "test-key") is first
+    assert len(built) == 1
+    assert get_index(cube.iloc[:10], "other-key") is not first
+
+
+def test_mixed_type_grade(tmp_path):
+    # Excel อ่าน Grade ที่เป็นตัวเลขเป็นตัวเลข ปนกับ Grade ที่เป็นข้อความ
+    claims = pd.DataFrame({
+        "MonthKey": ["2024-01", "2024-01", "2024-02", "2024-02", "2024-03"],
+        "SUP": ["A", "B", "A", "B", "A"],
+        "Grade": pd.Series([125, "KA125", 125.0, None, 2.5], dtype=object),
+        "Defect": ["ยับ"] * 5,
+    })
+    compact = compact_claims(claims)
+    assert sorted(compact["Grade"].cat.categories) == ["125", "2.5", "KA125"]
+    cube = build_cube(compact)
+    cube.to_parquet(tmp_path / "cube.parquet", index=False)
+    index = CubeIndex(cube)
+    assert index.values["Grade"] == ["125", "2.5", "KA125"]
+    assert int(index.frame(None, {"Grade": ["125"]})[COUNT].sum()) == 2
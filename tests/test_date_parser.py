@@ -0,0 +1,73 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from date_parser import TWO_DIGIT_AHEAD, parse_dates
+
+
+def parse_one(value):
+    parsed, report = parse_dates(pd.Series([value], dtype=object))
+    return parsed.iloc[0], report["รูปแบบ"].iloc[0]
+
+
+@pytest.mark.parametrize("value, expected, fmt", [
+    (dt.datetime(2024, 1, 15, 8, 30), "2024-01-15 08:30", "datetime"),
+    (45306, "2024-01-15", "excel_serial"),
+    (45306.5, "2024-01-15 12:00", "excel_serial"),
+    (20240115, "2024-01-15", "yyyymmdd"),
+    (20240115.0, "2024-01-15", "yyyymmdd"),
+    ("20240115.0", "2024-01-15", "yyyymmdd"),
+    ("15/01/2024", "2024-01-15", "dd/mm/yyyy"),
+    ("15-01-2567", "2024-01-15", "dd/mm/yyyy"),
+    ("5.1.2024 13:45", "2024-01-05 13:45", "dd/mm/yyyy"),
+    ("๑๕/๐๑/๒๕๖๗", "2024-01-15", "dd/mm/yyyy"),
+    ("2024-01-15T08:00:00", "2024-01-15 08:00", "yyyy-mm-dd"),
+    ("15 ม.ค. 2567", "2024-01-15", "thai_month"),
+    ("3 มีนาคม 67", "2024-03-03", "thai_month"),
+    ("29 กุมภาพันธ์ 2024", "2024-02-29", "thai_month"),
+])
+def test_formats(value, expected, fmt):
+    parsed, name = parse_one(value)
+    assert parsed == pd.Timestamp(expected)
+    assert name == fmt
+
+
+@pytest.mark.parametrize("value", [
+    "31/02/2024",       # วันที่ไม่มีจริง
+    "01/01/2399",       # ปี 4 หลักต่ำกว่าเกณฑ์ พ.ศ. และเกินช่วงของ datetime64[ns]
+    "January 1, 2399",  # ค่าที่เหลือให้ pandas เดา: เกินช่วงต้องเป็น NaT ไม่ใช่ error
+    "12345",            # ตัวเลขนอกช่วง serial
+    "ไม่ระบุ",
+    "",
+])
+def test_invalid_values_are_nat(value):
+    parsed, name = parse_one(value)
+    assert pd.isna(parsed)
+    assert name == "unparsed"
+
+
+def test_two_digit_year_pivot():
+    # ปี 2 หลักไม่เกินปีปัจจุบัน + TWO_DIGIT_AHEAD
+    pivot = dt.date.today().year + TWO_DIGIT_AHEAD
+    inside = f"01/06/{pivot % 100:02d}"
+    outside = f"01/06/{(pivot + 1) % 100:02d}"
+    assert parse_one(inside)[0].year == pivot
+    assert parse_one(outside)[0].year == pivot + 1 - 100
+
+
+def test_broadcast_and_report():
+    values = pd.Series(["15/01/2567", None, "15/01/2567", 45306, "x", np.nan] * 2, dtype=object)
+    parsed, report = parse_dates(values)
+    assert parsed.index.equals(values.index)
+    assert (parsed.dropna() == pd.Timestamp("2024-01-15")).all()
+    counts = dict(zip(report["รูปแบบ"], report["จำนวนแถว"]))
+    assert counts == {"excel_serial": 2, "dd/mm/yyyy": 4, "unparsed": 6}
+
+
+def test_datetime_column_passes_through():
+    values = pd.Series(pd.to_datetime(["2024-01-15", None]))
+    parsed, report = parse_dates(values)
+    assert parsed is values
+    assert report["จำนวนแถว"].tolist() == [1, 1]
@@ -0,0 +1,97 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from defect_alias import DefectAliases, canonicalize_defects, defect_key
+
+
+@pytest.fixture
+def aliases(tmp_path):
+    return DefectAliases(str(tmp_path / "aliases.sqlite"))
+
+
+def test_defect_key():
+    # การันต์ เว้นวรรค zero-width และเครื่องหมายไม่มีผล นิคหิต + สระอา = สระอำ
+    assert defect_key("คาร์เลนเดอร์") == defect_key("คาเลนเดอร์")
+    assert defect_key(" รอย​ยับ - ขอบ ") == defect_key("รอยยับขอบ")
+    assert defect_key("ทํา") == defect_key("ทำ")
+    assert defect_key("CARLENDER") == defect_key("carlender")
+    # วรรณยุกต์คงไว้ (เปลี่ยนความหมายได้)
+    assert defect_key("ข่าว") != defect_key("ขาว")
+
+
+def test_near_duplicate_thai_strings(aliases):
+    values = [
+        "รอยยับที่ขอบม้วน", "รอยยับที่ขอบม้วน ", "รอยยับ ที่ขอบม้วน", "รอยยับที่ขอบม้วนด้านใน",
+        "คาร์เลนเดอร์เป็นคลื่น", "คาเลนเดอร์เป็นคลื่น", "ม้วนหลวม", "ขอบแตก",
+    ]
+    counts = [10, 1, 2, 3, 5, 1, 4, 4]
+    resolved = dict(zip(values, aliases.resolve("roll", values, counts)))
+    for value in values[:4]:
+        assert resolved[value] == "รอยยับที่ขอบม้วน"
+    assert resolved["คาเลนเดอร์เป็นคลื่น"] == "คาร์เลนเดอร์เป็นคลื่น"
+    assert resolved["ม้วนหลวม"] == "ม้วนหลวม"
+    assert resolved["ขอบแตก"] == "ขอบแตก"
+
+
+def test_tone_marks_and_numbers_stay_apart(aliases):
+    values = ["ขาว", "ข่าว", "ม้วนที่ 1 ยับ", "ม้วนที่ 2 ยับ"]
+    assert aliases.resolve("roll", values) == values
+
+
+def test_no_chaining_through_intermediate(aliases):
+    # Jaccard ของ 3-gram: A~B = 0.75, B~C = 0.65, A~C = 0.47 (ต่ำกว่า SIMILARITY)
+    a, b, c = "abcdefghijklmnop", "abcdefghijklmnqr", "abcdefghijkzmnqr"
+    # A พบบ่อยสุดเป็นตัวแทน: B เข้ากลุ่ม A แต่ C ไม่คล้าย A จึงเป็นกลุ่มใหม่
+    assert aliases.resolve("roll", [a, b, c], [3, 2, 1]) == [a, a, c]
+
+
+def test_resolve_is_read_only_until_learn(aliases):
+    values = ["รอยยับที่ขอบม้วน", "รอยยับที่ขอบม้วนด้านใน", "ขอบแตก"]
+    first = aliases.resolve("roll", values, [5, 1, 3])
+    assert aliases.table("roll").empty
+    assert aliases.resolve("roll", values, [5, 1, 3], learn=True) == first
+    assert len(aliases.table("roll")) == 3
+    # ชื่อที่บันทึกแล้วคงที่ แม้ไฟล์ถัดไปจะมีรูปแบบอื่นมากกว่า
+    assert aliases.resolve("roll", values, [1, 50, 1]) == first
+
+
+def test_manual_canonical(aliases):
+    aliases.resolve("roll", ["ขอบแตก"], learn=True)
+    digest = aliases.digest()
+    key = aliases.table("roll")["key"].iloc[0]
+    aliases.set_canonical("roll", {key: "ขอบม้วนแตก"})
+    assert aliases.resolve("roll", ["ขอบ แตก"]) == ["ขอบม้วนแตก"]
+    assert aliases.digest() != digest
+
+
+def test_canonicalize_defects(aliases):
+    df = pd.DataFrame({"Defect": ["รอยยับที่ขอบม้วน", "รอยยับที่ขอบม้วน ", None, "ขอบแตก"]})
+    out = canonicalize_defects(df.copy(), "roll", aliases=aliases)
+    assert out["Defect"].tolist()[:2] == ["รอยยับที่ขอบม้วน"] * 2
+    assert pd.isna(out["Defect"].iloc[2])
+    assert out["DefectRaw"].tolist()[1] == "รอยยับที่ขอบม้วน "
+    assert aliases.table("roll").empty
+
+    # ไม่มี alias map: ทำความสะอาดข้อความอย่างเดียว
+    plain = canonicalize_defects(df.copy(), "roll")
+    assert plain["Defect"].tolist()[:2] == ["รอยยับที่ขอบม้วน"] * 2
+
+
+def test_old_key_format_is_rekeyed(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with closing(sqlite3.connect(path)) as con, con:
+        con.execute(
+            "CREATE TABLE defect_alias (kind TEXT, key TEXT, alias TEXT, canonical TEXT, "
+            "manual INTEGER DEFAULT 0, PRIMARY KEY (kind, key))"
+        )
+        # key เดิมตัดวรรณยุกต์
+        con.executemany("INSERT INTO defect_alias VALUES (?, ?, ?, ?, ?)", [
+            ("roll", "แผนฉีก", "แผ่นฉีก", "แผ่นฉีก", 0),
+            ("roll", "มวนหลวม", "ม้วนหลวม", "ม้วนไม่แน่น", 1),
+        ])
+    aliases = DefectAliases(path)
+    assert set(aliases.table("roll")["key"]) == {"แผ่นฉีก", "ม้วนหลวม"}
+    assert aliases.resolve("roll", ["ม้วนหลวม", "แผ่นฉีก"]) == ["ม้วนไม่แน่น", "แผ่นฉีก"]
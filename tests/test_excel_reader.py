@@ -0,0 +1,102 @@
+import datetime as dt
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import excel_reader
+from analysis import columns_roll, rename_map_roll
+from excel_reader import read_headers, read_projected_excel, resolve_columns
+from synth_claims import write_workbook
+
+
+def reference(path, rename_map, columns):
+    # openpyxl อ่านทั้งชีตแล้วเลือกคอลัมน์ (วิธีเดิม)
+    df = pd.read_excel(path, dtype=object)
+    df = df.rename(columns={c: rename_map.get(c, c) for c in df.columns})
+    return df[[c for c in columns if c in df.columns]]
+
+
+def assert_same_values(fast, slow):
+    assert list(fast.columns) == list(slow.columns)
+    assert len(fast) == len(slow)
+    for col in fast.columns:
+        a = pd.to_numeric(fast[col], errors="coerce") if fast[col].dtype.kind == "f" else fast[col]
+        b = pd.to_numeric(slow[col], errors="coerce") if fast[col].dtype.kind == "f" else slow[col]
+        pd.testing.assert_series_equal(
+            a.astype(object).where(a.notna(), None).reset_index(drop=True),
+            b.astype(object).where(b.notna(), None).reset_index(drop=True),
+            check_names=False,
+        )
+
+
+def strip_row_refs(path, out):
+    # ลบแอตทริบิวต์ r ของ <row> (ไฟล์จากโปรแกรมอื่นบางตัวไม่ใส่ r)
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(out, "w") as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename.startswith("xl/worksheets/sheet"):
+                data = re.sub(rb'(<row\b[^>]*?) r="\d+"', rb"\1", data)
+            dst.writestr(item, data)
+    return out
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    return write_workbook(str(tmp_path / "roll.xlsx"), "roll", 500, seed=9)
+
+
+def test_matches_full_read(workbook):
+    fast = read_projected_excel(workbook, rename_map_roll, columns_roll)
+    assert_same_values(fast, reference(workbook, rename_map_roll, columns_roll))
+
+
+def test_iter_rows_fallback_matches_scan(workbook, monkeypatch):
+    fast = read_projected_excel(workbook, rename_map_roll, columns_roll)
+    monkeypatch.setattr(excel_reader, "_can_scan", lambda ws: False)
+    pd.testing.assert_frame_equal(read_projected_excel(workbook, rename_map_roll, columns_roll), fast)
+
+
+def test_rows_without_r_attributes(workbook, tmp_path):
+    stripped = strip_row_refs(workbook, str(tmp_path / "no_refs.xlsx"))
+    with zipfile.ZipFile(stripped) as z:
+        assert b'<row r="' not in z.read("xl/worksheets/sheet1.xml")
+    pd.testing.assert_frame_equal(
+        read_projected_excel(stripped, rename_map_roll, columns_roll),
+        read_projected_excel(workbook, rename_map_roll, columns_roll),
+    )
+
+
+def test_iso_date_cells(tmp_path):
+    wb = Workbook()
+    wb.iso_dates = True  # เขียนวันที่เป็น <c t="d"><v>2024-01-15T08:30:00</v></c>
+    ws = wb.active
+    ws.append(["SUP", "วันที่ออก", "สิ่งที่ไม่เป็นไปตามข้อกำหนด"])
+    ws.append(["A", dt.datetime(2024, 1, 15, 8, 30), "ยับ"])
+    ws.append(["B", dt.datetime(2023, 12, 31), "ขอบแตก"])
+    path = str(tmp_path / "iso.xlsx")
+    wb.save(path)
+    with zipfile.ZipFile(path) as z:
+        assert b't="d"' in z.read("xl/worksheets/sheet1.xml")
+
+    df = read_projected_excel(path, rename_map_roll, ["SUP", "Date", "Defect"])
+    assert df["Date"].tolist() == [dt.datetime(2024, 1, 15, 8, 30), dt.datetime(2023, 12, 31)]
+
+
+def test_header_aliases_and_blank_rows(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["หมายเหตุ", " Supplier ", "ข้อบกพร่อง", "SUP", "น้ำหนัก"])
+    ws.append(["x", "A", "ยับ", "ซ้ำ", "10.5"])
+    ws.append([None, None, None, None, None])
+    ws.append(["y", "B", "ขอบแตก", "ซ้ำ", "n/a"])
+    path = str(tmp_path / "alias.xlsx")
+    wb.save(path)
+
+    # ชื่อ alias แรกที่พบชนะ คอลัมน์ที่ไม่ได้ขอไม่ถูกอ่าน
+    assert resolve_columns(read_headers(path)["Sheet"], rename_map_roll, ["SUP", "Defect"]) == {"SUP": 1, "Defect": 2}
+    df = read_projected_excel(path, rename_map_roll, ["SUP", "Defect", "Weight"])
+    assert df["SUP"].tolist() == ["A", "B"]
+    assert df["Weight"].iloc[0] == 10.5 and pd.isna(df["Weight"].iloc[1])
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from excel_writer import XlsxStreamWriter
+
+
+def read_back(path):
+    wb = openpyxl.load_workbook(path)
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+
+def test_round_trip_values(tmp_path):
+    df = pd.DataFrame({
+        "SUP": pd.Categorical(["A", "B", "A", None]),
+        "Defect": ["รอยยับ", "a & b < c > d", "bell\x07", None],
+        "Count": [1, 2, 3, 4],
+        "Nullable": pd.array([1, None, 3, 4], dtype="Int64"),
+        "Weight": [1.5, np.nan, np.inf, -2.25e-7],
+        "Flag": [True, False, True, False],
+        "Date": pd.to_datetime(["2024-01-05", "2024-02-29 13:45:00", None, "2023-12-31"], format="ISO8601"),
+    })
+    path = tmp_path / "out.xlsx"
+    with XlsxStreamWriter(str(path)) as w:
+        w.write_frame("claims", df, chunk_rows=3)
+    rows = read_back(path)["claims"]
+    assert rows[0] == list(df.columns)
+    assert rows[1:] == [
+        ["A", "รอยยับ", 1, 1, 1.5, True, "2024-01-05"],
+        ["B", "a & b < c > d", 2, None, None, False, "2024-02-29 13:45:00"],
+        ["A", "bell", 3, 3, None, True, None],
+        [None, None, 4, 4, -2.25e-7, False, "2023-12-31"],
+    ]
+
+
+def test_header_is_bold_and_body_is_not(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with XlsxStreamWriter(str(path)) as w:
+        w.write_frame("s", pd.DataFrame({"x": [1]}))
+    ws = openpyxl.load_workbook(path).active
+    assert ws["A1"].font.b and not ws["A2"].font.b
+
+
+def test_multiple_sheets_and_chunking(tmp_path):
+    rng = np.random.default_rng(0)
+    big = pd.DataFrame({"n": np.arange(1000), "v": rng.normal(size=1000).round(6)})
+    path = tmp_path / "out.xlsx"
+    with XlsxStreamWriter(str(path)) as w:
+        w.write_frame("สรุป <1>", pd.DataFrame({"k": ["a"], "v": [1]}))
+        w.write_frame("data", big, chunk_rows=128)
+        w.write_frame("empty", big.iloc[:0])
+        w.write_frame("no columns", pd.DataFrame(index=range(3)))
+    sheets = read_back(path)
+    assert list(sheets) == ["สรุป <1>", "data", "empty", "no columns"]
+    assert sheets["data"][1:] == big.values.tolist()
+    assert sheets["empty"] == [["n", "v"]]
+    assert sheets["no columns"] == []
+
+
+def test_matches_pandas_openpyxl_writer(tmp_path):
+    df = pd.DataFrame({
+        "SUP": ["S1", "S2", "S3"],
+        "Count": [10, 20, 30],
+        "Share": [0.25, 0.5, 0.25],
+    })
+    ours, theirs = tmp_path / "ours.xlsx", tmp_path / "theirs.xlsx"
+    with XlsxStreamWriter(str(ours)) as w:
+        w.write_frame("s", df)
+    df.to_excel(theirs, sheet_name="s", index=False, engine="openpyxl")
+    pd.testing.assert_frame_equal(pd.read_excel(ours, sheet_name=None)["s"], pd.read_excel(theirs, sheet_name=None)["s"])
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import (
+    DEFAULT_STRATEGIC_ADVICE,
+    STRATEGIC_ADVICE,
+    executive_summary,
+    executive_summary_sections,
+    watchlist_above_mean,
+)
+
+COUNT = "จำนวนเคส"
+
+
+def baseline_advice(kind, sup, defect, count):
+    # strategic_advice เดิม (format ทีละแถว)
+    template = next(
+        (text for word, text in STRATEGIC_ADVICE.get(kind, []) if word in str(defect)),
+        DEFAULT_STRATEGIC_ADVICE,
+    )
+    return template.format(sup=sup, defect=defect, count=count)
+
+
+def baseline_summary(watchlist, kind):
+    return [baseline_advice(kind, s, d, c) for s, d, c in zip(watchlist["SUP"], watchlist["Defect"], watchlist[COUNT])]
+
+
+@pytest.fixture(scope="module")
+def sup_defect():
+    rng = np.random.default_rng(24)
+    n = 3000
+    defects = ["ขอบแตก", "คราบน้ำมัน", "รอยยับ", "แผ่นยับมุม", "จุดดำ", "ขอบยับ", "Carlender"]
+    df = pd.DataFrame({
+        "SUP": pd.Categorical(rng.choice([f"SUP{i:03d}" for i in range(60)], n)),
+        "Defect": pd.Categorical(rng.choice(defects, n)),
+    })
+    return df.groupby(["SUP", "Defect"], observed=True).size().reset_index(name=COUNT)
+
+
+@pytest.mark.parametrize("kind", ["roll", "sheet", "other"])
+def test_matches_per_row_format(sup_defect, kind):
+    watchlist = watchlist_above_mean(sup_defect)
+    assert executive_summary(watchlist, kind) == baseline_summary(watchlist, kind)
+
+
+def test_object_columns_and_missing_defect():
+    watchlist = pd.DataFrame({
+        "SUP": ["A", "B", "C", "D"],
+        "Defect": ["ขอบแตก", np.nan, "คราบ", "ยับ"],
+        COUNT: [5, 3, 2, 1],
+    }, index=[10, 3, 7, 1])
+    assert executive_summary(watchlist, "roll") == baseline_summary(watchlist, "roll")
+    assert executive_summary(watchlist.iloc[:0], "roll") == []
+
+
+def test_sections_rank_sups_and_limit_rows(sup_defect):
+    watchlist = watchlist_above_mean(sup_defect)
+    sections = executive_summary_sections(watchlist, "roll", top_sups=5, top_per_sup=2)
+
+    totals = watchlist.groupby("SUP", observed=True)[COUNT].agg(["sum", "size"])
+    expected = totals.sort_values("sum", ascending=False, kind="stable").head(5)
+    assert [s["sup"] for s in sections] == list(expected.index)
+    for section in sections:
+        rows = watchlist[watchlist["SUP"] == section["sup"]].sort_values(COUNT, ascending=False, kind="stable")
+        assert section["count"] == rows[COUNT].sum()
+        assert section["rows"] == len(rows)
+        assert section["advice"] == baseline_summary(rows.head(2), "roll")
+        assert section["hidden"] == len(rows) - len(section["advice"])
+
+
+def test_sections_cover_everything_when_small(sup_defect):
+    watchlist = watchlist_above_mean(sup_defect)
+    sections = executive_summary_sections(watchlist, "sheet", top_sups=1000, top_per_sup=1000)
+    assert sum(s["rows"] for s in sections) == len(watchlist)
+    assert all(s["hidden"] == 0 for s in sections)
+    assert sorted(a for s in sections for a in s["advice"]) == sorted(baseline_summary(watchlist, "sheet"))
+    assert executive_summary_sections(watchlist.iloc[:0], "sheet") == []
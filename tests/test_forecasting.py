@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecasting import COUNT_COLUMN, FORECAST_COLUMN, build_series_matrix, forecast_next_month, holt_fit_batch
+
+
+def synthetic_monthly(seed, n_series=40, n_months=24):
+    # series Poisson ที่มีระดับ/แนวโน้มต่างกัน ความยาว 6..24 เดือน (ชิดเดือนล่าสุด)
+    rng = np.random.default_rng(seed)
+    months = pd.period_range("2022-01", periods=n_months, freq="M").strftime("%Y-%m")
+    rows = []
+    for s in range(n_series):
+        length = int(rng.integers(6, n_months + 1))
+        base = rng.uniform(2, 30)
+        slope = rng.uniform(-0.5, 0.8)
+        for t in range(length):
+            rows.append({
+                "MonthKey": months[n_months - length + t],
+                "SUP": f"S{s % 5}",
+                "Defect": f"D{s:02d}",
+                COUNT_COLUMN: int(rng.poisson(max(base + slope * t, 0.1))),
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_numpy_holt_agrees_with_statsmodels(seed):
+    holtwinters = pytest.importorskip("statsmodels.tsa.holtwinters")
+    monthly = synthetic_monthly(seed)
+    fast = forecast_next_month(monthly)
+    slow = forecast_next_month(monthly, method="statsmodels")
+    pd.testing.assert_frame_equal(fast[["SUP", "Defect"]], slow[["SUP", "Defect"]])
+
+    # ค่าพยากรณ์ (ตัดทศนิยม) ตรงกันเกือบทุก series
+    diff = (fast[FORECAST_COLUMN] - slow[FORECAST_COLUMN]).abs().to_numpy()
+    assert (diff == 0).mean() >= 0.8
+
+    # series ที่ต่างกัน: optimizer ของ statsmodels ติด local minimum หรือต่างกันแค่ตอนตัดทศนิยม
+    # grid + pattern search ของ NumPy ต้องได้ SSE ไม่แย่กว่า statsmodels ทุก series
+    # และที่ต่างกันเกิน 1 เคสต้องเป็นเพราะ NumPy หา SSE ที่ต่ำกว่าชัดเจน
+    _, Y, lengths, _ = build_series_matrix(monthly)
+    fit = holt_fit_batch(Y, lengths)
+    for i in range(len(Y)):
+        reference = holtwinters.ExponentialSmoothing(pd.Series(Y[i, : lengths[i]]), trend="add").fit()
+        assert fit["sse"][i] <= reference.sse * (1 + 1e-3) + 1e-6
+        if diff[i] > 1:
+            assert fit["sse"][i] < reference.sse * 0.99
+
+
+def test_linear_series_forecast_is_exact():
+    Y = np.array([[3.0 + 2 * t for t in range(10)]])
+    fit = holt_fit_batch(Y, np.array([10]))
+    assert fit["sse"][0] == pytest.approx(0, abs=1e-6)
+    assert fit["forecast"][0] == pytest.approx(23, abs=1e-6)
+
+
+def test_short_series_are_skipped():
+    monthly = pd.DataFrame({
+        "MonthKey": ["2024-01", "2024-02", "2024-01", "2024-02", "2024-03"],
+        "SUP": ["A", "A", "B", "B", "B"],
+        "Defect": "D",
+        COUNT_COLUMN: [1, 2, 1, 2, 3],
+    })
+    assert forecast_next_month(monthly)["SUP"].tolist() == ["B"]
+    assert forecast_next_month(monthly, min_months=4).empty
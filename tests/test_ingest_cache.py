@@ -0,0 +1,54 @@
+import io
+
+import pandas as pd
+import pytest
+
+from ingest_cache import IngestCache, cache_key, file_digest, get_date_report, load_claims, load_workbook_claims
+from synth_claims import write_workbook
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    return write_workbook(str(tmp_path / "roll.xlsx"), "roll", 300, seed=5)
+
+
+def test_file_digest_same_for_path_bytes_and_stream(workbook):
+    with open(workbook, "rb") as f:
+        data = f.read()
+    digest = file_digest(workbook)
+    assert file_digest(data) == digest
+    assert file_digest(io.BytesIO(data)) == digest
+
+
+def test_cache_key_depends_on_kind_and_sheet():
+    keys = {cache_key("abc", "roll"), cache_key("abc", "sheet"), cache_key("abc", "roll", "Sheet2")}
+    assert len(keys) == 3
+
+
+def test_memory_then_disk_hits(workbook, tmp_path):
+    cache = IngestCache(cache_dir=str(tmp_path / "cache"))
+    first = load_claims(workbook, "roll", cache=cache)
+    assert cache.stats["misses"] == 1
+    pd.testing.assert_frame_equal(load_claims(workbook, "roll", cache=cache), first)
+    assert cache.stats["memory_hits"] == 1
+
+    # process ใหม่ (แคชหน่วยความจำว่าง) อ่านจากดิสก์ ไม่อ่าน Excel ซ้ำ
+    fresh = IngestCache(cache_dir=str(tmp_path / "cache"))
+    pd.testing.assert_frame_equal(load_claims(workbook, "roll", cache=fresh), first, check_categorical=False)
+    assert fresh.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
+
+
+def test_date_report_survives_disk_cache(workbook, tmp_path):
+    cache = IngestCache(cache_dir=str(tmp_path / "cache"), max_bytes=0)
+    report = get_date_report(workbook, "roll", cache=cache)
+    assert report["จำนวนแถว"].sum() == 300
+    assert cache.stats["misses"] == 1
+
+    # รายงานมาจากแคชรูปแบบวันที่ ไม่ต้องโหลด DataFrame ทั้งไฟล์
+    fresh = IngestCache(cache_dir=str(tmp_path / "cache"), max_bytes=0)
+    pd.testing.assert_frame_equal(get_date_report(workbook, "roll", cache=fresh), report)
+    assert fresh.stats == {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    counts = dict(zip(report["รูปแบบ"], report["จำนวนแถว"]))
+    parsed = load_workbook_claims(workbook, "roll", cache=fresh)["Date"]
+    assert counts["unparsed"] == parsed.isna().sum()
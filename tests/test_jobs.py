@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from jobs import JobPool, frame_digest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_inline_job_is_registered_before_it_runs():
+    pool = JobPool(workers=0)
+    seen = {}
+
+    def work(x):
+        # job อยู่ใน pool แล้วระหว่างรัน และไม่ได้รันขณะถือ lock ของ pool
+        job = pool.get("k")
+        seen["status"] = job.status
+        seen["locked"] = pool._lock.locked()
+        return x * 2
+
+    job = pool.submit("k", work, 21)
+    assert job.status == "done" and job.result() == 42
+    assert seen == {"status": "running", "locked": False}
+
+
+def test_same_key_returns_same_job_until_error():
+    pool = JobPool(workers=0)
+    calls = []
+
+    def work():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return len(calls)
+
+    failed = pool.submit("k", work)
+    assert failed.status == "error"
+    with pytest.raises(ValueError):
+        failed.result()
+    # job ที่ error ถูกส่งใหม่ ส่วน job ที่สำเร็จแล้วใช้ผลเดิม
+    retried = pool.submit("k", work)
+    assert retried is not failed and retried.result() == 2
+    assert pool.submit("k", work) is retried
+    assert len(calls) == 2
+
+
+def test_concurrent_submit_runs_once():
+    pool = JobPool(workers=0)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "ok"
+
+    first = []
+    thread = threading.Thread(target=lambda: first.append(pool.submit("k", work)))
+    thread.start()
+    started.wait(5)
+    # session อื่นส่ง key เดียวกันระหว่างที่ job แรกรันอยู่: ได้ job เดิมทันที (ไม่รอ lock)
+    second = pool.submit("k", work)
+    assert second.status == "running"
+    release.set()
+    thread.join(5)
+    assert first[0] is second and second.result() == "ok"
+    assert len(calls) == 1
+
+
+def test_frame_digest_tracks_content():
+    df = pd.DataFrame({"SUP": ["A", "B"], "Count": [1, 2]})
+    assert frame_digest(df) == frame_digest(df.copy())
+    assert frame_digest(df) != frame_digest(df.assign(Count=[1, 3]))
+    assert frame_digest(df) != frame_digest(df.rename(columns={"Count": "n"}))
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="ใช้ forkserver")
+def test_pool_workers_do_not_rerun_main_script(tmp_path):
+    # สคริปต์ที่ทำงานตอน import (แบบหน้า Streamlit): ถ้า worker โหลด __main__ ซ้ำจะออกด้วย code 3
+    script = tmp_path / "page.py"
+    marker = tmp_path / "imported"
+    script.write_text(textwrap.dedent(f"""
+        import os
+        import sys
+
+        sys.path.insert(0, {ROOT!r})
+        if os.environ.get("PAGE_RUNNING"):
+            open({str(marker)!r}, "a").write("worker\\n")
+            sys.exit(3)
+        os.environ["PAGE_RUNNING"] = "1"
+
+        import pandas as pd
+
+        from jobs import TASKS_PER_WORKER, JobPool, frame_digest
+
+        pool = JobPool(workers=2)
+        frames = [pd.DataFrame({{"x": range(i)}}) for i in range(TASKS_PER_WORKER * 2 + 3)]
+        jobs = [pool.submit(f"k{{i}}", frame_digest, df) for i, df in enumerate(frames)]
+        assert [j.result() for j in jobs] == [frame_digest(df) for df in frames]
+        assert {{j.status for j in jobs}} == {{"done"}}
+        print("ok")
+    """))
+    out = subprocess.run([sys.executable, str(script)], cwd=str(tmp_path), capture_output=True, text=True,
+                         timeout=240)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == "ok"
+    assert not marker.exists()
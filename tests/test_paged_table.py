@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paged_table import query_page
+
+
+@pytest.fixture(scope="module")
+def table():
+    rng = np.random.default_rng(0)
+    n = 5000
+    count = rng.integers(0, 30, n).astype(float)
+    count[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "SUP": pd.Categorical(rng.choice([f"SUP{i:02d}" for i in range(40)], n)),
+        "Defect": pd.Categorical(rng.choice(["รอยยับ", "ขอบแตก", "Carlender", "จุดดำ", "ม้วนหย่อน"], n)),
+        "Count": count,
+        "Weight": rng.normal(800, 60, n).round(1),
+    })
+
+
+def reference(df, search="", filters=None, sort_by=None, ascending=True, page=1, page_size=50):
+    # กรองทุกแถวด้วย str.contains แล้วเรียงทั้งตาราง (วิธีตรงไปตรงมา)
+    mask = pd.Series(True, index=df.index)
+    for col, selected in (filters or {}).items():
+        if selected:
+            mask &= df[col].isin(selected)
+    if search:
+        text_cols = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        hit = pd.Series(False, index=df.index)
+        for col in text_cols:
+            hit |= df[col].astype(str).str.contains(search, case=False, regex=False)
+        mask &= hit
+    data = df[mask]
+    if sort_by:
+        data = data.sort_values(sort_by, ascending=ascending, kind="stable")
+    start = (page - 1) * page_size
+    return data.iloc[start:start + page_size], len(data)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"page": 3},
+    {"search": "sup0"},
+    {"search": "carl", "page": 2},
+    {"filters": {"SUP": ["SUP01", "SUP02"]}},
+    {"filters": {"Defect": ["รอยยับ"]}, "search": "sup1"},
+    {"sort_by": "Count", "ascending": False},
+    {"sort_by": "Count", "page": 4},
+    {"sort_by": "Weight", "ascending": False, "page": 90},
+    {"sort_by": "Count", "page": 100},
+    {"sort_by": "SUP", "page": 2},
+    {"search": "ไม่มีค่านี้"},
+])
+def test_matches_reference(table, kwargs):
+    page, total = query_page(table, **kwargs)
+    expected, expected_total = reference(table, **kwargs)
+    assert total == expected_total
+    pd.testing.assert_frame_equal(page, expected)
+
+
+def test_page_past_end_is_empty(table):
+    page, total = query_page(table, page=1000)
+    assert page.empty and total == len(table)
+
+
+def test_sparse_sort_column_keeps_missing_rows(table):
+    # คอลัมน์ที่ค่าว่างเกือบทั้งหมด: หน้าแรกต้องมีแถวค่าว่างต่อท้ายเหมือนการเรียงทั้งตาราง
+    sparse = table.assign(Count=np.where(np.arange(len(table)) < 20, table["Count"].fillna(0), np.nan))
+    page, _ = query_page(sparse, sort_by="Count")
+    expected, _ = reference(sparse, sort_by="Count")
+    assert len(page) == 50
+    pd.testing.assert_frame_equal(page, expected)
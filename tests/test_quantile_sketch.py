@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from quantile_sketch import KLLSketch, max_rank_error, merge_sketches, rank_error, sketch_iqr_outliers
+
+N = 50_000
+
+
+def distributions():
+    rng = np.random.default_rng(7)
+    return {
+        "normal": rng.normal(150, 8, N),
+        "lognormal": rng.lognormal(6, 1, N),
+        "duplicates": rng.integers(0, 20, N).astype(float),
+        "bimodal": np.concatenate([rng.normal(0, 1, N // 2), rng.normal(50, 5, N // 2)]),
+        "sorted": np.arange(N, dtype=float),
+    }
+
+
+@pytest.mark.parametrize("name", list(distributions()))
+@pytest.mark.parametrize("k", [100, 200])
+def test_rank_error_within_bound(name, k):
+    values = distributions()[name]
+    sketch = KLLSketch(k, seed=0).update(values)
+    assert sketch.n == N
+    assert max_rank_error(sketch, values) <= sketch.rank_error() == rank_error(k)
+    # ขนาดไม่ขึ้นกับจำนวนแถว
+    assert sketch.size() < 10 * k
+
+
+def test_merged_chunks_within_bound():
+    values = distributions()["lognormal"]
+    chunks = np.array_split(values, 37)
+    merged = merge_sketches(KLLSketch(seed=i).update(chunk) for i, chunk in enumerate(chunks))
+    assert merged.n == N
+    assert merged.min == values.min() and merged.max == values.max()
+    assert max_rank_error(merged, values) <= merged.rank_error()
+
+
+def test_small_input_is_exact():
+    values = np.random.default_rng(1).normal(size=150)
+    sketch = KLLSketch(seed=0).update(values)
+    assert max_rank_error(sketch, values) == 0
+
+
+def test_bytes_roundtrip():
+    sketch = KLLSketch(seed=0).update(distributions()["normal"])
+    restored = KLLSketch.from_bytes(sketch.to_bytes())
+    qs = [0.01, 0.25, 0.5, 0.75, 0.99]
+    assert restored.n == sketch.n and restored.k == sketch.k
+    assert np.array_equal(restored.quantile(qs), sketch.quantile(qs))
+
+
+def test_skips_missing_and_text():
+    sketch = KLLSketch(seed=0).update(np.array([1.0, np.nan, 3.0], dtype=object))
+    sketch.update(["2", "ไม่ระบุ", None])
+    assert sketch.n == 3
+    assert sketch.quantile(0.5) == 2.0
+
+
+def test_iqr_outliers_close_to_exact():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.normal(150, 8, N), [400.0] * 50, [-100.0] * 30])
+    outliers, (low, high) = sketch_iqr_outliers(KLLSketch(seed=0).update(values))
+    q1, q3 = np.percentile(values, [25, 75])
+    exact = int(((values < q1 - 1.5 * (q3 - q1)) | (values > q3 + 1.5 * (q3 - q1))).sum())
+    assert low < 150 < high
+    assert abs(outliers - exact) <= 0.01 * N
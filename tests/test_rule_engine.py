@@ -0,0 +1,59 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rule_engine import DEFAULT_VALUES, RULES_PATH, apply_rules, load_rules
+from synth_claims import DEFECTS
+
+SAMPLES = DEFECTS + [
+    "CARLENDER", "calender mark", "ยับ และ สันนูน", "สันนูน และ ยับ", "ม้วนหย่อนมาก", "จุดดำ\nรอยเส้น",
+    "", " ", "ไม่มีกฎ", None, np.nan,
+]
+
+
+def baseline(rules, text, default):
+    # วิธีเดิมในหน้าเว็บ: re.search ทีละแถว ทีละกฎ กฎแรกที่ match ชนะ
+    for pattern, value in rules:
+        if re.search(pattern, str(text), flags=re.IGNORECASE):
+            return value
+    return default
+
+
+def expected(path, kind, values):
+    rules = load_rules(path)
+    out = {}
+    for target in ["RootCause", "Advice"]:
+        ruleset = rules.get((kind, target))
+        pairs = ruleset.rules if ruleset else []
+        default = ruleset.default if ruleset else DEFAULT_VALUES[target]
+        out[target] = [baseline(pairs, v, default) for v in values]
+    return out
+
+
+@pytest.mark.parametrize("kind", ["roll", "sheet"])
+def test_rules_match_per_row_regex(kind):
+    values = SAMPLES * 3
+    df = apply_rules(pd.DataFrame({"Defect": values}), kind)
+    want = expected(RULES_PATH, kind, values)
+    assert df["RootCause"].tolist() == want["RootCause"]
+    assert df["Advice"].tolist() == want["Advice"]
+
+
+def test_rule_order_anchors_and_categorical(tmp_path):
+    path = tmp_path / "rules.csv"
+    path.write_text(
+        "kind,target,pattern,value\n"
+        "roll,RootCause,^ขอบ,ขึ้นต้นด้วยขอบ\n"
+        "roll,RootCause,แตก$,ลงท้ายด้วยแตก\n"
+        "roll,RootCause,ab|ยับ,ab หรือ ยับ\n"
+        "roll,RootCause,,อื่น ๆ\n",
+        encoding="utf-8",
+    )
+    values = ["ขอบแตก", "รอยแตก", "แตกขอบ", "AB", "xAbx", "รอยยับ", "ขอบ", "แตก\n", "อื่น", None]
+    df = apply_rules(pd.DataFrame({"Defect": pd.Categorical(values)}), "roll", path=str(path))
+    want = expected(str(path), "roll", values)
+    assert df["RootCause"].tolist() == want["RootCause"]
+    # ไม่มีกฎ Advice ของ roll ในไฟล์นี้ ใช้ค่า default
+    assert set(df["Advice"]) == {DEFAULT_VALUES["Advice"]}
@@ -0,0 +1,40 @@
+import datetime as dt
+
+import pandas as pd
+
+from date_parser import parse_dates
+from excel_reader import read_headers
+from synth_claims import ROLL_HEADER, SHEET_HEADER, generate_rows, write_workbook
+
+
+def test_rows_are_deterministic_per_seed():
+    assert list(generate_rows("roll", 200, seed=4)) == list(generate_rows("roll", 200, seed=4))
+    assert list(generate_rows("roll", 200, seed=4)) != list(generate_rows("roll", 200, seed=5))
+
+
+def test_row_width_matches_header():
+    for kind, header in [("roll", ROLL_HEADER), ("sheet", SHEET_HEADER)]:
+        assert all(len(row) == len(header) for row in generate_rows(kind, 100, seed=0))
+
+
+def test_messy_dates_parse_except_blanks():
+    # ทุกรูปแบบที่ตัวสร้างใส่ (datetime, dd/mm/yyyy, ISO, พ.ศ., serial) ต้องแปลงได้ เหลือแค่ค่าว่าง/"-"
+    dates = pd.Series([row[4] for row in generate_rows("roll", 2000, seed=1)], dtype=object)
+    parsed, _ = parse_dates(dates)
+    blank = dates.isna() | (dates == "-")
+    assert parsed[~blank].notna().all()
+    assert parsed[blank].isna().all()
+    assert parsed.dropna().between(pd.Timestamp(2022, 1, 1), pd.Timestamp(2025, 1, 1)).all()
+
+
+def test_workbook_roundtrip(tmp_path):
+    path = write_workbook(str(tmp_path / "sheet.xlsx"), "sheet", 300, seed=2)
+    assert read_headers(path) == {"Sheet1": SHEET_HEADER}
+    df = pd.read_excel(path)
+    assert len(df) == 300
+    # MONTH/QUARTER/YEAR มีเฉพาะแถวที่วันที่เป็น datetime
+    has_month = df["MONTH"].notna()
+    assert has_month.any()
+    dates = df.loc[has_month, "วันที่รับของ"]
+    assert dates.map(lambda d: isinstance(d, dt.datetime)).all()
+    assert (dates.map(lambda d: d.month) == df.loc[has_month, "MONTH"]).all()
@@ -0,0 +1,61 @@
+import importlib
+import os
+import threading
+import time
+
+# -----------------------------
+# Pre-warm หลังเซิร์ฟเวอร์เริ่มทำงาน
+# -----------------------------
+# module หนัก (plotly.express, openpyxl, pyarrow) ถูก import ตอนใช้จริงเท่านั้น หน้าแรกจึงตอบเร็ว
+# start_prewarm() เรียกจาก app.py และทุกหน้า (เริ่มครั้งเดียวต่อ process) จะ import module เหล่านี้
+# ใน background thread แล้วสั่งให้ process pool สร้าง worker ล่วงหน้า
+# ผู้ใช้คนแรกหลัง restart จึงไม่ต้องรอ import / spawn worker กลางคำขอ
+# CLAIM_PREWARM=0 ปิด (เช่น ตอนวัด import time)
+PREWARM = os.environ.get("CLAIM_PREWARM", "1") != "0"
+
+# module ของหน้าวิเคราะห์ (เผื่อผู้ใช้เปิดหน้าแรกก่อน) แล้วตามด้วย module ที่ import แบบ lazy
+WARM_MODULES = [
+    "jobs",
+    "report_export",
+    "charts",
+    "paged_table",
+    "plotly.express",
+    "openpyxl",
+    "pyarrow.parquet",
+]
+
+_lock = threading.Lock()
+_thread = None
+# module (หรือ "process pool") -> วินาทีที่ใช้ตอน pre-warm
+timings = {}
+
+
+def import_modules(names=WARM_MODULES) -> dict:
+    done = {}
+    for name in names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        done[name] = time.perf_counter() - start
+    return done
+
+
+def _warm():
+    timings.update(import_modules())
+    from jobs import get_pool
+
+    start = time.perf_counter()
+    get_pool().warm()
+    timings["process pool"] = time.perf_counter() - start
+
+
+def start_prewarm():
+    # คืน thread ที่กำลัง pre-warm (None ถ้าปิดไว้)
+    global _thread
+    with _lock:
+        if _thread is None and PREWARM:
+            _thread = threading.Thread(target=_warm, name="claim-prewarm", daemon=True)
+            _thread.start()
+    return _thread